@@ -1,17 +1,20 @@
 import os
-import asyncio
-import logging
-from flask import Flask, render_template, jsonify, request
+import re
+import hmac
+import time
+import uuid
+from flask import Flask, render_template, jsonify, request, g, Response
 from werkzeug.middleware.proxy_fix import ProxyFix
-from config import SECRET_KEY, DEBUG
-from database.simple_mongo import init_db
+from config import SECRET_KEY, DEBUG, METRICS_ENABLED, METRICS_TOKEN
+from database.repository import init_db
+from utils.background_loop import background_loop
 from routes.api import api_bp
 from routes.admin import admin_bp
 from routes.streaming import streaming_bp
-from utils.logging import LOGGER
+from utils.logging import LOGGER, set_request_id, reset_request_id
+from utils.metrics import metrics, http_request_duration, loop_lag_monitor
+from utils.tracing import tracer, otlp_exporter
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG if DEBUG else logging.INFO)
 logger = LOGGER(__name__)
 
 # Create Flask app
@@ -28,6 +31,64 @@ app.register_blueprint(api_bp)
 app.register_blueprint(admin_bp)
 app.register_blueprint(streaming_bp)
 
+# Client-supplied request IDs are kept when they look like IDs, otherwise replaced
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+@app.before_request
+def start_request():
+    g.request_started = time.perf_counter()
+    request_id = request.headers.get('X-Request-ID', '')
+    if not REQUEST_ID_PATTERN.match(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    g.request_id = request_id
+    g.request_id_token = set_request_id(request_id)
+    # Root span of the request; continues the caller's trace when a traceparent header is sent
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    span = tracer.start_trace(
+        f"{request.method} {route}", request.headers.get('traceparent'),
+        **{'http.method': request.method, 'http.route': route, 'request_id': request_id}
+    )
+    if span is not None:
+        g.trace_span = span
+        g.trace_token = tracer.attach(span)
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        http_request_duration.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unmatched', method=request.method, status=response.status_code
+        )
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    span = g.get('trace_span')
+    if span is not None:
+        span.set_attribute('http.status_code', response.status_code)
+        response.headers['X-Trace-ID'] = span.trace_id
+    return response
+
+@app.teardown_request
+def end_request(exc=None):
+    span = g.pop('trace_span', None)
+    if span is not None:
+        if exc is not None:
+            span.record_error(exc)
+        tracer.detach(g.pop('trace_token'))
+        span.end()
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        reset_request_id(token)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (bearer token required when METRICS_TOKEN is set)"""
+    if not METRICS_ENABLED:
+        return not_found(None)
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}"):
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/')
 def index():
     """Main page with API documentation"""
@@ -36,11 +97,15 @@ def index():
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
+    from services.circuit_breaker import breaker_states
+    dependencies = breaker_states()
+    degraded = any(state['state'] != 'closed' for state in dependencies.values())
     return jsonify({
-        'status': 'healthy',
+        'status': 'degraded' if degraded else 'healthy',
         'service': 'YouTube API Server',
         'version': '1.0.0',
-        'concurrent_support': '10,000+ users'
+        'concurrent_support': '10,000+ users',
+        'dependencies': dependencies
     })
 
 @app.route('/docs')
@@ -141,49 +206,68 @@ def initialize_app():
         # Initialize MongoDB connection
         try:
             logger.info("🔄 Initializing MongoDB connection...")
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            success = loop.run_until_complete(init_db())
-            loop.close()
+            # The Motor client binds to the loop it first runs on - the shared background loop
+            success = background_loop.run(init_db())
             
             if success:
                 logger.info("✅ MongoDB connected successfully")
-                print("✅ MongoDB connected successfully")  # Console output
+                
+                # Apply pending schema and index migrations
+                from config import RUN_MIGRATIONS_ON_STARTUP
+                if RUN_MIGRATIONS_ON_STARTUP:
+                    try:
+                        from database.migrations import run_migrations
+                        run_migrations()
+                    except Exception as migration_error:
+                        logger.error(f"❌ Migrations failed: {migration_error}")
                 
                 # Test database access
-                from database.simple_mongo import get_content_cache_collection
+                from database.repository import get_content_cache_collection
                 test_collection = get_content_cache_collection()
                 if test_collection is not None:
                     logger.info("✅ Database collections accessible")
-                    print("✅ Database collections accessible")  # Console output
                     
                     # Test if cache entry exists
                     async def test_cache():
                         cache_entry = await test_collection.find_one({'youtube_id': 'dQw4w9WgXcQ'})
                         return cache_entry is not None
                     
-                    loop2 = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop2)
-                    has_cache = loop2.run_until_complete(test_cache())
-                    loop2.close()
+                    has_cache = background_loop.run(test_cache())
                     
                     if has_cache:
                         logger.info("🎯 CACHE VERIFICATION: Rick Astley video found in cache!")
-                        print("🎯 CACHE VERIFICATION: Rick Astley video found in cache!")
                     else:
                         logger.warning("⚠️ Cache entry not found")
                         
                 else:
                     logger.error("❌ Database collections not accessible")
-                    print("❌ Database collections not accessible")
             else:
                 logger.error("❌ MongoDB connection failed")
-                print("❌ MongoDB connection failed")
                 
         except Exception as db_error:
             logger.error(f"❌ Database initialization failed: {db_error}")
             logger.info("Continuing with limited functionality")
         
+        # Start popularity-driven cache warming if enabled
+        from config import CACHE_WARMER_ENABLED
+        if CACHE_WARMER_ENABLED:
+            from services.cache_warmer import cache_warmer
+            cache_warmer.start()
+        
+        # Sample event-loop lag for /metrics
+        if METRICS_ENABLED:
+            loop_lag_monitor.start()
+        
+        # Ship finished spans to an OpenTelemetry collector when one is configured
+        if otlp_exporter is not None:
+            otlp_exporter.start()
+        
+        # Archive raw usage into hourly rollups before the usage_stats TTL expires it
+        from config import USAGE_ROLLUP_ENABLED
+        if USAGE_ROLLUP_ENABLED:
+            from services.usage_rollup import usage_rollup
+            usage_rollup.start()
+        
         logger.info("🚀 YouTube API Server initialized and ready for 10,000+ concurrent users")
         
     except Exception as e:
@@ -0,0 +1,19 @@
+"""
+Load-test and benchmark harness: boots the app against local stand-ins for SaveTube and the Telegram Bot API
+
+    python -m benchmarks.run --scenarios hot_cache,cold_miss --output benchmarks/results/latest.json
+    python -m benchmarks.micro --compare benchmarks/micro_baseline.json
+"""
+
+# App settings for benchmark processes. MongoDB is unreachable on purpose: the
+# request path runs on the embedded backend. Kept free of app imports so runners
+# can apply it before config is first imported.
+OFFLINE_ENVIRONMENT = {
+    'MONGO_DB_URI': 'mongodb://127.0.0.1:9/',
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': '200',
+    'STORAGE_BACKEND': 'sqlite',
+    'RUN_MIGRATIONS_ON_STARTUP': 'False',
+    'USAGE_ROLLUP_ENABLED': 'False',
+    'CACHE_WARMER_ENABLED': 'False',
+    'DEBUG': 'False'
+}
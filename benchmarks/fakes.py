@@ -0,0 +1,216 @@
+"""
+Local stand-ins for SaveTube and the Telegram Bot API with configurable latency and failure rates
+"""
+import base64
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from services.youtube_downloader import SAVETUBE_KEY_HEX
+
+Reply = Tuple[int, Dict[str, str], bytes]
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def json_reply(status: int, payload: Any) -> Reply:
+    return status, {'Content-Type': 'application/json'}, json.dumps(payload).encode()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real upstreams
+
+    def _dispatch(self):
+        fake: FakeUpstream = self.server.fake
+        parts = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, headers, payload = fake.dispatch(self.command, parts.path, parse_qs(parts.query), self.headers, body)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _dispatch
+    do_POST = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeUpstream:
+    """Threaded HTTP server; each reply waits latency +- jitter and fails at failure_rate.
+
+    Calls and injected failures are counted per route so scenarios can report
+    how much upstream work a request pattern caused.
+    """
+    name = 'upstream'
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, failure_rate: float = 0.0,
+                 file_size: int = 256 * 1024, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.failure_rate = failure_rate
+        self.file_size = file_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._file = os.urandom(file_size)
+        self.calls: Counter = Counter()
+        self.failures: Counter = Counter()
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> 'FakeUpstream':
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        threading.Thread(target=self.server.serve_forever, name=f"fake-{self.name}", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @property
+    def address(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.address}"
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {'calls': dict(self.calls), 'failures': dict(self.failures)}
+
+    def dispatch(self, method: str, path: str, query: Dict[str, list], headers, body: bytes) -> Reply:
+        route = self.route_name(method, path)
+        with self._lock:
+            self.calls[route] += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = route != 'file' and self._random.random() < self.failure_rate
+            if fail:
+                self.failures[route] += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return self.failure_reply(route)
+        return self.handle(route, path, query, headers, body)
+
+    def route_name(self, method: str, path: str) -> str:
+        raise NotImplementedError
+
+    def handle(self, route: str, path: str, query: Dict[str, list], headers, body: bytes) -> Reply:
+        raise NotImplementedError
+
+    def failure_reply(self, route: str) -> Reply:
+        return 502, {'Content-Type': 'text/html'}, b'<html><body>502 Bad Gateway</body></html>'
+
+    def file_reply(self, headers, content_type: str) -> Reply:
+        """The random file body, honouring a single Range header"""
+        match = RANGE_PATTERN.match(headers.get('Range') or '')
+        if not match:
+            return 200, {'Content-Type': content_type, 'Accept-Ranges': 'bytes'}, self._file
+        size = len(self._file)
+        first, last = match.groups()
+        start = int(first) if first else max(0, size - int(last or 0))
+        end = min(int(last), size - 1) if first and last else size - 1
+        if start >= size or start > end:
+            return 416, {'Content-Range': f"bytes */{size}"}, b''
+        return 206, {
+            'Content-Type': content_type,
+            'Content-Range': f"bytes {start}-{end}/{size}"
+        }, self._file[start:end + 1]
+
+class FakeSaveTube(FakeUpstream):
+    """random-cdn, encrypted /v2/info, /download and the media files; the CDN host is the fake itself"""
+    name = 'savetube'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._algorithm = algorithms.AES(bytes.fromhex(SAVETUBE_KEY_HEX))
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api"
+
+    def route_name(self, method: str, path: str) -> str:
+        if path == '/api/random-cdn':
+            return 'cdn'
+        if path == '/v2/info':
+            return 'info'
+        if path == '/download':
+            return 'download'
+        if path.startswith('/files/'):
+            return 'file'
+        return 'unknown'
+
+    def handle(self, route: str, path: str, query: Dict[str, list], headers, body: bytes) -> Reply:
+        if route == 'cdn':
+            return json_reply(200, {'cdn': self.address})
+        if route == 'info':
+            url = json.loads(body or b'{}').get('url', '')
+            video_id = url.rsplit('=', 1)[-1].rsplit('/', 1)[-1]
+            info = {'title': f"Benchmark video {video_id}", 'durationLabel': '3:32', 'thumbnail': '', 'key': video_id}
+            return json_reply(200, {'status': True, 'data': self.encrypt(info)})
+        if route == 'download':
+            request = json.loads(body or b'{}')
+            name = f"{request.get('key')}-{request.get('quality')}.{'mp3' if request.get('downloadType') == 'audio' else 'mp4'}"
+            return json_reply(200, {'status': True, 'data': {'downloadUrl': f"{self.url}/files/{name}"}})
+        if route == 'file':
+            return self.file_reply(headers, 'video/mp4')
+        return json_reply(404, {'status': False, 'message': 'Not found'})
+
+    def encrypt(self, payload: Dict[str, Any]) -> str:
+        """IV-prefixed AES-CBC with PKCS7 padding, base64 encoded, as SaveTube sends it"""
+        padder = padding.PKCS7(128).padder()
+        plaintext = padder.update(json.dumps(payload).encode()) + padder.finalize()
+        iv = os.urandom(16)
+        encryptor = Cipher(self._algorithm, modes.CBC(iv)).encryptor()
+        return base64.b64encode(iv + encryptor.update(plaintext) + encryptor.finalize()).decode()
+
+class FakeTelegram(FakeUpstream):
+    """getFile, sendVideo/sendAudio and file downloads for any bot token"""
+    name = 'telegram'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._message_id = 0
+
+    def route_name(self, method: str, path: str) -> str:
+        if path.startswith('/file/bot'):
+            return 'file'
+        method_name = path.rsplit('/', 1)[-1]
+        if path.startswith('/bot') and method_name in ('getFile', 'sendVideo', 'sendAudio'):
+            return method_name
+        return 'unknown'
+
+    def handle(self, route: str, path: str, query: Dict[str, list], headers, body: bytes) -> Reply:
+        if route == 'getFile':
+            file_id = (query.get('file_id') or [''])[0]
+            return json_reply(200, {'ok': True, 'result': {
+                'file_id': file_id, 'file_unique_id': file_id[-16:], 'file_size': self.file_size,
+                'file_path': f"videos/{file_id}.mp4"
+            }})
+        if route in ('sendVideo', 'sendAudio'):
+            with self._lock:
+                self._message_id += 1
+                message_id = self._message_id
+            kind = 'video' if route == 'sendVideo' else 'audio'
+            media = {'file_id': f"bench-{kind}-{message_id}", 'file_unique_id': f"u{message_id}", 'file_size': len(body)}
+            return json_reply(200, {'ok': True, 'result': {'message_id': message_id, 'date': int(time.time()), kind: media}})
+        if route == 'file':
+            return self.file_reply(headers, 'video/mp4')
+        return json_reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+
+    def failure_reply(self, route: str) -> Reply:
+        return json_reply(502, {'ok': False, 'error_code': 502, 'description': 'Bad Gateway'})
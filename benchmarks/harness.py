@@ -0,0 +1,190 @@
+"""
+Benchmark harness - app subprocess on the embedded SQLite backend, load generation and latency summaries
+"""
+import asyncio
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import httpx
+from benchmarks import OFFLINE_ENVIRONMENT
+from benchmarks.fakes import FakeSaveTube, FakeTelegram
+from database.storage import SQLiteStorage
+from models_simple import APIKey
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_USERNAME = 'bench-admin'
+ADMIN_PASSWORD = 'bench-password'
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def video_id(prefix: str, number: int) -> str:
+    """11-character YouTube-shaped ID, unique per prefix and number"""
+    return f"{prefix}{number:0{11 - len(prefix)}d}"
+
+def youtube_url(vid: str) -> str:
+    return f"https://www.youtube.com/watch?v={vid}"
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+class LatencyRecorder:
+    """Latencies and status codes of one request stream"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, seconds: float, status: Optional[int]):
+        self.latencies.append(seconds)
+        self.statuses[str(status) if status is not None else 'error'] += 1
+        if status is None or status >= 500:
+            self.errors += 1
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        count = len(ordered)
+        return {
+            'requests': count,
+            'errors': self.errors,
+            'status_codes': dict(self.statuses),
+            'duration_seconds': round(elapsed, 3),
+            'throughput_rps': round(count / elapsed, 2) if elapsed > 0 else 0.0,
+            'latency_ms': {
+                'p50': round(percentile(ordered, 50) * 1000, 2),
+                'p95': round(percentile(ordered, 95) * 1000, 2),
+                'p99': round(percentile(ordered, 99) * 1000, 2),
+                'mean': round(sum(ordered) / count * 1000, 2) if count else 0.0,
+                'max': round(ordered[-1] * 1000, 2) if count else 0.0
+            }
+        }
+
+async def timed(recorder: LatencyRecorder, request: Awaitable[httpx.Response]) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        response = await request
+    except httpx.HTTPError:
+        recorder.record(time.perf_counter() - start, None)
+        return None
+    recorder.record(time.perf_counter() - start, response.status_code)
+    return response
+
+async def run_load(make_request: Callable[[int], Awaitable[httpx.Response]], total: int, concurrency: int,
+                   recorder: Optional[LatencyRecorder] = None) -> LatencyRecorder:
+    """Issue `total` requests from `concurrency` workers; make_request(i) builds the i-th request"""
+    recorder = recorder or LatencyRecorder()
+    counter = iter(range(total))
+
+    async def worker():
+        for index in counter:
+            await timed(recorder, make_request(index))
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, total)))))
+    recorder.finish()
+    return recorder
+
+class AppProcess:
+    """The app in its own interpreter, on a fresh SQLite database and wired to the fakes"""
+
+    def __init__(self, workdir: str, savetube: FakeSaveTube, telegram: FakeTelegram,
+                 extra_env: Optional[Dict[str, str]] = None):
+        self.workdir = workdir
+        self.savetube = savetube
+        self.telegram = telegram
+        self.extra_env = extra_env or {}
+        self.port = free_port()
+        self.sqlite_path = os.path.join(workdir, 'bench.sqlite3')
+        self.log_path = os.path.join(workdir, 'app.log')
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def environment(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        env.update(OFFLINE_ENVIRONMENT)
+        env.update({
+            'SQLITE_PATH': self.sqlite_path,
+            'SAVETUBE_API_URL': self.savetube.api_url,
+            'SAVETUBE_CDN_SCHEME': 'http',
+            'TELEGRAM_API_URL': self.telegram.url,
+            'ADMIN_USERNAME': ADMIN_USERNAME,
+            'ADMIN_PASSWORD': ADMIN_PASSWORD,
+            'LOG_LEVEL': 'WARNING',
+            'PYTHONUNBUFFERED': '1'
+        })
+        env.update(self.extra_env)
+        return env
+
+    def seed(self, hot_ids: List[str], qualities=('360',)) -> str:
+        """Create the benchmark API key and cached ladder entries; returns the key"""
+        store = SQLiteStorage(self.sqlite_path)
+        api_key = APIKey(user_id='benchmark', name='Benchmark', rate_limit=10 ** 9)
+        key_doc = api_key.to_dict()
+        key_doc['daily_limit'] = 10 ** 9
+
+        async def write():
+            await store.insert_key(key_doc)
+            for vid in hot_ids:
+                for quality in qualities:
+                    entry = {
+                        'telegram_file_id': f"bench-seed-{vid}-{quality}", 'file_size': self.telegram.file_size,
+                        'content_hash': f"{vid}-{quality}", 'upload_date': datetime.utcnow().isoformat(),
+                        'access_count': 0, 'last_accessed': datetime.utcnow()
+                    }
+                    await store.put_ladder_quality(f"{vid}:video", vid, 'video', quality, entry,
+                                                   f"Benchmark video {vid}", 212)
+
+        asyncio.run(write())
+        store.close()
+        return api_key.key
+
+    def start(self, timeout: float = 60.0):
+        log = open(self.log_path, 'ab')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.serve', '--port', str(self.port)],
+            cwd=REPO_ROOT, env=self.environment(), stdout=log, stderr=subprocess.STDOUT
+        )
+        log.close()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"App exited with {self.process.returncode}, see {self.log_path}")
+            try:
+                if httpx.get(f"{self.base_url}/health", timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"App did not become healthy within {timeout}s, see {self.log_path}")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
@@ -0,0 +1,247 @@
+"""
+Microbenchmarks of per-request hot functions, with a saved baseline and regression check
+
+    python -m benchmarks.micro                                  # run all, print per-call times
+    python -m benchmarks.micro --compare benchmarks/micro_baseline.json --fail-on-regression
+    python -m benchmarks.micro --save-baseline                  # refresh the baseline on this machine
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from benchmarks import OFFLINE_ENVIRONMENT
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'micro_baseline.json')
+
+URLS = (
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://youtu.be/dQw4w9WgXcQ?si=Qm9yZXRoYW5h&t=42',
+    'https://m.youtube.com/watch?v=9bZkp7q19f0&list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI&index=3',
+    'https://www.youtube.com/shorts/aqz-KE-bpKQ',
+    'youtube.com/embed/kJQP7kiw5Fk?autoplay=1',
+    'https://music.youtube.com/watch?v=fJ9rUzIMcZQ&feature=share'
+)
+
+VIDEO_INFO = {
+    'video_id': 'dQw4w9WgXcQ',
+    'title': 'Rick Astley - Never Gonna Give You Up (Official Music Video) [4K Remaster] | #RickRoll 🎵',
+    'duration': '3:33',
+    'thumbnail': 'https://i.ytimg.com/vi/dQw4w9WgXcQ/maxresdefault.jpg',
+    'type': 'video',
+    'quality': '720'
+}
+
+def _savetube_info() -> Dict[str, Any]:
+    """What SaveTube's /v2/info decrypts to: metadata plus the format lists"""
+    return {
+        'title': VIDEO_INFO['title'], 'durationLabel': '3:33', 'duration': 213,
+        'thumbnail': VIDEO_INFO['thumbnail'], 'key': 'a1b2c3d4e5f6a7b8c9d0e1f2a3b4c5d6', 'id': 'dQw4w9WgXcQ',
+        'video_formats': [{'height': h, 'width': h * 16 // 9, 'url': None, 'quality': h, 'label': f"{h}p",
+                           'default_selected': 1 if h == 360 else 0} for h in (144, 240, 360, 480, 720, 1080)],
+        'audio_formats': [{'quality': q, 'url': None, 'label': f"{q}kbps"} for q in (48, 128, 320)],
+        'thumbnail_formats': [{'label': label, 'quality': i, 'value': label, 'url': VIDEO_INFO['thumbnail']}
+                              for i, label in enumerate(('default', 'medium', 'high', 'standard', 'maxres'))]
+    }
+
+def _drive(coro) -> Any:
+    """Run a coroutine that never suspends, without an event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError('coroutine suspended')
+
+BENCHMARKS: Dict[str, Tuple[str, Callable[[], Callable[[], Any]]]] = {}
+
+def benchmark(name: str, description: str):
+    """Register a setup function that returns the zero-argument callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = (description, setup)
+        return setup
+    return register
+
+@benchmark('extract_video_id', 'Video ID from six URL shapes, round-robin')
+def _extract_video_id():
+    from utils.youtube_url import extract_video_id
+    urls = itertools.cycle(URLS)
+    return lambda: extract_video_id(next(urls))
+
+@benchmark('decrypt_data', 'YouTubeDownloader.decrypt_data on a 2 KB SaveTube info payload')
+def _decrypt_data():
+    from benchmarks.fakes import FakeSaveTube
+    from services.youtube_downloader import YouTubeDownloader
+    downloader = YouTubeDownloader()
+    payload = FakeSaveTube(file_size=0).encrypt(_savetube_info())
+    return lambda: _drive(downloader.decrypt_data(payload))
+
+def _telegram_cache():
+    from services.telegram_cache import TelegramCache
+    return TelegramCache()
+
+@benchmark('content_hash', 'TelegramCache._generate_content_hash')
+def _content_hash():
+    cache = _telegram_cache()
+    return lambda: cache._generate_content_hash('dQw4w9WgXcQ', 'video', '720')
+
+@benchmark('professional_caption', 'TelegramCache._create_professional_caption')
+def _professional_caption():
+    cache = _telegram_cache()
+    return lambda: cache._create_professional_caption(VIDEO_INFO, 'video', '720', 48_234_112)
+
+@benchmark('sanitize_filename', 'TelegramCache._sanitize_filename on a 90-character title')
+def _sanitize_filename():
+    cache = _telegram_cache()
+    return lambda: cache._sanitize_filename(VIDEO_INFO['title'])
+
+@benchmark('before_request', 'App and API before_request hooks plus teardown for /api/v1/video (SQLite key check)')
+def _before_request():
+    from app import app
+    from database.storage import storage
+    from models_simple import APIKey
+    from utils.background_loop import background_loop
+    api_key = APIKey(user_id='benchmark', name='Microbenchmark', rate_limit=10 ** 9)
+    key_doc = api_key.to_dict()
+    key_doc['daily_limit'] = 10 ** 9
+    background_loop.run(storage.insert_key(key_doc))
+    path = f"/api/v1/video?url={URLS[0]}&quality=360"
+    headers = {'X-API-Key': api_key.key}
+
+    def run():
+        with app.test_request_context(path, headers=headers):
+            app.preprocess_request()
+    return run
+
+@benchmark('run_async', 'Round trip of a finished coroutine through the shared background loop')
+def _run_async():
+    from routes.api import run_async
+
+    async def noop():
+        return None
+    return lambda: run_async(noop())
+
+@benchmark('json_response', 'jsonify of a cache-hit /video response')
+def _json_response():
+    from flask import jsonify
+    from app import app
+    body = {
+        'status': True, 'cached': True, 'source': 'production_cache', 'video_id': VIDEO_INFO['video_id'],
+        'title': VIDEO_INFO['title'], 'duration': 213, 'telegram_file_id': 'BAACAgUAAxkDAAIBZ2Zx' + 'Q' * 50,
+        'file_type': 'video', 'quality': '720', 'requested_quality': '720', 'file_size': 48_234_112,
+        'upload_date': '2025-01-01T00:00:00', 'access_count': 1042, 'telegram_url': 'https://t.me/c/2863131570/',
+        'response_time': '0.004s', 'message': 'Ultra-fast response from production cache!'
+    }
+    context = app.app_context()
+    context.push()  # held for the rest of the run
+    return lambda: jsonify(body)
+
+def _time(func: Callable[[], Any], loops: int) -> float:
+    start = time.perf_counter()
+    for _ in itertools.repeat(None, loops):
+        func()
+    return time.perf_counter() - start
+
+def measure(func: Callable[[], Any], repeats: int, min_time: float) -> Dict[str, Any]:
+    """Per-call seconds over `repeats` samples of a loop count calibrated to take min_time"""
+    loops = 1
+    while _time(func, loops) < min_time and loops < 10 ** 7:
+        loops *= 2
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        samples = [_time(func, loops) / loops for _ in range(repeats)]
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        'loops': loops,
+        'repeats': repeats,
+        'median_us': round(statistics.median(samples) * 1e6, 3),
+        'min_us': round(min(samples) * 1e6, 3),
+        'mean_us': round(statistics.mean(samples) * 1e6, 3),
+        'stdev_us': round(statistics.stdev(samples) * 1e6, 3) if repeats > 1 else 0.0
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> Tuple[List[str], int]:
+    """Median per-call changes against a baseline; returns (lines, number of regressions)"""
+    lines, regressions = [], 0
+    for name, result in report['benchmarks'].items():
+        old = baseline.get('benchmarks', {}).get(name)
+        if old is None:
+            lines.append(f"➕ {name}: {result['median_us']} us (not in baseline)")
+            continue
+        change = (result['median_us'] - old['median_us']) / old['median_us'] if old['median_us'] else 0.0
+        regressed = change > threshold
+        regressions += regressed
+        lines.append(f"{'❌' if regressed else '✅'} {name}: {old['median_us']} -> {result['median_us']} us ({change:+.1%})")
+    return lines, regressions
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Time per-request hot functions in isolation')
+    parser.add_argument('--only', help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per sample; sets the loop count')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--save-baseline', action='store_true', help=f"write the results to {BASELINE_PATH}")
+    parser.add_argument('--compare', help='baseline or earlier results file')
+    parser.add_argument('--threshold', type=float, default=0.20, help='relative median increase counted as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 on a regression')
+    args = parser.parse_args(argv)
+    args.only = [name.strip() for name in args.only.split(',')] if args.only else list(BENCHMARKS)
+    unknown = [name for name in args.only if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Applied before the first import of config: offline app, throwaway SQLite file, quiet logs
+    workdir = tempfile.mkdtemp(prefix='micro-')
+    for key, value in {**OFFLINE_ENVIRONMENT, 'SQLITE_PATH': os.path.join(workdir, 'micro.sqlite3'),
+                       'LOG_LEVEL': 'CRITICAL'}.items():
+        os.environ.setdefault(key, value)
+    from benchmarks.run import git_commit
+
+    results = {}
+    try:
+        for name in args.only:
+            description, setup = BENCHMARKS[name]
+            results[name] = {'description': description, **measure(setup(), args.repeats, args.min_time)}
+            print(f"{name:<24}{results[name]['median_us']:>12.3f} us  "
+                  f"(+- {results[name]['stdev_us']:.3f}, {results[name]['loops']} loops)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {'repeats': args.repeats, 'min_time': args.min_time},
+        'benchmarks': results
+    }
+    for path in filter(None, (args.output, BASELINE_PATH if args.save_baseline else None)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Results written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines, regressions = compare(report, baseline, args.threshold)
+        print(f"\nCompared with {args.compare} ({baseline.get('git_commit')}, Python {baseline.get('python')}):")
+        print('\n'.join(lines))
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
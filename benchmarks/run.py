@@ -0,0 +1,177 @@
+"""
+Run benchmark scenarios against a local app instance and write the results as JSON
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios hot_cache,thundering_herd --savetube-latency-ms 150
+    python -m benchmarks.run --output new.json --compare benchmarks/results/baseline.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from benchmarks.fakes import FakeSaveTube, FakeTelegram
+from benchmarks.harness import REPO_ROOT, AppProcess, video_id
+from benchmarks.scenarios import SCENARIOS, BenchmarkContext
+
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Load-test the API against local SaveTube and Telegram stand-ins')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated, in order (default: {','.join(SCENARIOS)})")
+    parser.add_argument('--requests', type=int, default=500, help='requests per hot scenario; cold ones run a fifth')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--herd-size', type=int, default=50)
+    parser.add_argument('--hot-videos', type=int, default=50, help='videos seeded into the cache')
+    parser.add_argument('--savetube-latency-ms', type=float, default=80.0)
+    parser.add_argument('--telegram-latency-ms', type=float, default=40.0)
+    parser.add_argument('--jitter-ms', type=float, default=20.0)
+    parser.add_argument('--savetube-failure-rate', type=float, default=0.0)
+    parser.add_argument('--telegram-failure-rate', type=float, default=0.0)
+    parser.add_argument('--file-size-kb', type=int, default=256, help='size of every fake media file')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<UTC time>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative p95 increase or throughput drop counted as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 on a regression')
+    parser.add_argument('--keep-workdir', action='store_true', help='keep the SQLite file and app log')
+    args = parser.parse_args(argv)
+    args.scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    return args
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def _calls_delta(before: Dict[str, Dict[str, int]], after: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    return {
+        upstream: {route: count - before[upstream].get(route, 0)
+                   for route, count in calls.items() if count != before[upstream].get(route, 0)}
+        for upstream, calls in after.items()
+    }
+
+async def run_scenarios(ctx: BenchmarkContext, names: List[str]) -> Dict[str, Any]:
+    results = {}
+    try:
+        for name in names:
+            print(f"▶️  {name}...", flush=True)
+            before = ctx.upstream_calls()
+            started = time.perf_counter()
+            result = await SCENARIOS[name](ctx)
+            result['wall_seconds'] = round(time.perf_counter() - started, 3)
+            result['upstream_calls'] = _calls_delta(before, ctx.upstream_calls())
+            results[name] = result
+    finally:
+        await ctx.close()
+    return results
+
+def _streams(result: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """The latency summaries of a scenario result, by stream label"""
+    return {label: value for label, value in result.items() if isinstance(value, dict) and 'latency_ms' in value}
+
+def format_table(report: Dict[str, Any]) -> str:
+    lines = [f"{'scenario/stream':<32}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for name, result in report['scenarios'].items():
+        for label, summary in _streams(result).items():
+            latency = summary['latency_ms']
+            lines.append(
+                f"{name + '/' + label:<32}{summary['requests']:>9}{summary['errors']:>8}{summary['throughput_rps']:>9}"
+                f"{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}"
+            )
+    return '\n'.join(lines)
+
+def _change(new: float, old: float) -> float:
+    return (new - old) / old if old else 0.0
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> Tuple[List[str], int]:
+    """Per-stream changes against an earlier run; returns (lines, number of regressions)"""
+    lines, regressions = [], 0
+    for name, result in report['scenarios'].items():
+        old_streams = _streams(baseline.get('scenarios', {}).get(name, {}))
+        for label, summary in _streams(result).items():
+            old = old_streams.get(label)
+            if old is None:
+                continue
+            p95 = _change(summary['latency_ms']['p95'], old['latency_ms']['p95'])
+            rps = _change(summary['throughput_rps'], old['throughput_rps'])
+            regressed = p95 > threshold or rps < -threshold
+            regressions += regressed
+            lines.append(
+                f"{'❌' if regressed else '✅'} {name}/{label}: "
+                f"p50 {old['latency_ms']['p50']} -> {summary['latency_ms']['p50']} ms, "
+                f"p95 {old['latency_ms']['p95']} -> {summary['latency_ms']['p95']} ms ({p95:+.1%}), "
+                f"p99 {old['latency_ms']['p99']} -> {summary['latency_ms']['p99']} ms, "
+                f"{old['throughput_rps']} -> {summary['throughput_rps']} req/s ({rps:+.1%})"
+            )
+    return lines, regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    upstream = {'jitter_ms': args.jitter_ms, 'file_size': args.file_size_kb * 1024, 'seed': args.seed}
+    savetube = FakeSaveTube(latency_ms=args.savetube_latency_ms, failure_rate=args.savetube_failure_rate, **upstream).start()
+    telegram = FakeTelegram(latency_ms=args.telegram_latency_ms, failure_rate=args.telegram_failure_rate, **upstream).start()
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    app = AppProcess(workdir, savetube, telegram)
+    hot_ids = [video_id('hot', number) for number in range(args.hot_videos)]
+    started_at = datetime.now(timezone.utc)
+    failed = True
+    try:
+        api_key = app.seed(hot_ids)
+        app.start()
+        ctx = BenchmarkContext(app, savetube, telegram, api_key, hot_ids, args.requests, args.concurrency,
+                               args.herd_size, args.seed)
+        scenarios = asyncio.run(run_scenarios(ctx, args.scenarios))
+        failed = False
+    finally:
+        app.stop()
+        savetube.stop()
+        telegram.stop()
+        if failed or args.keep_workdir:
+            print(f"App log and database kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {key: value for key, value in vars(args).items()
+                     if key not in ('output', 'compare', 'fail_on_regression', 'keep_workdir')},
+        'scenarios': scenarios
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(format_table(report))
+    print(f"📄 Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            lines, regressions = compare(report, json.load(f), args.threshold)
+        print(f"\nCompared with {args.compare}:")
+        print('\n'.join(lines) or 'No scenarios in common')
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Scripted load scenarios; each returns latency summaries per request stream
+"""
+import asyncio
+import itertools
+import random
+import time
+from typing import Any, Callable, Dict, List
+import httpx
+from benchmarks.fakes import FakeSaveTube, FakeTelegram
+from benchmarks.harness import (
+    ADMIN_USERNAME, ADMIN_PASSWORD, AppProcess, LatencyRecorder, run_load, timed, video_id, youtube_url
+)
+
+# Polled round-robin by the admin_polling scenario
+ADMIN_ENDPOINTS = ('/admin/api/stats', '/admin/api/db/pool', '/admin/api/traces?limit=5', '/metrics')
+
+class BenchmarkContext:
+    """What scenarios share: the app, the fakes, the seeded API key and cached videos, and the load settings"""
+
+    def __init__(self, app: AppProcess, savetube: FakeSaveTube, telegram: FakeTelegram, api_key: str,
+                 hot_ids: List[str], requests: int, concurrency: int, herd_size: int, seed: int):
+        self.app = app
+        self.savetube = savetube
+        self.telegram = telegram
+        self.api_key = api_key
+        self.hot_ids = hot_ids
+        self.requests = requests
+        self.concurrency = concurrency
+        self.herd_size = herd_size
+        self.random = random.Random(seed)
+        self._numbers = itertools.count()
+        self.client = httpx.AsyncClient(
+            base_url=app.base_url, timeout=120.0,
+            limits=httpx.Limits(max_connections=max(concurrency, herd_size) * 2)
+        )
+
+    @property
+    def api_headers(self) -> Dict[str, str]:
+        return {'X-API-Key': self.api_key}
+
+    def new_video_id(self, prefix: str) -> str:
+        """A video nobody has requested yet in this run"""
+        return video_id(prefix, next(self._numbers))
+
+    def video(self, vid: str, quality: str = '360'):
+        return self.client.get('/api/v1/video', params={'url': youtube_url(vid), 'quality': quality},
+                               headers=self.api_headers)
+
+    def upstream_calls(self) -> Dict[str, Dict[str, int]]:
+        return {'savetube': self.savetube.stats()['calls'], 'telegram': self.telegram.stats()['calls']}
+
+    async def settle(self, quiet: float = 1.0, timeout: float = 60.0):
+        """Wait for background cache uploads started by cache misses to stop hitting the fakes"""
+        end = time.monotonic() + timeout
+        last = self.upstream_calls()
+        while time.monotonic() < end:
+            await asyncio.sleep(quiet)
+            current = self.upstream_calls()
+            if current == last:
+                return
+            last = current
+
+    async def close(self):
+        await self.client.aclose()
+
+SCENARIOS: Dict[str, Callable[[BenchmarkContext], Any]] = {}
+
+def scenario(name: str):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+@scenario('hot_cache')
+async def hot_cache(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """Every request is a quality ladder hit on a seeded video"""
+    recorder = await run_load(lambda i: ctx.video(ctx.hot_ids[i % len(ctx.hot_ids)]), ctx.requests, ctx.concurrency)
+    return {'video': recorder.summary()}
+
+@scenario('cold_miss')
+async def cold_miss(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """Every request is a new video: SaveTube round trips inline, Telegram upload in the background"""
+    recorder = await run_load(lambda i: ctx.video(ctx.new_video_id('cold')), max(1, ctx.requests // 5), ctx.concurrency)
+    await ctx.settle()
+    return {'video': recorder.summary()}
+
+@scenario('thundering_herd')
+async def thundering_herd(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """herd_size clients ask for the same uncached video at the same moment, five times over"""
+    herds = 5
+    recorder = LatencyRecorder()
+    before = ctx.savetube.stats()['calls'].get('info', 0)
+    for _ in range(herds):
+        vid = ctx.new_video_id('herd')
+        await asyncio.gather(*(timed(recorder, ctx.video(vid)) for _ in range(ctx.herd_size)))
+    recorder.finish()
+    info_calls = ctx.savetube.stats()['calls'].get('info', 0) - before
+    await ctx.settle()
+    return {
+        'video': recorder.summary(),
+        'herds': herds,
+        'herd_size': ctx.herd_size,
+        'savetube_info_calls_per_herd': round(info_calls / herds, 2)  # 1.0 when misses are coalesced
+    }
+
+@scenario('streaming_seek')
+async def streaming_seek(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """Range requests at random offsets into cached videos through /stream/video"""
+    first_byte, complete = LatencyRecorder(), LatencyRecorder()
+    received: List[int] = []
+    wanted: List[int] = []
+    total = max(1, ctx.requests // 5)
+    plan = [(ctx.random.choice(ctx.hot_ids), ctx.random.randrange(ctx.telegram.file_size)) for _ in range(total)]
+
+    async def seek(index: int):
+        vid, offset = plan[index]
+        start = time.perf_counter()
+        size = 0
+        status = None
+        try:
+            async with ctx.client.stream('GET', f"/stream/video/{vid}", params={'quality': '360'},
+                                         headers={**ctx.api_headers, 'Range': f"bytes={offset}-"}) as response:
+                status = response.status_code
+                async for chunk in response.aiter_bytes():
+                    if not size:
+                        first_byte.record(time.perf_counter() - start, status)
+                    size += len(chunk)
+        except httpx.HTTPError:
+            pass
+        if not size:
+            first_byte.record(time.perf_counter() - start, status)
+        complete.record(time.perf_counter() - start, status)
+        received.append(size)
+        wanted.append(ctx.telegram.file_size - offset)
+
+    counter = iter(range(total))
+
+    async def worker():
+        for index in counter:
+            await seek(index)
+
+    await asyncio.gather(*(worker() for _ in range(min(ctx.concurrency, total))))
+    first_byte.finish()
+    complete.finish()
+    return {
+        'first_byte': first_byte.summary(),
+        'complete': complete.summary(),
+        'bytes_per_seek': round(sum(received) / len(received)),
+        'bytes_after_offset': round(sum(wanted) / len(wanted))  # equal to bytes_per_seek when Range is honoured
+    }
+
+@scenario('admin_polling')
+async def admin_polling(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """Two dashboard pollers on the admin JSON endpoints while hot-cache traffic runs"""
+    async with httpx.AsyncClient(base_url=ctx.app.base_url, timeout=60.0) as admin:
+        login = await admin.post('/admin/login', data={'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD})
+        if login.status_code != 302:
+            raise RuntimeError(f"Admin login failed with {login.status_code}")
+        admin_load = run_load(lambda i: admin.get(ADMIN_ENDPOINTS[i % len(ADMIN_ENDPOINTS)]),
+                              max(len(ADMIN_ENDPOINTS), ctx.requests // 5), 2)
+        api_load = run_load(lambda i: ctx.video(ctx.hot_ids[i % len(ctx.hot_ids)]), ctx.requests, ctx.concurrency)
+        admin_recorder, api_recorder = await asyncio.gather(admin_load, api_load)
+    return {'admin': admin_recorder.summary(), 'video': api_recorder.summary()}
@@ -0,0 +1,15 @@
+"""
+Run the app for benchmarks: threaded Werkzeug server without the debugger or reloader
+"""
+import argparse
+from app import app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+    app.run(host=args.host, port=args.port, debug=False, threaded=True, use_reloader=False)
+
+if __name__ == '__main__':
+    main()
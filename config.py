@@ -26,3 +26,141 @@ ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")
 # Performance Configuration
 WORKER_CONNECTIONS = int(os.getenv("WORKER_CONNECTIONS", "1000"))
 KEEP_ALIVE = int(os.getenv("KEEP_ALIVE", "2"))
+
+# Cache Prefetch Configuration (bulk warming of the Telegram cache)
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+PREFETCH_MIN_INTERVAL_SECONDS = float(os.getenv("PREFETCH_MIN_INTERVAL_SECONDS", "1.0"))
+PREFETCH_MAX_ITEMS = int(os.getenv("PREFETCH_MAX_ITEMS", "500"))
+PREFETCH_JOB_HISTORY = int(os.getenv("PREFETCH_JOB_HISTORY", "50"))
+
+# Predictive Cache Warming (popularity-driven)
+CACHE_WARMER_ENABLED = os.getenv("CACHE_WARMER_ENABLED", "False").lower() == "true"
+CACHE_WARMER_INTERVAL_SECONDS = int(os.getenv("CACHE_WARMER_INTERVAL_SECONDS", "300"))
+CACHE_WARMER_WINDOW_MINUTES = int(os.getenv("CACHE_WARMER_WINDOW_MINUTES", "60"))
+CACHE_WARMER_MIN_MISSES = int(os.getenv("CACHE_WARMER_MIN_MISSES", "3"))
+CACHE_WARMER_MIN_REQUESTS = int(os.getenv("CACHE_WARMER_MIN_REQUESTS", "10"))
+CACHE_WARMER_UPLOAD_BUDGET = int(os.getenv("CACHE_WARMER_UPLOAD_BUDGET", "10"))  # uploads per cycle
+CACHE_WARMER_COOLDOWN_MINUTES = int(os.getenv("CACHE_WARMER_COOLDOWN_MINUTES", "60"))
+
+# Quality Ladder Cache Configuration
+# exact_only | prefer_higher | prefer_lower
+CACHE_QUALITY_POLICY = os.getenv("CACHE_QUALITY_POLICY", "prefer_higher")
+QUALITY_UPGRADE_THRESHOLD = int(os.getenv("QUALITY_UPGRADE_THRESHOLD", "3"))
+
+# Cache Retention Configuration
+# lru | lfu | gdsf
+CACHE_RETENTION_POLICY = os.getenv("CACHE_RETENTION_POLICY", "gdsf")
+CACHE_RETENTION_BATCH_SIZE = int(os.getenv("CACHE_RETENTION_BATCH_SIZE", "500"))
+CACHE_RETENTION_MAX_EVICTIONS = int(os.getenv("CACHE_RETENTION_MAX_EVICTIONS", "200"))
+CACHE_RETENTION_HOT_WINDOW_MINUTES = int(os.getenv("CACHE_RETENTION_HOT_WINDOW_MINUTES", "60"))
+CACHE_RETENTION_MAX_BYTES = int(os.getenv("CACHE_RETENTION_MAX_BYTES", "0"))  # 0 = no size target
+CACHE_RETENTION_LFU_HALF_LIFE_HOURS = float(os.getenv("CACHE_RETENTION_LFU_HALF_LIFE_HOURS", "72"))
+CACHE_REFILL_BASE_COST_SECONDS = float(os.getenv("CACHE_REFILL_BASE_COST_SECONDS", "5"))
+CACHE_REFILL_BYTES_PER_SECOND = float(os.getenv("CACHE_REFILL_BYTES_PER_SECOND", str(2 * 1024 * 1024)))
+
+# Negative Cache Configuration (failed/unavailable video lookups)
+NEGATIVE_CACHE_BASE_TTL_SECONDS = int(os.getenv("NEGATIVE_CACHE_BASE_TTL_SECONDS", "30"))
+NEGATIVE_CACHE_UNAVAILABLE_TTL_SECONDS = int(os.getenv("NEGATIVE_CACHE_UNAVAILABLE_TTL_SECONDS", "600"))
+NEGATIVE_CACHE_MAX_TTL_SECONDS = int(os.getenv("NEGATIVE_CACHE_MAX_TTL_SECONDS", "86400"))
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", "10000"))
+
+# Circuit Breaker Configuration (consecutive failures to open, seconds before a trial call)
+SAVETUBE_BREAKER_FAILURE_THRESHOLD = int(os.getenv("SAVETUBE_BREAKER_FAILURE_THRESHOLD", "5"))
+SAVETUBE_BREAKER_RECOVERY_SECONDS = int(os.getenv("SAVETUBE_BREAKER_RECOVERY_SECONDS", "30"))
+TELEGRAM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("TELEGRAM_BREAKER_FAILURE_THRESHOLD", "3"))
+TELEGRAM_BREAKER_RECOVERY_SECONDS = int(os.getenv("TELEGRAM_BREAKER_RECOVERY_SECONDS", "60"))
+MONGODB_BREAKER_FAILURE_THRESHOLD = int(os.getenv("MONGODB_BREAKER_FAILURE_THRESHOLD", "5"))
+MONGODB_BREAKER_RECOVERY_SECONDS = int(os.getenv("MONGODB_BREAKER_RECOVERY_SECONDS", "15"))
+
+# Request Deadline Configuration (client budget via X-Request-Timeout header, in seconds)
+REQUEST_DEADLINE_HEADER = os.getenv("REQUEST_DEADLINE_HEADER", "X-Request-Timeout")
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "25"))
+REQUEST_DEADLINE_MIN_SECONDS = float(os.getenv("REQUEST_DEADLINE_MIN_SECONDS", "1"))
+REQUEST_DEADLINE_MAX_SECONDS = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", "120"))
+# Below this budget a cache miss is queued for background caching instead of downloaded inline
+REQUEST_DEADLINE_MIN_DOWNLOAD_SECONDS = float(os.getenv("REQUEST_DEADLINE_MIN_DOWNLOAD_SECONDS", "3"))
+REQUEST_QUEUED_RETRY_AFTER_SECONDS = int(os.getenv("REQUEST_QUEUED_RETRY_AFTER_SECONDS", "30"))
+
+# Asynchronous Request Jobs (202 Accepted mode for /video and /audio)
+REQUEST_JOB_TTL_HOURS = int(os.getenv("REQUEST_JOB_TTL_HOURS", "24"))
+REQUEST_JOB_CONCURRENCY = int(os.getenv("REQUEST_JOB_CONCURRENCY", "8"))
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "10"))
+WEBHOOK_RETRY_DELAYS = [1, 5, 30]  # seconds between delivery attempts
+# Callbacks to loopback/private/link-local hosts are refused unless this is set (local development only)
+WEBHOOK_ALLOW_PRIVATE_HOSTS = os.getenv("WEBHOOK_ALLOW_PRIVATE_HOSTS", "False").lower() == "true"
+
+# Live Admin Stats (Server-Sent Events feed)
+STATS_PUBLISH_INTERVAL_SECONDS = float(os.getenv("STATS_PUBLISH_INTERVAL_SECONDS", "5"))
+STATS_STREAM_KEEPALIVE_SECONDS = float(os.getenv("STATS_STREAM_KEEPALIVE_SECONDS", "15"))
+STATS_STREAM_MAX_SECONDS = float(os.getenv("STATS_STREAM_MAX_SECONDS", "45"))  # each stream then ends and EventSource reconnects
+
+# Admin Analytics Cache (stale-while-revalidate, in seconds)
+ANALYTICS_CACHE_FRESH_SECONDS = float(os.getenv("ANALYTICS_CACHE_FRESH_SECONDS", "30"))
+ANALYTICS_CACHE_MAX_STALE_SECONDS = float(os.getenv("ANALYTICS_CACHE_MAX_STALE_SECONDS", "600"))
+
+# MongoDB Connection Pool (one client per process, shared by async and sync access)
+MONGO_APP_NAME = os.getenv("MONGO_APP_NAME", "youtube-api-server")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+
+# Admin API Key Listing (keyset pagination)
+ADMIN_API_KEYS_PAGE_SIZE = int(os.getenv("ADMIN_API_KEYS_PAGE_SIZE", "50"))
+ADMIN_API_KEYS_MAX_PAGE_SIZE = int(os.getenv("ADMIN_API_KEYS_MAX_PAGE_SIZE", "200"))
+
+# Schema and Index Migrations (database/migrations.py)
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "True").lower() == "true"
+
+# Data Lifecycle (TTL-index expiry and hourly usage rollups)
+USAGE_ROLLUP_ENABLED = os.getenv("USAGE_ROLLUP_ENABLED", "True").lower() == "true"
+USAGE_STATS_RETENTION_DAYS = int(os.getenv("USAGE_STATS_RETENTION_DAYS", "30"))
+USAGE_ROLLUP_RETENTION_DAYS = int(os.getenv("USAGE_ROLLUP_RETENTION_DAYS", "365"))
+USAGE_ROLLUP_INTERVAL_SECONDS = int(os.getenv("USAGE_ROLLUP_INTERVAL_SECONDS", "3600"))
+CONCURRENT_USER_TTL_SECONDS = int(os.getenv("CONCURRENT_USER_TTL_SECONDS", "3600"))
+
+# Storage Backend for the request path (cache index, API keys, usage): "mongodb" or "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongodb").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "data/storage.sqlite3")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))  # wait for another process's write lock
+
+# MongoDB Operation Profiles (read preference / write concern per operation class)
+MONGO_HOT_READ_PREFERENCE = os.getenv("MONGO_HOT_READ_PREFERENCE", "secondaryPreferred")
+MONGO_HOT_READ_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_HOT_READ_MAX_STALENESS_SECONDS", "90"))
+MONGO_TELEMETRY_WRITE_W = os.getenv("MONGO_TELEMETRY_WRITE_W", "1")  # "0" for fire-and-forget
+MONGO_ADMIN_WRITE_TIMEOUT_MS = int(os.getenv("MONGO_ADMIN_WRITE_TIMEOUT_MS", "5000"))
+
+# Metrics (/metrics in the Prometheus text format)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # when set, scrapers must send "Authorization: Bearer <token>"
+METRICS_LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("METRICS_LOOP_LAG_INTERVAL_SECONDS", "1"))
+
+# Logging (utils/logging.py): level, per-logger overrides, "json" or "text" records, hot-path sampling
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "pymongo=WARNING,httpx=WARNING")  # comma-separated logger=LEVEL overrides
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "20"))  # INFO/DEBUG records per call site per window, 0 = no sampling
+LOG_SAMPLE_WINDOW_SECONDS = float(os.getenv("LOG_SAMPLE_WINDOW_SECONDS", "1"))
+
+# Request Tracing (utils/tracing.py; slowest recent traces at /admin/api/traces)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "True").lower() == "true"
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))  # share of new traces recorded
+TRACING_MAX_TRACES = int(os.getenv("TRACING_MAX_TRACES", "1000"))  # recent traces kept in memory
+TRACING_MAX_SPANS_PER_TRACE = int(os.getenv("TRACING_MAX_SPANS_PER_TRACE", "200"))
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "youtube-api-server")
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "")  # e.g. http://collector:4318/v1/traces
+TRACING_EXPORT_INTERVAL_SECONDS = float(os.getenv("TRACING_EXPORT_INTERVAL_SECONDS", "5"))
+
+# Upstream Endpoints (overridable so benchmarks/ can point the app at local stand-ins)
+SAVETUBE_API_URL = os.getenv("SAVETUBE_API_URL", "https://media.savetube.me/api")
+SAVETUBE_CDN_SCHEME = os.getenv("SAVETUBE_CDN_SCHEME", "https")  # scheme for the CDN host returned by random-cdn
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+# On-demand Profiling (admin-only; nothing runs until a window is opened)
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "True").lower() == "true"
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "120"))  # longest sampling / slow-callback window
+PROFILER_HISTORY = int(os.getenv("PROFILER_HISTORY", "5"))  # finished profiles kept per worker
+PROFILER_SLOW_CALLBACK_HISTORY = int(os.getenv("PROFILER_SLOW_CALLBACK_HISTORY", "200"))
@@ -0,0 +1,304 @@
+"""
+Versioned schema and index migrations for every collection the server queries.
+
+Runs at startup (RUN_MIGRATIONS_ON_STARTUP) or from the command line:
+
+    python -m database.migrations            # apply pending migrations
+    python -m database.migrations --status   # list applied and pending versions
+    python -m database.migrations --check    # fail if a hot query plan has a COLLSCAN or an unbounded SORT
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from pymongo import ASCENDING, DESCENDING
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from config import (
+    ADMIN_API_KEYS_MAX_PAGE_SIZE, USAGE_STATS_RETENTION_DAYS, USAGE_ROLLUP_RETENTION_DAYS, CONCURRENT_USER_TTL_SECONDS
+)
+from database.repository import get_sync_db
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+MIGRATIONS_COLLECTION = 'schema_migrations'
+LOCK_ID = 'lock'
+LOCK_SECONDS = 600
+
+class MigrationError(RuntimeError):
+    """A migration failed, or a hot query is not backed by an index"""
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Database], None]
+
+# (collection, keys, options) - each entry mirrors a query shape in the services
+CORE_INDEXES: List[Tuple[str, List[Tuple[str, int]], Dict[str, Any]]] = [
+    # Rate limiter and API key validation: {'key', 'is_active'}
+    ('api_keys', [('key', ASCENDING)], {'unique': True}),
+    # Admin listing (services/api_key_listing.py): filters end in the keyset sort
+    ('api_keys', [('created_at', DESCENDING), ('_id', DESCENDING)], {}),
+    ('api_keys', [('is_active', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], {}),
+    ('api_keys', [('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], {}),
+    ('api_keys', [('name_lower', ASCENDING)], {}),
+    # Admin top keys: {'is_active': True} sorted by usage_count
+    ('api_keys', [('is_active', ASCENDING), ('usage_count', DESCENDING)], {}),
+    ('users', [('username', ASCENDING)], {}),
+    # Hourly rate check, analytics windows, cache hit counts, cache warmer candidates
+    ('usage_stats', [('api_key', ASCENDING), ('timestamp', DESCENDING)], {}),
+    ('usage_stats', [('timestamp', DESCENDING)], {}),
+    ('usage_stats', [('status', ASCENDING), ('timestamp', DESCENDING)], {}),
+    # Legacy cache rows: ladder backfill, verification, dedupe, retention, upserts
+    ('content_cache', [('youtube_id', ASCENDING), ('file_type', ASCENDING),
+                       ('status', ASCENDING), ('quality', ASCENDING)], {}),
+    ('content_cache', [('telegram_file_id', ASCENDING)], {}),
+    ('content_cache', [('content_hash', ASCENDING), ('status', ASCENDING)], {}),
+    ('content_cache', [('status', ASCENDING), ('last_verified', ASCENDING)], {}),
+    ('content_cache', [('video_id', ASCENDING), ('content_type', ASCENDING)], {}),
+    # Session register/unregister and stale-session cleanup
+    ('concurrent_users', [('session_id', ASCENDING)], {}),
+    ('concurrent_users', [('last_activity', ASCENDING)], {}),
+    # Finished request jobs expire on their own
+    ('request_jobs', [('expires_at', ASCENDING)], {'expireAfterSeconds': 0}),
+]
+
+# (collection, field, expireAfterSeconds) - retention comes from config and is
+# re-applied on every run, so changing it only needs a restart
+def ttl_indexes() -> List[Tuple[str, str, int]]:
+    return [
+        ('usage_stats', 'timestamp', USAGE_STATS_RETENTION_DAYS * 86400),
+        ('usage_rollups', 'hour', USAGE_ROLLUP_RETENTION_DAYS * 86400),
+        ('concurrent_users', 'last_activity', CONCURRENT_USER_TTL_SECONDS),
+        ('admin_sessions', 'expires_at', 0),
+        ('request_jobs', 'expires_at', 0),
+    ]
+
+def _create_indexes(db: Database, indexes: Iterable[Tuple[str, List[Tuple[str, int]], Dict[str, Any]]]):
+    for collection, keys, options in indexes:
+        name = db[collection].create_index(keys, **options)
+        logger.info(f"   index {collection}.{name}")
+
+def _drop_index_if_exists(db: Database, collection: str, name: str):
+    try:
+        db[collection].drop_index(name)
+        logger.info(f"   dropped {collection}.{name}")
+    except OperationFailure:
+        pass  # index not found
+
+def sync_ttl_indexes(db: Database):
+    """Create each TTL index, or bring an existing index on the field in line with config"""
+    for collection, field, seconds in ttl_indexes():
+        existing = None
+        for name, info in db[collection].index_information().items():
+            if [key for key, _ in info['key']] == [field]:
+                existing = (name, info)
+        if existing is None:
+            db[collection].create_index([(field, ASCENDING)], expireAfterSeconds=seconds)
+            logger.info(f"   ttl {collection}.{field} = {seconds}s")
+            continue
+        name, info = existing
+        if info.get('expireAfterSeconds') == seconds:
+            continue
+        if 'expireAfterSeconds' in info:
+            db.command('collMod', collection, index={'name': name, 'expireAfterSeconds': seconds})
+        else:
+            # A plain index on the same key blocks the TTL one; replace it
+            db[collection].drop_index(name)
+            db[collection].create_index([(field, ASCENDING)], expireAfterSeconds=seconds)
+        logger.info(f"   ttl {collection}.{field} = {seconds}s")
+
+def _core_indexes(db: Database):
+    _create_indexes(db, CORE_INDEXES)
+
+def _api_key_name_lower(db: Database):
+    """Lower-cased key names for index-backed, case-insensitive prefix search"""
+    db.api_keys.update_many(
+        {'name_lower': {'$exists': False}, 'name': {'$type': 'string'}},
+        [{'$set': {'name_lower': {'$toLower': '$name'}}}]
+    )
+
+def _api_key_is_active(db: Database):
+    """Queries filter on is_active; older definitions indexed and wrote 'active'"""
+    _drop_index_if_exists(db, 'api_keys', 'active_1_created_at_-1')
+    db.api_keys.update_many(
+        {'is_active': {'$exists': False}, 'active': {'$exists': True}},
+        [{'$set': {'is_active': '$active'}}, {'$unset': 'active'}]
+    )
+    db.api_keys.update_many({'is_active': {'$exists': False}}, {'$set': {'is_active': True}})
+
+def _ttl_expiry(db: Database):
+    """Expiry moves from inline delete_many calls to TTL indexes"""
+    db.admin_sessions.create_index([('session_id', ASCENDING)])
+    sync_ttl_indexes(db)
+
+# Append only: applied versions are recorded and never re-run
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'core_indexes', _core_indexes),
+    Migration(2, 'api_key_name_lower', _api_key_name_lower),
+    Migration(3, 'api_key_is_active', _api_key_is_active),
+    Migration(4, 'ttl_expiry', _ttl_expiry),
+]
+TTL_VERSION = 4
+
+KEYSET_SORT = [('created_at', DESCENDING), ('_id', DESCENDING)]
+
+# (collection, filter field) of hot queries allowed to sort in memory. The admin name
+# search uses the name_lower index, so its matches are sorted after the scan; the listing
+# never reads more than ADMIN_API_KEYS_MAX_PAGE_SIZE + 1 rows, which makes that a top-k
+# SORT capped by the page size. Its scan still grows with the keys sharing the prefix.
+TOP_K_SORTS = {('api_keys', 'name_lower')}
+
+# Representative filters (and sorts) of the hot paths; each must be answered from an index,
+# and sorted ones must read in index order unless listed in TOP_K_SORTS
+def hot_queries() -> List[Tuple[str, Dict[str, Any], Optional[List[Tuple[str, int]]]]]:
+    now = datetime.utcnow()
+    hour_ago = now - timedelta(hours=1)
+    return [
+        ('api_keys', {'key': 'ytapi_example', 'is_active': True}, None),
+        ('api_keys', {}, KEYSET_SORT),
+        ('api_keys', {'is_active': True}, KEYSET_SORT),
+        ('api_keys', {'name_lower': {'$regex': '^prod'}}, KEYSET_SORT),
+        ('users', {'username': {'$regex': '^admin'}}, None),
+        ('usage_stats', {'api_key': 'ytapi_example', 'timestamp': {'$gte': hour_ago}}, None),
+        ('usage_stats', {'timestamp': {'$gte': hour_ago}}, None),
+        ('usage_stats', {'timestamp': {'$gte': hour_ago}, 'status': 'cache_hit'}, None),
+        ('content_cache', {'youtube_id': 'dQw4w9WgXcQ', 'file_type': 'video', 'status': 'active',
+                           'telegram_file_id': {'$exists': True}}, None),
+        ('content_cache', {'telegram_file_id': 'file-id'}, None),
+        ('content_cache', {'content_hash': 'hash', 'status': 'active'}, None),
+        ('content_cache', {'status': 'inactive', 'last_verified': {'$lt': now}}, None),
+        ('concurrent_users', {'session_id': 'session'}, None),
+        ('concurrent_users', {'last_activity': {'$gte': hour_ago}}, None),
+        ('admin_sessions', {'session_id': 'session', 'is_active': True, 'expires_at': {'$gt': now}}, None),
+        ('request_jobs', {'expires_at': {'$lt': now}}, None),
+    ]
+
+def plan_nodes(plan: Any) -> List[Dict[str, Any]]:
+    """Every stage of an explain() plan tree (classic and SBE layouts)"""
+    nodes = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            nodes.append(plan)
+        for value in plan.values():
+            nodes.extend(plan_nodes(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            nodes.extend(plan_nodes(item))
+    return nodes
+
+def plan_stages(plan: Any) -> List[str]:
+    """Every stage name in an explain() plan tree"""
+    return [node['stage'] for node in plan_nodes(plan)]
+
+def check_query_plans(db: Optional[Database] = None) -> List[str]:
+    """Descriptions of hot queries whose winning plan scans a collection or sorts every match"""
+    db = db if db is not None else get_sync_db()
+    offenders = []
+    for collection, query, sort in hot_queries():
+        top_k = any((collection, field) in TOP_K_SORTS for field in query)
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if top_k:
+            cursor = cursor.limit(ADMIN_API_KEYS_MAX_PAGE_SIZE + 1)
+        explain = cursor.explain()
+        nodes = plan_nodes(explain.get('queryPlanner', {}).get('winningPlan', {}))
+        shape = f"{collection} {query}" + (f" sort {sort}" if sort else '')
+        if any(node['stage'] == 'COLLSCAN' for node in nodes):
+            offenders.append(f"COLLSCAN: {shape}")
+        # A SORT with a limitAmount keeps only the top rows; anything else sorts every match
+        if any(node['stage'] == 'SORT' and not (top_k and node.get('limitAmount')) for node in nodes):
+            offenders.append(f"SORT: {shape}")
+    return offenders
+
+def applied_versions(db: Database) -> Dict[int, Dict[str, Any]]:
+    return {
+        doc['_id']: doc
+        for doc in db[MIGRATIONS_COLLECTION].find({'_id': {'$type': 'int'}})
+    }
+
+def _acquire_lock(db: Database) -> bool:
+    """One runner at a time across workers; a stale lock is taken over"""
+    now = datetime.utcnow()
+    collection = db[MIGRATIONS_COLLECTION]
+    try:
+        collection.insert_one({'_id': LOCK_ID, 'expires_at': now + timedelta(seconds=LOCK_SECONDS)})
+        return True
+    except DuplicateKeyError:
+        result = collection.update_one(
+            {'_id': LOCK_ID, 'expires_at': {'$lt': now}},
+            {'$set': {'expires_at': now + timedelta(seconds=LOCK_SECONDS)}}
+        )
+        return result.modified_count == 1
+
+def _release_lock(db: Database):
+    db[MIGRATIONS_COLLECTION].delete_one({'_id': LOCK_ID})
+
+def run_migrations(db: Optional[Database] = None, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations in version order; returns the versions applied"""
+    db = db if db is not None else get_sync_db()
+    if not _acquire_lock(db):
+        logger.info("Migrations are being applied by another process, skipping")
+        return []
+
+    applied = []
+    try:
+        done = applied_versions(db)
+        for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+            if migration.version in done or (target is not None and migration.version > target):
+                continue
+            logger.info(f"🔧 Applying migration {migration.version}: {migration.name}")
+            started = time.perf_counter()
+            try:
+                migration.apply(db)
+            except Exception as e:
+                raise MigrationError(f"Migration {migration.version} ({migration.name}) failed: {e}") from e
+            db[MIGRATIONS_COLLECTION].insert_one({
+                '_id': migration.version,
+                'name': migration.name,
+                'applied_at': datetime.utcnow(),
+                'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+            })
+            applied.append(migration.version)
+        if TTL_VERSION in done:
+            sync_ttl_indexes(db)  # pick up retention changes
+    finally:
+        _release_lock(db)
+
+    if applied:
+        logger.info(f"✅ Applied migrations: {applied}")
+    return applied
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Apply schema and index migrations")
+    parser.add_argument('--status', action='store_true', help="list applied and pending migrations")
+    parser.add_argument('--check', action='store_true', help="explain hot queries and fail on COLLSCAN or SORT")
+    parser.add_argument('--target', type=int, help="apply migrations up to this version")
+    args = parser.parse_args(argv)
+
+    db = get_sync_db()
+    if args.status:
+        done = applied_versions(db)
+        for migration in MIGRATIONS:
+            state = done[migration.version]['applied_at'].isoformat() if migration.version in done else 'pending'
+            print(f"{migration.version:>4}  {migration.name:<28} {state}")
+        return 0
+
+    if not args.check:
+        run_migrations(db, args.target)
+        return 0
+
+    offenders = check_query_plans(db)
+    for offender in offenders:
+        print(offender)
+    if offenders:
+        print(f"❌ {len(offenders)} hot query plans scan a collection or sort every match")
+        return 1
+    print(f"✅ All {len(hot_queries())} hot queries use an index")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
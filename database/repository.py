@@ -0,0 +1,400 @@
+"""
+MongoDB repository - one tuned client per process, typed collection accessors and a sync facade
+"""
+import os
+import threading
+from typing import Any, Dict, Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import monitoring
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import (
+    Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+)
+from pymongo.write_concern import WriteConcern
+from config import (
+    MONGO_DB_URI, MONGODB_DATABASE, MONGO_APP_NAME,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_HOT_READ_PREFERENCE, MONGO_HOT_READ_MAX_STALENESS_SECONDS,
+    MONGO_TELEMETRY_WRITE_W, MONGO_ADMIN_WRITE_TIMEOUT_MS
+)
+from utils.logging import LOGGER
+from utils.metrics import metrics, mongodb_command_duration
+from utils.tracing import tracer
+
+logger = LOGGER(__name__)
+
+READ_PREFERENCES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest
+}
+
+def read_preference(mode: str, max_staleness: int = -1):
+    """Read preference by name; servers can't be more than 90s stale by spec, so shorter bounds are raised"""
+    cls = READ_PREFERENCES.get(mode, SecondaryPreferred)
+    if cls is Primary:
+        return Primary()
+    return cls(max_staleness=max(90, max_staleness) if max_staleness > 0 else -1)
+
+def _write_w(value: str):
+    return int(value) if value.isdigit() else value
+
+# Read/write settings per operation class, applied to the database and collection handles:
+#   hot_read        - cache index reads; any member within the staleness bound, usually the nearest
+#   analytics_read  - aggregations and background scans, kept off the primary when secondaries exist
+#   telemetry_write - usage and session rows; acknowledged by one member (or none with w=0)
+#   admin_write     - key and user management; majority-acknowledged and read back from the primary
+# Everything else uses the client defaults (primary reads, w=1 writes).
+OPERATION_PROFILES: Dict[str, Dict[str, Any]] = {
+    'default': {},
+    'hot_read': {
+        'read_preference': read_preference(MONGO_HOT_READ_PREFERENCE, MONGO_HOT_READ_MAX_STALENESS_SECONDS),
+        'read_concern': ReadConcern('local')
+    },
+    'analytics_read': {
+        'read_preference': SecondaryPreferred(),
+        'read_concern': ReadConcern('local')
+    },
+    'telemetry_write': {
+        'write_concern': WriteConcern(w=_write_w(MONGO_TELEMETRY_WRITE_W))
+    },
+    'admin_write': {
+        'read_preference': Primary(),
+        'read_concern': ReadConcern('majority'),
+        'write_concern': WriteConcern(w='majority', wtimeout=MONGO_ADMIN_WRITE_TIMEOUT_MS)
+    }
+}
+
+def describe_profile(profile: str) -> Dict[str, Any]:
+    options = OPERATION_PROFILES[profile]
+    return {
+        'read_preference': options['read_preference'].document if 'read_preference' in options else 'client default',
+        'read_concern': options['read_concern'].level if 'read_concern' in options else 'client default',
+        'write_concern': options['write_concern'].document if 'write_concern' in options else 'client default'
+    }
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool counters fed by pymongo's CMAP events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.created = 0
+            self.closed = 0
+            self.checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.pool_cleared = 0
+            self.max_checked_out = 0
+            self.checkout_wait_total = 0.0
+            self.checkout_wait_max = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'open': self.created - self.closed,
+                'created': self.created,
+                'closed': self.closed,
+                'checked_out': self.checked_out,
+                'max_checked_out': self.max_checked_out,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'pool_cleared': self.pool_cleared,
+                'avg_checkout_wait_ms': round(self.checkout_wait_total / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                'max_checkout_wait_ms': round(self.checkout_wait_max * 1000, 2)
+            }
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    def connection_checked_out(self, event):
+        # duration (time spent waiting for the pool) is reported by pymongo 4.7+
+        wait = getattr(event, 'duration', 0.0) or 0.0
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.checkout_wait_total += wait
+            self.checkout_wait_max = max(self.checkout_wait_max, wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_cleared += 1
+
+    # Events that carry nothing worth counting
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+class CommandMetrics(monitoring.CommandListener):
+    """Feeds driver-measured command latency into mongodb_command_duration_seconds and the current trace.
+
+    Motor runs pymongo calls in executor threads with a copy of the caller's
+    context, so the span of the awaiting coroutine is current here.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        duration = event.duration_micros / 1e6
+        mongodb_command_duration.observe(duration, command=event.command_name, outcome='ok')
+        tracer.record(f"mongodb.{event.command_name}", duration, **{'db.system': 'mongodb'})
+
+    def failed(self, event):
+        duration = event.duration_micros / 1e6
+        mongodb_command_duration.observe(duration, command=event.command_name, outcome='error')
+        tracer.record(f"mongodb.{event.command_name}", duration, error=str(event.failure)[:200], **{'db.system': 'mongodb'})
+
+class MongoRepository:
+    """The one MongoDB client of the process.
+
+    The Motor client is created lazily and recreated after a fork. Motor binds
+    a client to the event loop it is first used on, so async access belongs
+    on the shared background loop (routes run their coroutines there through
+    ``background_loop.run``). Synchronous callers (admin pages, the rate
+    limiter, scripts) use :attr:`sync_db`, which is backed by the pymongo
+    client Motor wraps - the same connection pool, not a second one.
+    """
+
+    def __init__(self, uri: str = MONGO_DB_URI, database: str = MONGODB_DATABASE):
+        self.uri = uri
+        self.database = database
+        self.pool_monitor = PoolMonitor()
+        self.command_metrics = CommandMetrics()
+        self.connected = False
+        self._client: Optional[AsyncIOMotorClient] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        # Database handles per (kind, profile); rebuilt with the client
+        self._handles: Dict[Any, Any] = {}
+
+    def pool_options(self) -> Dict[str, Any]:
+        return {
+            'maxPoolSize': MONGO_MAX_POOL_SIZE,
+            'minPoolSize': MONGO_MIN_POOL_SIZE,
+            'maxIdleTimeMS': MONGO_MAX_IDLE_TIME_MS,
+            'waitQueueTimeoutMS': MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            'serverSelectionTimeoutMS': MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            'connectTimeoutMS': MONGO_CONNECT_TIMEOUT_MS
+        }
+
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self.pool_monitor.reset()
+                    self._handles = {}
+                    self._client = AsyncIOMotorClient(
+                        self.uri,
+                        appname=MONGO_APP_NAME,
+                        retryWrites=True,
+                        retryReads=True,
+                        event_listeners=[self.pool_monitor, self.command_metrics],
+                        **self.pool_options()
+                    )
+                    self._pid = os.getpid()
+                    logger.info(f"MongoDB client created (pool {MONGO_MIN_POOL_SIZE}-{MONGO_MAX_POOL_SIZE})")
+        return self._client
+
+    async def connect(self) -> bool:
+        """Ping the server; collection accessors return None until this succeeds"""
+        try:
+            await self.client.admin.command('ping')
+            self.connected = True
+            logger.info("Connected to MongoDB successfully")
+            return True
+        except Exception as e:
+            self.connected = False
+            logger.error(f"MongoDB connection failed: {e}")
+            return False
+
+    def close(self):
+        """Close the pool; the next access opens a new one"""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+            self._handles = {}
+            self.connected = False
+
+    def _handle(self, kind: str, profile: str):
+        if profile not in OPERATION_PROFILES:
+            raise ValueError(f"Unknown operation profile: {profile}")
+        client = self.client
+        handle = self._handles.get((kind, profile))
+        if handle is None:
+            source = client if kind == 'async' else client.delegate
+            handle = source.get_database(self.database, **OPERATION_PROFILES[profile])
+            self._handles[(kind, profile)] = handle
+        return handle
+
+    def get_database(self, profile: str = 'default') -> Optional[AsyncIOMotorDatabase]:
+        """Async database handle with the profile's read/write settings, None while disconnected"""
+        return self._handle('async', profile) if self.connected else None
+
+    @property
+    def db(self) -> Optional[AsyncIOMotorDatabase]:
+        return self.get_database()
+
+    def collection(self, name: str, profile: str = 'default') -> Optional[AsyncIOMotorCollection]:
+        db = self.get_database(profile)
+        return db[name] if db is not None else None
+
+    def get_sync_database(self, profile: str = 'default') -> Database:
+        """Synchronous handle on the same pool; never close its client"""
+        return self._handle('sync', profile)
+
+    @property
+    def sync_db(self) -> Database:
+        return self.get_sync_database()
+
+    def sync_collection(self, name: str, profile: str = 'default') -> Collection:
+        return self.get_sync_database(profile)[name]
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return {
+            'connected': self.connected,
+            'pid': self._pid,
+            'options': self.pool_options(),
+            'connections': self.pool_monitor.stats(),
+            'profiles': {name: describe_profile(name) for name in OPERATION_PROFILES}
+        }
+
+    # Typed accessors for the async (Motor) collections
+    @property
+    def users(self) -> Optional[AsyncIOMotorCollection]:
+        return self.collection('users')
+
+    @property
+    def api_keys(self) -> Optional[AsyncIOMotorCollection]:
+        return self.collection('api_keys')
+
+    @property
+    def content_cache(self) -> Optional[AsyncIOMotorCollection]:
+        return self.collection('content_cache')
+
+    @property
+    def content_ladder(self) -> Optional[AsyncIOMotorCollection]:
+        return self.collection('content_ladder')
+
+    @property
+    def usage_stats(self) -> Optional[AsyncIOMotorCollection]:
+        return self.collection('usage_stats')
+
+    @property
+    def usage_rollups(self) -> Optional[AsyncIOMotorCollection]:
+        return self.collection('usage_rollups')
+
+    @property
+    def concurrent_users(self) -> Optional[AsyncIOMotorCollection]:
+        return self.collection('concurrent_users')
+
+    @property
+    def admin_sessions(self) -> Optional[AsyncIOMotorCollection]:
+        return self.collection('admin_sessions')
+
+    @property
+    def request_jobs(self) -> Optional[AsyncIOMotorCollection]:
+        return self.collection('request_jobs')
+
+# Global MongoDB repository instance
+repository = MongoRepository()
+
+async def init_db() -> bool:
+    """Initialize database connection"""
+    return await repository.connect()
+
+def get_db(profile: str = 'default') -> Optional[AsyncIOMotorDatabase]:
+    """Async database handle, or None before init_db succeeded"""
+    return repository.get_database(profile)
+
+def get_sync_db(profile: str = 'default') -> Database:
+    """Synchronous database handle backed by the shared pool; never close its client"""
+    return repository.get_sync_database(profile)
+
+def get_users_collection(profile: str = 'default'):
+    """Get users collection"""
+    return repository.collection('users', profile)
+
+def get_api_keys_collection(profile: str = 'default'):
+    """Get api_keys collection"""
+    return repository.collection('api_keys', profile)
+
+def get_content_cache_collection(profile: str = 'default'):
+    """Get content_cache collection"""
+    return repository.collection('content_cache', profile)
+
+def get_content_ladder_collection(profile: str = 'default'):
+    """Get content_ladder collection (one document per video with all cached qualities)"""
+    return repository.collection('content_ladder', profile)
+
+def get_usage_stats_collection(profile: str = 'default'):
+    """Get usage_stats collection"""
+    return repository.collection('usage_stats', profile)
+
+def get_usage_rollups_collection(profile: str = 'default'):
+    """Get usage_rollups collection (hourly aggregates of usage_stats)"""
+    return repository.collection('usage_rollups', profile)
+
+def get_concurrent_users_collection(profile: str = 'default'):
+    """Get concurrent_users collection"""
+    return repository.collection('concurrent_users', profile)
+
+def get_admin_sessions_collection(profile: str = 'default'):
+    """Get admin_sessions collection"""
+    return repository.collection('admin_sessions', profile)
+
+def get_request_jobs_collection(profile: str = 'default'):
+    """Get request_jobs collection (asynchronous /video and /audio jobs)"""
+    return repository.collection('request_jobs', profile)
+
+def _register_pool_metrics():
+    """Connection pool counters, read from the pool monitor at scrape time"""
+    fields = (
+        ('open', 'gauge', 'Open connections in the MongoDB pool'),
+        ('checked_out', 'gauge', 'Connections currently checked out of the MongoDB pool'),
+        ('checkouts', 'counter', 'Connection checkouts from the MongoDB pool'),
+        ('checkout_failures', 'counter', 'Failed connection checkouts (pool wait timeouts, connection errors)'),
+        ('avg_checkout_wait_ms', 'gauge', 'Average wait for a pooled connection in milliseconds'),
+        ('max_checkout_wait_ms', 'gauge', 'Longest wait for a pooled connection in milliseconds')
+    )
+    for field, metric_type, help in fields:
+        name = f"mongodb_pool_{field}_total" if metric_type == 'counter' else f"mongodb_pool_{field}"
+        metrics.gauge(name, help, function=lambda field=field: repository.pool_monitor.stats()[field], type=metric_type)
+    metrics.gauge('mongodb_pool_max_size', 'Configured maximum MongoDB pool size', function=lambda: MONGO_MAX_POOL_SIZE)
+
+_register_pool_metrics()
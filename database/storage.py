@@ -0,0 +1,614 @@
+"""
+Storage backends for the request path - quality ladder cache index, API keys and usage.
+
+MongoDB is the default. The SQLite engine (WAL mode, one file) serves the same
+operations in-process for single-node deployments and tests, so a cache lookup
+costs microseconds instead of a network round trip:
+
+    STORAGE_BACKEND=sqlite SQLITE_PATH=data/storage.sqlite3 python main.py
+    python -m database.storage create-key "My key" --rate-limit 1000
+
+Admin pages and analytics keep using MongoDB through database/repository.py.
+"""
+import argparse
+import asyncio
+import contextvars
+import functools
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from pymongo import UpdateOne
+from config import STORAGE_BACKEND, SQLITE_PATH, SQLITE_BUSY_TIMEOUT_MS
+from database.repository import repository
+from utils.logging import LOGGER
+from utils.tracing import tracer
+
+logger = LOGGER(__name__)
+
+class StorageBackend:
+    """Operations the request path needs; documents use the MongoDB field names"""
+    name = 'base'
+
+    # Cache index: one document per (youtube_id, file_type) with a map of quality -> Telegram file
+    async def get_ladder(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def touch_ladder(self, doc_id: str, served: str, upgrade_to: Optional[str] = None):
+        """Count an access to one quality slot, and optionally a request for a higher one"""
+        raise NotImplementedError
+
+    async def claim_upgrade(self, doc_id: str, quality: str, threshold: int) -> bool:
+        """Reset the upgrade counter if it reached threshold; True for the one caller that did"""
+        raise NotImplementedError
+
+    async def put_ladder_quality(self, doc_id: str, youtube_id: str, content_type: str, key: str,
+                                 entry: Dict[str, Any], title: Optional[str], duration: Any):
+        raise NotImplementedError
+
+    async def remove_ladder_quality(self, doc_id: str, key: str):
+        raise NotImplementedError
+
+    async def insert_ladder(self, doc: Dict[str, Any]):
+        """Insert a complete ladder document unless one exists"""
+        raise NotImplementedError
+
+    async def merge_ladder_qualities(self, doc_id: str, qualities: Dict[str, Dict[str, Any]]):
+        """Add the legacy quality slots an existing ladder document lacks, and mark it merged"""
+        raise NotImplementedError
+
+    async def legacy_cache_rows(self, youtube_id: str, content_type: str) -> List[Dict[str, Any]]:
+        """Per-quality rows written before the ladder existed (MongoDB only)"""
+        return []
+
+    # API keys
+    async def find_key(self, key: str, active_only: bool = True) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def update_key(self, key: str, set_fields: Dict[str, Any],
+                         inc_fields: Optional[Dict[str, int]] = None) -> bool:
+        raise NotImplementedError
+
+    async def insert_key(self, doc: Dict[str, Any]):
+        raise NotImplementedError
+
+    # Usage
+    async def insert_usage(self, doc: Dict[str, Any]):
+        raise NotImplementedError
+
+    async def count_usage_since(self, api_key: str, since: datetime) -> int:
+        raise NotImplementedError
+
+    async def usage_by_hour(self, since: datetime, until: datetime) -> Optional[List[Dict[str, Any]]]:
+        """Request count and response time totals per (hour, api_key, endpoint, status); None while unavailable"""
+        raise NotImplementedError
+
+    async def expire_usage(self, before: datetime) -> int:
+        """Delete raw usage older than before; backends with TTL indexes do nothing"""
+        return 0
+
+    def close(self):
+        pass
+
+class MongoStorage(StorageBackend):
+    """The shared Motor client (database/repository.py); None / no-op while disconnected"""
+    name = 'mongodb'
+
+    async def get_ladder(self, doc_id):
+        collection = repository.collection('content_ladder', 'hot_read')
+        if collection is None:
+            return None
+        return await collection.find_one({'_id': doc_id})
+
+    async def touch_ladder(self, doc_id, served, upgrade_to=None):
+        collection = repository.content_ladder
+        if collection is None:
+            return
+        now = datetime.utcnow()
+        update = {
+            '$inc': {'access_count': 1, f'qualities.{served}.access_count': 1},
+            '$set': {'last_accessed': now, f'qualities.{served}.last_accessed': now}
+        }
+        if upgrade_to:
+            update['$inc'][f'upgrade_requests.{upgrade_to}'] = 1
+        await collection.update_one({'_id': doc_id}, update)
+
+    async def claim_upgrade(self, doc_id, quality, threshold):
+        collection = repository.content_ladder
+        if collection is None:
+            return False
+        claim = await collection.update_one(
+            {'_id': doc_id, f'upgrade_requests.{quality}': {'$gte': threshold}},
+            {'$set': {f'upgrade_requests.{quality}': 0}}
+        )
+        return claim.modified_count == 1
+
+    async def put_ladder_quality(self, doc_id, youtube_id, content_type, key, entry, title, duration):
+        collection = repository.content_ladder
+        if collection is None:
+            return
+        now = datetime.utcnow()
+        await collection.update_one(
+            {'_id': doc_id},
+            {
+                '$set': {
+                    f'qualities.{key}': entry,
+                    'title': title,
+                    'duration': duration,
+                    'updated_at': now
+                },
+                '$unset': {f'upgrade_requests.{key}': ''},
+                '$setOnInsert': {
+                    'youtube_id': youtube_id,
+                    'file_type': content_type,
+                    'access_count': 0,
+                    'created_at': now
+                }
+            },
+            upsert=True
+        )
+
+    async def remove_ladder_quality(self, doc_id, key):
+        collection = repository.content_ladder
+        if collection is None:
+            return
+        await collection.update_one(
+            {'_id': doc_id},
+            {'$unset': {f'qualities.{key}': '', f'upgrade_requests.{key}': ''}}
+        )
+
+    async def insert_ladder(self, doc):
+        collection = repository.content_ladder
+        if collection is None:
+            return
+        await collection.update_one(
+            {'_id': doc['_id']},
+            {'$setOnInsert': {k: v for k, v in doc.items() if k != '_id'}},
+            upsert=True
+        )
+
+    async def merge_ladder_qualities(self, doc_id, qualities):
+        collection = repository.content_ladder
+        if collection is None:
+            return
+        # Slots uploaded since the legacy rows were written win: only absent keys are added
+        requests = [
+            UpdateOne({'_id': doc_id, f'qualities.{key}': {'$exists': False}}, {'$set': {f'qualities.{key}': entry}})
+            for key, entry in qualities.items()
+        ]
+        requests.append(UpdateOne({'_id': doc_id}, {'$set': {'legacy_merged': True}}))
+        await collection.bulk_write(requests, ordered=False)
+
+    async def legacy_cache_rows(self, youtube_id, content_type):
+        collection = repository.collection('content_cache', 'hot_read')
+        if collection is None:
+            return []
+        cursor = collection.find(
+            {
+                'youtube_id': youtube_id,
+                'file_type': content_type,
+                'status': 'active',
+                'telegram_file_id': {'$exists': True}
+            },
+            {'title': 1, 'duration': 1, 'telegram_file_id': 1, 'quality': 1,
+             'file_size': 1, 'content_hash': 1, 'upload_date': 1, 'access_count': 1, 'last_accessed': 1}
+        )
+        return await cursor.to_list(None)
+
+    async def find_key(self, key, active_only=True):
+        collection = repository.api_keys
+        if collection is None:
+            return None
+        query = {'key': key, 'is_active': True} if active_only else {'key': key}
+        return await collection.find_one(query)
+
+    async def update_key(self, key, set_fields, inc_fields=None):
+        collection = repository.api_keys
+        if collection is None:
+            return False
+        update = {'$set': set_fields}
+        if inc_fields:
+            update['$inc'] = inc_fields
+        result = await collection.update_one({'key': key}, update)
+        return result.modified_count > 0
+
+    async def insert_key(self, doc):
+        collection = repository.api_keys
+        if collection is not None:
+            await collection.insert_one(doc)
+
+    async def insert_usage(self, doc):
+        collection = repository.collection('usage_stats', 'telemetry_write')
+        if collection is not None:
+            await collection.insert_one(doc)
+
+    async def count_usage_since(self, api_key, since):
+        collection = repository.usage_stats
+        if collection is None:
+            return 0
+        return await collection.count_documents({'api_key': api_key, 'timestamp': {'$gte': since}})
+
+    async def usage_by_hour(self, since, until):
+        collection = repository.collection('usage_stats', 'analytics_read')
+        if collection is None:
+            return None
+        pipeline = [
+            {'$match': {'timestamp': {'$gte': since, '$lt': until}}},
+            {'$group': {
+                '_id': {
+                    'hour': {'$dateFromParts': {
+                        'year': {'$year': '$timestamp'},
+                        'month': {'$month': '$timestamp'},
+                        'day': {'$dayOfMonth': '$timestamp'},
+                        'hour': {'$hour': '$timestamp'}
+                    }},
+                    'api_key': '$api_key',
+                    'endpoint': '$endpoint',
+                    'status': '$status'
+                },
+                'requests': {'$sum': 1},
+                'response_time_total': {'$sum': {'$ifNull': ['$response_time', 0]}},
+                'response_time_max': {'$max': {'$ifNull': ['$response_time', 0]}}
+            }}
+        ]
+        rows = await collection.aggregate(pipeline, allowDiskUse=True).to_list(None)
+        return [
+            {'hour': row['_id']['hour'], 'api_key': row['_id'].get('api_key'), 'endpoint': row['_id'].get('endpoint'),
+             'status': row['_id'].get('status'), 'requests': row['requests'],
+             'response_time_total': row['response_time_total'], 'response_time_max': row['response_time_max']}
+            for row in rows
+        ]
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS content_ladder (
+    id TEXT PRIMARY KEY,
+    youtube_id TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    title TEXT,
+    duration REAL,
+    access_count INTEGER NOT NULL DEFAULT 0,
+    last_accessed TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS ladder_qualities (
+    ladder_id TEXT NOT NULL,
+    quality TEXT NOT NULL,
+    telegram_file_id TEXT NOT NULL,
+    file_size INTEGER,
+    content_hash TEXT,
+    upload_date TEXT,
+    access_count INTEGER NOT NULL DEFAULT 0,
+    last_accessed TEXT,
+    PRIMARY KEY (ladder_id, quality)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ladder_upgrades (
+    ladder_id TEXT NOT NULL,
+    quality TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (ladder_id, quality)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS api_keys (
+    key TEXT PRIMARY KEY,
+    id TEXT UNIQUE,
+    user_id TEXT,
+    name TEXT,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    rate_limit INTEGER,
+    daily_limit INTEGER,
+    daily_requests INTEGER NOT NULL DEFAULT 0,
+    last_reset_date TEXT,
+    usage_count INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    last_used TEXT,
+    last_request_time TEXT
+);
+CREATE TABLE IF NOT EXISTS usage_stats (
+    id TEXT PRIMARY KEY,
+    api_key TEXT,
+    endpoint TEXT,
+    youtube_id TEXT,
+    quality TEXT,
+    status TEXT,
+    response_time REAL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS usage_stats_api_key_timestamp ON usage_stats (api_key, timestamp);
+CREATE INDEX IF NOT EXISTS usage_stats_timestamp ON usage_stats (timestamp);
+"""
+
+# Columns update_key may touch; everything else in the document is ignored
+KEY_COLUMNS = {
+    'user_id', 'name', 'is_active', 'rate_limit', 'daily_limit', 'daily_requests',
+    'last_reset_date', 'usage_count', 'created_at', 'last_used', 'last_request_time'
+}
+KEY_DATETIMES = {'created_at', 'last_used', 'last_request_time'}
+QUALITY_FIELDS = ('telegram_file_id', 'file_size', 'content_hash', 'upload_date', 'access_count', 'last_accessed')
+
+def _ts(value: Optional[datetime]) -> Optional[str]:
+    # Fixed width so timestamps compare correctly as text
+    return value.strftime('%Y-%m-%dT%H:%M:%S.%f') if isinstance(value, datetime) else value
+
+def _dt(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+class SQLiteStorage(StorageBackend):
+    """Embedded single-file engine in WAL mode.
+
+    Readers never block the writer, and with synchronous=NORMAL a commit does
+    not wait for fsync, so lookups and counter updates stay in the
+    microsecond range. The sqlite3 calls run on one storage thread per
+    process, never on the event loop: several worker processes may share
+    the file, and a worker waiting up to SQLITE_BUSY_TIMEOUT_MS for another
+    one's write lock only holds back its own storage calls.
+    """
+    name = 'sqlite'
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # One connection, so one thread: calls queue up instead of contending for the lock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-storage')
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    if self.path != ':memory:' and os.path.dirname(self.path):
+                        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+                    conn.row_factory = sqlite3.Row
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.execute('PRAGMA synchronous=NORMAL')
+                    conn.execute(f'PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}')
+                    conn.executescript(SQLITE_SCHEMA)
+                    self._conn = conn
+                    logger.info(f"SQLite storage opened: {self.path}")
+        return self._conn
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        """Run func on the storage thread, in the caller's context so its spans join the current trace"""
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(context.run, func, *args)
+        )
+
+    def _transaction(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        with tracer.span('sqlite.transaction', **{'db.system': 'sqlite'}), self._lock:
+            conn = self.conn
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(conn)
+                conn.execute('COMMIT')
+                return result
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _fetch(self, sql: str, params=()) -> List[sqlite3.Row]:
+        with tracer.span('sqlite.query', **{'db.system': 'sqlite', 'db.statement': sql}), self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    async def _tx(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        """func(conn) inside one IMMEDIATE transaction, on the storage thread"""
+        return await self._run(self._transaction, func)
+
+    async def _query(self, sql: str, params=()) -> List[sqlite3.Row]:
+        return await self._run(self._fetch, sql, params)
+
+    def _read_ladder(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._fetch('SELECT * FROM content_ladder WHERE id = ?', (doc_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        qualities = {}
+        for q in self._fetch('SELECT * FROM ladder_qualities WHERE ladder_id = ?', (doc_id,)):
+            qualities[q['quality']] = {
+                'telegram_file_id': q['telegram_file_id'],
+                'file_size': q['file_size'],
+                'content_hash': q['content_hash'],
+                'upload_date': q['upload_date'],
+                'access_count': q['access_count'],
+                'last_accessed': _dt(q['last_accessed'])
+            }
+        upgrades = {
+            u['quality']: u['requests']
+            for u in self._fetch('SELECT quality, requests FROM ladder_upgrades WHERE ladder_id = ?', (doc_id,))
+        }
+        return {
+            '_id': row['id'],
+            'youtube_id': row['youtube_id'],
+            'file_type': row['file_type'],
+            'title': row['title'],
+            'duration': row['duration'],
+            'access_count': row['access_count'],
+            'last_accessed': _dt(row['last_accessed']),
+            'created_at': _dt(row['created_at']),
+            'updated_at': _dt(row['updated_at']),
+            'qualities': qualities,
+            'upgrade_requests': upgrades
+        }
+
+    async def get_ladder(self, doc_id):
+        return await self._run(self._read_ladder, doc_id)
+
+    async def touch_ladder(self, doc_id, served, upgrade_to=None):
+        now = _ts(datetime.utcnow())
+
+        def touch(conn):
+            conn.execute('UPDATE content_ladder SET access_count = access_count + 1, last_accessed = ? WHERE id = ?',
+                         (now, doc_id))
+            conn.execute('UPDATE ladder_qualities SET access_count = access_count + 1, last_accessed = ? '
+                         'WHERE ladder_id = ? AND quality = ?', (now, doc_id, served))
+            if upgrade_to:
+                conn.execute('INSERT INTO ladder_upgrades (ladder_id, quality, requests) VALUES (?, ?, 1) '
+                             'ON CONFLICT (ladder_id, quality) DO UPDATE SET requests = requests + 1',
+                             (doc_id, upgrade_to))
+        await self._tx(touch)
+
+    async def claim_upgrade(self, doc_id, quality, threshold):
+        def claim(conn):
+            cursor = conn.execute('UPDATE ladder_upgrades SET requests = 0 '
+                                  'WHERE ladder_id = ? AND quality = ? AND requests >= ?',
+                                  (doc_id, quality, threshold))
+            return cursor.rowcount == 1
+        return await self._tx(claim)
+
+    async def put_ladder_quality(self, doc_id, youtube_id, content_type, key, entry, title, duration):
+        now = _ts(datetime.utcnow())
+
+        def put(conn):
+            conn.execute('INSERT INTO content_ladder (id, youtube_id, file_type, title, duration, created_at, updated_at) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                         'ON CONFLICT (id) DO UPDATE SET title = excluded.title, duration = excluded.duration, '
+                         'updated_at = excluded.updated_at',
+                         (doc_id, youtube_id, content_type, title, duration, now, now))
+            conn.execute('INSERT OR REPLACE INTO ladder_qualities (ladder_id, quality, ' + ', '.join(QUALITY_FIELDS) + ') '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (doc_id, key) + tuple(_ts(entry.get(f)) for f in QUALITY_FIELDS))
+            conn.execute('DELETE FROM ladder_upgrades WHERE ladder_id = ? AND quality = ?', (doc_id, key))
+        await self._tx(put)
+
+    async def remove_ladder_quality(self, doc_id, key):
+        def remove(conn):
+            conn.execute('DELETE FROM ladder_qualities WHERE ladder_id = ? AND quality = ?', (doc_id, key))
+            conn.execute('DELETE FROM ladder_upgrades WHERE ladder_id = ? AND quality = ?', (doc_id, key))
+        await self._tx(remove)
+
+    async def insert_ladder(self, doc):
+        def insert(conn):
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO content_ladder (id, youtube_id, file_type, title, duration, access_count, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (doc['_id'], doc['youtube_id'], doc['file_type'], doc.get('title'), doc.get('duration'),
+                 doc.get('access_count', 0), _ts(doc.get('created_at')), _ts(doc.get('created_at')))
+            )
+            if cursor.rowcount != 1:
+                return
+            for key, entry in (doc.get('qualities') or {}).items():
+                conn.execute('INSERT OR REPLACE INTO ladder_qualities (ladder_id, quality, ' + ', '.join(QUALITY_FIELDS) + ') '
+                             'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             (doc['_id'], key) + tuple(_ts(entry.get(f)) for f in QUALITY_FIELDS))
+        await self._tx(insert)
+
+    async def merge_ladder_qualities(self, doc_id, qualities):
+        if not qualities:
+            return
+
+        def merge(conn):
+            for key, entry in qualities.items():
+                conn.execute('INSERT OR IGNORE INTO ladder_qualities (ladder_id, quality, ' + ', '.join(QUALITY_FIELDS) + ') '
+                             'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             (doc_id, key) + tuple(_ts(entry.get(f)) for f in QUALITY_FIELDS))
+        await self._tx(merge)
+
+    def _key_doc(self, row: sqlite3.Row) -> Dict[str, Any]:
+        doc = {k: row[k] for k in row.keys() if row[k] is not None}
+        doc['_id'] = doc.pop('id', None)
+        doc['is_active'] = bool(row['is_active'])
+        for field in KEY_DATETIMES:
+            if field in doc:
+                doc[field] = _dt(doc[field])
+        return doc
+
+    async def find_key(self, key, active_only=True):
+        sql = 'SELECT * FROM api_keys WHERE key = ?' + (' AND is_active = 1' if active_only else '')
+        rows = await self._query(sql, (key,))
+        return self._key_doc(rows[0]) if rows else None
+
+    async def update_key(self, key, set_fields, inc_fields=None):
+        assignments, params = [], []
+        for field, value in set_fields.items():
+            if field in KEY_COLUMNS:
+                assignments.append(f'{field} = ?')
+                params.append(_ts(value))
+        for field, amount in (inc_fields or {}).items():
+            if field in KEY_COLUMNS:
+                assignments.append(f'{field} = COALESCE({field}, 0) + ?')
+                params.append(amount)
+        if not assignments:
+            return False
+        sql = f'UPDATE api_keys SET {", ".join(assignments)} WHERE key = ?'
+        return await self._tx(lambda conn: conn.execute(sql, params + [key]).rowcount > 0)
+
+    async def insert_key(self, doc):
+        columns = ['key', 'id'] + sorted(KEY_COLUMNS & doc.keys())
+        values = [doc['key'], doc.get('_id')] + [_ts(doc[c]) for c in columns[2:]]
+        sql = f'INSERT INTO api_keys ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+        await self._tx(lambda conn: conn.execute(sql, values))
+
+    async def insert_usage(self, doc):
+        await self._tx(lambda conn: conn.execute(
+            'INSERT INTO usage_stats (id, api_key, endpoint, youtube_id, quality, status, response_time, timestamp) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (doc['_id'], doc.get('api_key'), doc.get('endpoint'), doc.get('youtube_id'), doc.get('quality'),
+             doc.get('status'), doc.get('response_time'), _ts(doc['timestamp']))
+        ))
+
+    async def count_usage_since(self, api_key, since):
+        rows = await self._query('SELECT COUNT(*) FROM usage_stats WHERE api_key = ? AND timestamp >= ?',
+                                 (api_key, _ts(since)))
+        return rows[0][0]
+
+    async def usage_by_hour(self, since, until):
+        rows = await self._query(
+            'SELECT substr(timestamp, 1, 13) AS hour, api_key, endpoint, status, COUNT(*) AS requests, '
+            'SUM(COALESCE(response_time, 0)) AS response_time_total, '
+            'MAX(COALESCE(response_time, 0)) AS response_time_max '
+            'FROM usage_stats WHERE timestamp >= ? AND timestamp < ? GROUP BY 1, 2, 3, 4',
+            (_ts(since), _ts(until))
+        )
+        return [dict(row, hour=datetime.strptime(row['hour'], '%Y-%m-%dT%H')) for row in rows]
+
+    async def expire_usage(self, before):
+        return await self._tx(lambda conn: conn.execute('DELETE FROM usage_stats WHERE timestamp < ?',
+                                                        (_ts(before),)).rowcount)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+BACKENDS = {
+    'mongodb': MongoStorage,
+    'sqlite': SQLiteStorage
+}
+
+def create_storage(name: str = STORAGE_BACKEND) -> StorageBackend:
+    if name not in BACKENDS:
+        logger.warning(f"Unknown STORAGE_BACKEND '{name}', using mongodb")
+        name = 'mongodb'
+    return BACKENDS[name]()
+
+# Global storage backend instance
+storage = create_storage()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from models_simple import APIKey
+
+    parser = argparse.ArgumentParser(description="Manage keys in the configured storage backend")
+    commands = parser.add_subparsers(dest='command', required=True)
+    create = commands.add_parser('create-key', help="create an API key")
+    create.add_argument('name')
+    create.add_argument('--user-id', default='local')
+    create.add_argument('--rate-limit', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    async def create_key() -> int:
+        if storage.name == 'mongodb' and not await repository.connect():
+            print("❌ MongoDB is not reachable")
+            return 1
+        api_key = APIKey(user_id=args.user_id, name=args.name, rate_limit=args.rate_limit)
+        await storage.insert_key(api_key.to_dict())
+        print(api_key.key)
+        return 0
+
+    return asyncio.run(create_key())
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import secrets
 import uuid
@@ -43,6 +43,7 @@ class APIKey:
             'key': self.key,
             'user_id': self.user_id,
             'name': self.name,
+            'name_lower': self.name.lower(),  # admin listing search
             'rate_limit': self.rate_limit,
             'created_at': self.created_at,
             'is_active': self.is_active,
@@ -63,16 +64,78 @@ class ContentCache:
         self.duration = 0
 
 class UsageStats:
-    def __init__(self, api_key: str, endpoint: str, status: str = 'success'):
+    def __init__(self, api_key: str, endpoint: str, youtube_id: str = None,
+                 quality: str = None, status: str = 'success'):
+        self._id = str(uuid.uuid4())
         self.api_key = api_key
         self.endpoint = endpoint
+        self.youtube_id = youtube_id
+        self.quality = quality
         self.status = status
         self.timestamp = datetime.utcnow()
         self.response_time = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            '_id': self._id,
+            'api_key': self.api_key,
+            'endpoint': self.endpoint,
+            'youtube_id': self.youtube_id,
+            'quality': self.quality,
+            'timestamp': self.timestamp,
+            'response_time': self.response_time,
+            'status': self.status
+        }
 
 class ConcurrentUser:
-    def __init__(self, session_id: str, api_key: str = None):
+    def __init__(self, session_id: str, api_key: str = None, endpoint: str = None):
         self.session_id = session_id
         self.api_key = api_key
-        self.last_activity = datetime.utcnow()
-        self.status = 'active'
\ No newline at end of file
+        self.endpoint = endpoint
+        self.last_activity = datetime.utcnow()  # TTL-indexed, see database/migrations.py
+        self.status = 'active'
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'session_id': self.session_id,
+            'api_key': self.api_key,
+            'endpoint': self.endpoint,
+            'last_activity': self.last_activity,
+            'status': self.status
+        }
+
+class RequestJob:
+    def __init__(self, api_key: str, youtube_url: str, content_type: str = 'video',
+                 quality: str = None, callback_url: str = None, ttl_hours: int = 24):
+        self._id = str(uuid.uuid4())
+        self.api_key = api_key
+        self.youtube_url = youtube_url
+        self.video_id = None
+        self.content_type = content_type  # 'video' or 'audio'
+        self.quality = quality
+        self.callback_url = callback_url
+        self.status = 'queued'  # queued -> running -> download_ready -> completed | failed
+        self.result = {}
+        self.error = None
+        self.webhook_deliveries = []
+        self.created_at = datetime.utcnow()
+        self.updated_at = self.created_at
+        self.expires_at = self.created_at + timedelta(hours=ttl_hours)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            '_id': self._id,
+            'api_key': self.api_key,
+            'youtube_url': self.youtube_url,
+            'video_id': self.video_id,
+            'content_type': self.content_type,
+            'quality': self.quality,
+            'callback_url': self.callback_url,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'webhook_deliveries': self.webhook_deliveries,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'expires_at': self.expires_at
+        }
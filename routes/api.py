@@ -1,27 +1,94 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, g, url_for
 from datetime import datetime
 import uuid
-import asyncio
 from services.api_service import api_service
+from services.job_service import InvalidCallbackURL, request_jobs
+from config import (
+    REQUEST_DEADLINE_HEADER, REQUEST_DEADLINE_SECONDS,
+    REQUEST_DEADLINE_MIN_SECONDS, REQUEST_DEADLINE_MAX_SECONDS
+)
+from utils import deadline
+from utils.background_loop import background_loop
 from utils.logging import LOGGER
+from utils.tracing import tracer
 
 logger = LOGGER(__name__)
 
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
 
 def run_async(coro):
-    """Helper to run async functions in Flask routes"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    """Run a coroutine from a Flask route on the shared background loop"""
+    return background_loop.run(coro)
+
+# HTTP status for structured download failures (see YouTubeDownloader.get_video_info)
+FAILURE_STATUS_CODES = {
+    'invalid_url': 400,
+    'unavailable': 404,
+    'download_failed': 502,
+    'decrypt_failed': 502,
+    'upstream_error': 502,
+    'circuit_open': 503,
+    'deadline_exceeded': 504
+}
+
+def failure_response(result):
+    """JSON error response with Retry-After while the failure is negatively cached"""
+    response = jsonify(result)
+    if result.get('queued'):
+        response.status_code = 202  # handed to background caching
+    else:
+        response.status_code = FAILURE_STATUS_CODES.get(result.get('reason'), 502)
+    if result.get('retry_after'):
+        response.headers['Retry-After'] = str(result['retry_after'])
+    return response
+
+def _request_budget() -> float:
+    """Client time budget from the deadline header, clamped to the configured range"""
     try:
-        return loop.run_until_complete(coro)
-    finally:
-        loop.close()
+        seconds = float(request.headers.get(REQUEST_DEADLINE_HEADER, REQUEST_DEADLINE_SECONDS))
+    except ValueError:
+        seconds = REQUEST_DEADLINE_SECONDS
+    return min(max(seconds, REQUEST_DEADLINE_MIN_SECONDS), REQUEST_DEADLINE_MAX_SECONDS)
+
+@api_bp.before_request
+def start_deadline():
+    """Every API request gets a deadline honored by the services it calls"""
+    g.deadline_token = deadline.set_deadline(_request_budget())
+
+@api_bp.teardown_request
+def clear_deadline(exc=None):
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        deadline.reset_deadline(token)
+
+def _wants_async(data) -> bool:
+    """async=true (query or JSON body) or 'Prefer: respond-async' asks for a job instead of waiting"""
+    flag = data.get('async', request.args.get('async'))
+    if str(flag).lower() in ('1', 'true', 'yes'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+def accept_job(data, youtube_url, content_type, quality=None):
+    """Create a request job and answer 202 with where to poll for it"""
+    callback_url = data.get('callback_url', request.args.get('callback_url'))
+    try:
+        job = run_async(request_jobs.create(request.api_key, youtube_url, content_type, quality, callback_url))
+    except InvalidCallbackURL as e:
+        return jsonify({'status': False, 'error': str(e), 'reason': 'invalid_callback'}), 400
+    except ValueError as e:
+        return jsonify({'status': False, 'error': str(e), 'reason': 'invalid_url'}), 400
+
+    status_url = url_for('api.get_job', job_id=job['job_id'])
+    response = jsonify({'status': True, 'job': job, 'status_url': status_url})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
 
 @api_bp.before_request
 def before_request():
     """Validate API key and check daily rate limits for all API requests"""
-    if request.endpoint and 'api.' in request.endpoint and request.endpoint != 'api.get_status':
+    # Job polls validate the key themselves and do not count against the daily limit
+    if request.endpoint and 'api.' in request.endpoint and request.endpoint not in ('api.get_status', 'api.get_job'):
         api_key = request.headers.get('X-API-Key') or request.args.get('api_key')
         
         if not api_key:
@@ -35,7 +102,19 @@ def before_request():
         from services.rate_limiter import rate_limiter
         
         try:
-            rate_check = rate_limiter.check_and_update_daily_limit(api_key)
+            with tracer.span('rate_limit.check'):
+                rate_check = rate_limiter.check_and_update_daily_limit(api_key)
+            
+            if rate_check.get('circuit_open'):
+                response = jsonify({
+                    'status': False,
+                    'error': rate_check['error'],
+                    'reason': 'circuit_open',
+                    'retry_after': rate_check['retry_after']
+                })
+                response.status_code = 503
+                response.headers['Retry-After'] = str(rate_check['retry_after'])
+                return response
             
             if not rate_check['allowed']:
                 return jsonify({
@@ -131,6 +210,7 @@ def get_video():
             youtube_url = data.get('url')
             quality = data.get('quality', '360')
         else:
+            data = {}
             youtube_url = request.args.get('url')
             quality = request.args.get('quality', '360')
         
@@ -141,10 +221,15 @@ def get_video():
                 'message': 'Please provide a YouTube URL'
             }), 400
         
+        if _wants_async(data):
+            return accept_job(data, youtube_url, 'video', quality)
+        
         # Process request
         result = run_async(api_service.process_youtube_request(
             request.api_key, youtube_url, 'video', quality
         ))
+        if not result.get('status') and result.get('reason'):
+            return failure_response(result)
         
         return jsonify(result)
         
@@ -165,6 +250,7 @@ def get_audio():
             data = request.get_json() or {}
             youtube_url = data.get('url')
         else:
+            data = {}
             youtube_url = request.args.get('url')
         
         if not youtube_url:
@@ -174,10 +260,15 @@ def get_audio():
                 'message': 'Please provide a YouTube URL'
             }), 400
         
+        if _wants_async(data):
+            return accept_job(data, youtube_url, 'audio')
+        
         # Process request
         result = run_async(api_service.process_youtube_request(
             request.api_key, youtube_url, 'audio'
         ))
+        if not result.get('status') and result.get('reason'):
+            return failure_response(result)
         
         return jsonify(result)
         
@@ -189,6 +280,36 @@ def get_audio():
             'message': str(e)
         }), 500
 
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll an asynchronous /video or /audio job"""
+    api_key = request.headers.get('X-API-Key') or request.args.get('api_key')
+    if not api_key:
+        return jsonify({
+            'status': False,
+            'error': 'API key required',
+            'message': 'Please provide API key in X-API-Key header or api_key parameter'
+        }), 401
+    
+    try:
+        # Only the key that created a job can read it; other keys see 404, not 403
+        job = run_async(request_jobs.get(job_id, api_key))
+        if job is None:
+            return jsonify({'status': False, 'error': 'Job not found'}), 404
+        
+        response = jsonify({'status': True, 'job': request_jobs.public_view(job)})
+        if job['status'] in ('queued', 'running'):
+            response.headers['Retry-After'] = '2'
+        return response
+        
+    except Exception as e:
+        logger.error(f"Job API error: {e}")
+        return jsonify({
+            'status': False,
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
 @api_bp.route('/info', methods=['GET', 'POST'])
 def get_info():
     """Get video information without downloading"""
@@ -212,10 +333,12 @@ def get_info():
         downloader = YouTubeDownloader()
         
         result = run_async(downloader.get_video_info(youtube_url))
+        if not result['status']:
+            return failure_response(result)
         
         return jsonify({
             'status': True,
-            'video_id': downloader.extract_video_id(youtube_url),
+            'video_id': result['video_id'],
             'title': result['title'],
             'duration': result['duration'],
             'thumbnail': result['thumbnail']
@@ -1,11 +1,11 @@
 from flask import Blueprint, request, Response, session, jsonify
-import asyncio
 import uuid
 from services.api_service import api_service
 from services.telegram_cache import TelegramCache
 
 # Initialize the full Telegram cache system
 telegram_cache = TelegramCache()
+from utils.background_loop import background_loop
 from utils.logging import LOGGER
 
 logger = LOGGER(__name__)
@@ -13,13 +13,8 @@ logger = LOGGER(__name__)
 streaming_bp = Blueprint('streaming', __name__, url_prefix='/stream')
 
 def run_async(coro):
-    """Helper to run async functions in Flask routes"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        return loop.run_until_complete(coro)
-    finally:
-        loop.close()
+    """Run a coroutine from a Flask route on the shared background loop"""
+    return background_loop.run(coro)
 
 @streaming_bp.before_request
 def before_streaming_request():
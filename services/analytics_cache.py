@@ -0,0 +1,123 @@
+"""
+Stale-while-revalidate cache for admin analytics views
+"""
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from config import ANALYTICS_CACHE_FRESH_SECONDS, ANALYTICS_CACHE_MAX_STALE_SECONDS
+from utils.background_loop import background_loop
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+Factory = Callable[[], Awaitable[Any]]
+
+# Periods offered by the analytics page; other values are computed but not cached
+CACHEABLE_HOURS = (1, 6, 24, 168)
+
+class _Entry:
+    __slots__ = ('value', 'computed_at', 'compute_seconds', 'computations', 'refreshing')
+
+    def __init__(self):
+        self.value = None
+        self.computed_at = 0.0
+        self.compute_seconds = 0.0
+        self.computations = 0
+        self.refreshing = False
+
+class AnalyticsCache:
+    """Result cache per (view, hours).
+
+    Fresh values are returned as is. Stale values (up to max_stale seconds old)
+    are returned immediately while one background refresh recomputes them, so
+    only the very first render of a view, or one after a long idle period,
+    waits for the aggregations.
+    """
+
+    def __init__(self, fresh_seconds: float = ANALYTICS_CACHE_FRESH_SECONDS,
+                 max_stale_seconds: float = ANALYTICS_CACHE_MAX_STALE_SECONDS,
+                 cacheable_hours: Tuple[int, ...] = CACHEABLE_HOURS):
+        self.fresh_seconds = fresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        # hours comes from the query string: a fixed set keeps the entry count bounded
+        self.cacheable_hours = frozenset(cacheable_hours)
+        self._entries: Dict[Tuple[str, int], _Entry] = {}
+        # Bumped by invalidate(): a computation that started before it must not store its result
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    async def get(self, view: str, hours: int, factory: Factory,
+                  is_valid: Callable[[Any], bool] = bool) -> Any:
+        """Cached value of factory() for (view, hours); failed results (is_valid False) are not stored"""
+        if hours not in self.cacheable_hours:
+            return await factory()
+        key = (view, hours)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            age = now - entry.computed_at
+            if entry.computations and age < self.fresh_seconds:
+                return entry.value
+            if entry.computations and age < self.max_stale_seconds:
+                if not entry.refreshing:
+                    entry.refreshing = True
+                    background_loop.submit(self._refresh(key, factory, is_valid))
+                return entry.value
+
+        return await self._compute(key, factory, is_valid)
+
+    async def _compute(self, key: Tuple[str, int], factory: Factory, is_valid: Callable[[Any], bool]) -> Any:
+        with self._lock:
+            generation = self._generation
+        started = time.perf_counter()
+        value = await factory()
+        elapsed = time.perf_counter() - started
+        if is_valid(value):
+            with self._lock:
+                if generation != self._generation:
+                    logger.info(f"📊 Analytics view {key[0]} ({key[1]}h) was invalidated while computing")
+                    return value
+                entry = self._entries.setdefault(key, _Entry())
+                entry.value = value
+                entry.computed_at = time.monotonic()
+                entry.compute_seconds = elapsed
+                entry.computations += 1
+        logger.info(f"📊 Analytics view {key[0]} ({key[1]}h) computed in {elapsed:.3f}s")
+        return value
+
+    async def _refresh(self, key: Tuple[str, int], factory: Factory, is_valid: Callable[[Any], bool]):
+        try:
+            await self._compute(key, factory, is_valid)
+        except Exception as e:
+            logger.error(f"Analytics refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:  # invalidate() may have dropped it meanwhile
+                    entry.refreshing = False
+
+    def invalidate(self, view: Optional[str] = None):
+        """Drop cached values, for one view or all; the next read recomputes inline"""
+        with self._lock:
+            self._generation += 1
+            for key in list(self._entries):
+                if view is None or key[0] == view:
+                    del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Age and compute time of every cached view"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{view}:{hours}h": {
+                    'age_seconds': round(now - entry.computed_at, 1) if entry.computations else None,
+                    'fresh': entry.computations > 0 and now - entry.computed_at < self.fresh_seconds,
+                    'last_compute_ms': round(entry.compute_seconds * 1000, 1),
+                    'computations': entry.computations,
+                    'refreshing': entry.refreshing
+                }
+                for (view, hours), entry in self._entries.items()
+            }
+
+# Global analytics cache instance
+analytics_cache = AnalyticsCache()
@@ -0,0 +1,119 @@
+"""
+Paginated API key listing for the admin panel - keyset pagination, server-side filters, projections
+"""
+import base64
+import re
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from pymongo import DESCENDING
+from config import ADMIN_API_KEYS_PAGE_SIZE, ADMIN_API_KEYS_MAX_PAGE_SIZE
+from database.repository import get_sync_db
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+# Only what the API keys table renders
+KEY_PROJECTION = {
+    'name': 1, 'key': 1, 'user_id': 1, 'is_active': 1,
+    'rate_limit': 1, 'usage_count': 1, 'created_at': 1
+}
+USER_PROJECTION = {'username': 1, 'email': 1}
+
+STATUSES = {'active': True, 'inactive': False}
+
+def encode_cursor(created_at: datetime, key_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{key_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_cursor; raises ValueError on tampered input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, key_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), key_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def keyset_filter(cursor: str) -> Dict[str, Any]:
+    """Keys strictly after the cursor in (created_at, _id) descending order"""
+    created_at, key_id = decode_cursor(cursor)
+    return {'$or': [
+        {'created_at': {'$lt': created_at}},
+        {'created_at': created_at, '_id': {'$lt': key_id}}
+    ]}
+
+class APIKeyListing:
+    """Keyset-paginated API key queries over the shared synchronous pool.
+
+    Status and user filters have compound indexes ending in the (created_at,
+    _id) sort (database/migrations.py), so their pages are index walks. The
+    name prefix is matched on the name_lower index and its matches are sorted
+    in memory: with the limit + 1 fetch that is a top-k sort capped by the
+    page size, but its work grows with the number of keys sharing the prefix.
+    """
+
+    def _build_filter(self, db, search: str = '', user: str = '', status: str = '') -> Dict[str, Any]:
+        query: Dict[str, Any] = {}
+        if status in STATUSES:
+            query['is_active'] = STATUSES[status]
+
+        if user:
+            # Exact user ID, or users whose username starts with the term
+            prefix = {'$regex': '^' + re.escape(user)}
+            user_ids = [u['_id'] for u in db.users.find({'username': prefix}, {'_id': 1}).limit(100)]
+            query['user_id'] = {'$in': [user] + user_ids}
+
+        if search:
+            term = re.escape(search.strip().lower())
+            query['name_lower'] = {'$regex': '^' + term}
+        return query
+
+    def list_page(self, search: str = '', user: str = '', status: str = '',
+                  cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """One page of keys, newest first, plus the cursor of the next page"""
+        db = get_sync_db()
+
+        limit = max(1, min(limit or ADMIN_API_KEYS_PAGE_SIZE, ADMIN_API_KEYS_MAX_PAGE_SIZE))
+        query = self._build_filter(db, search, user, status)
+        if cursor:
+            query.update(keyset_filter(cursor))
+
+        # One extra row tells whether there is a next page without counting
+        keys = list(
+            db.api_keys.find(query, KEY_PROJECTION)
+            .sort([('created_at', DESCENDING), ('_id', DESCENDING)])
+            .limit(limit + 1)
+        )
+        has_more = len(keys) > limit
+        keys = keys[:limit]
+
+        user_ids = list({k['user_id'] for k in keys if k.get('user_id')})
+        users = {
+            u['_id']: u for u in db.users.find({'_id': {'$in': user_ids}}, USER_PROJECTION)
+        } if user_ids else {}
+
+        rows: List[Dict[str, Any]] = []
+        for key in keys:
+            user_info = users.get(key.get('user_id'), {})
+            rows.append({
+                '_id': key['_id'],
+                'name': key.get('name'),
+                'key': key.get('key'),
+                'user_id': key.get('user_id'),
+                'is_active': key.get('is_active', True),
+                'rate_limit': key.get('rate_limit', 1000),
+                'usage_count': key.get('usage_count', 0),
+                'created_at': key.get('created_at'),
+                'user': {
+                    'username': user_info.get('username', 'Unknown'),
+                    'email': user_info.get('email', 'Unknown')
+                }
+            })
+
+        next_cursor = None
+        if has_more and isinstance(rows[-1]['created_at'], datetime):
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['_id'])
+        return {'api_keys': rows, 'next_cursor': next_cursor, 'limit': limit}
+
+# Global API key listing instance
+api_key_listing = APIKeyListing()
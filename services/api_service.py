@@ -1,20 +1,32 @@
 import asyncio
 import io
+import time
 import httpx
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
-from database.simple_mongo import (
+from database.repository import (
     get_api_keys_collection, get_usage_stats_collection, 
     get_concurrent_users_collection, get_content_cache_collection
 )
+from database.storage import storage
 from models_simple import UsageStats, ConcurrentUser
 from services.youtube_downloader import YouTubeDownloader
 from services.telegram_cache import TelegramCache
+from services.quality_ladder import quality_ladder, normalize_quality, VIDEO_LADDER
+from utils.youtube_url import extract_video_id, canonical_url
+from services.circuit_breaker import mongodb_breaker
+from utils import deadline
+from utils.background_loop import background_loop
+from utils.metrics import content_request_duration, cache_lookups
 
 # Initialize the full Telegram cache system
 telegram_cache = TelegramCache()
-from config import TELEGRAM_CHANNEL_ID
-from utils.logging import LOGGER
+from config import (
+    TELEGRAM_CHANNEL_ID, REQUEST_DEADLINE_MIN_DOWNLOAD_SECONDS, REQUEST_QUEUED_RETRY_AFTER_SECONDS,
+    CONCURRENT_USER_TTL_SECONDS
+)
+from utils.logging import LOGGER, get_request_id, set_request_id
+from utils.tracing import tracer
 
 logger = LOGGER(__name__)
 
@@ -26,36 +38,20 @@ class APIService:
     async def validate_api_key(self, api_key: str) -> Optional[Dict[str, Any]]:
         """Validate API key and check rate limits"""
         try:
-            api_keys_collection = get_api_keys_collection()
-            
-            key_data = await api_keys_collection.find_one({
-                'key': api_key,
-                'is_active': True
-            })
+            key_data = await storage.find_key(api_key)
             
             if not key_data:
                 return None
             
             # Check rate limit
-            usage_stats_collection = get_usage_stats_collection()
             one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-            
-            usage_count = await usage_stats_collection.count_documents({
-                'api_key': api_key,
-                'timestamp': {'$gte': one_hour_ago}
-            })
+            usage_count = await storage.count_usage_since(api_key, one_hour_ago)
             
             if usage_count >= key_data.get('rate_limit', 1000):
                 return {'error': 'Rate limit exceeded'}
             
             # Update last used
-            await api_keys_collection.update_one(
-                {'key': api_key},
-                {
-                    '$set': {'last_used': datetime.utcnow()},
-                    '$inc': {'usage_count': 1}
-                }
-            )
+            await storage.update_key(api_key, {'last_used': datetime.utcnow()}, {'usage_count': 1})
             
             return key_data
             
@@ -63,24 +59,29 @@ class APIService:
             logger.error(f"API key validation failed: {e}")
             return None
     
+    @tracer.traced('usage.log')
     async def log_usage(self, api_key: str, endpoint: str, youtube_id: str = None, 
-                       response_time: float = None, status: str = 'success'):
+                       response_time: float = None, status: str = 'success', quality: str = None):
         """Log API usage for analytics"""
+        if mongodb_breaker.is_open:
+            return
         try:
             usage_stat = UsageStats(
                 api_key=api_key,
                 endpoint=endpoint,
-                youtube_id=youtube_id
+                youtube_id=youtube_id,
+                quality=quality
             )
             usage_stat.response_time = response_time
             usage_stat.status = status
             
-            usage_stats_collection = get_usage_stats_collection()
-            await usage_stats_collection.insert_one(usage_stat.to_dict())
+            await storage.insert_usage(usage_stat.to_dict())
             
         except Exception as e:
+            mongodb_breaker.record_failure(e)
             logger.error(f"Usage logging failed: {e}")
     
+    @tracer.traced('concurrent_users.register')
     async def register_concurrent_user(self, session_id: str, api_key: str, endpoint: str):
         """Register a concurrent user session"""
         try:
@@ -90,7 +91,7 @@ class APIService:
                 endpoint=endpoint
             )
             
-            concurrent_users_collection = get_concurrent_users_collection()
+            concurrent_users_collection = get_concurrent_users_collection('telemetry_write')
             await concurrent_users_collection.insert_one(concurrent_user.to_dict())
             
             # Track in memory for real-time monitoring
@@ -105,10 +106,11 @@ class APIService:
         except Exception as e:
             logger.error(f"Failed to register concurrent user: {e}")
     
+    @tracer.traced('concurrent_users.unregister')
     async def unregister_concurrent_user(self, session_id: str):
         """Unregister a concurrent user session"""
         try:
-            concurrent_users_collection = get_concurrent_users_collection()
+            concurrent_users_collection = get_concurrent_users_collection('telemetry_write')
             await concurrent_users_collection.delete_one({'session_id': session_id})
             
             if session_id in self.active_sessions:
@@ -122,16 +124,14 @@ class APIService:
     async def get_concurrent_user_count(self) -> int:
         """Get current concurrent user count"""
         try:
-            # Clean up old sessions (older than 1 hour)
-            one_hour_ago = datetime.utcnow() - timedelta(hours=1)
+            # Stale sessions are removed by the last_activity TTL index; the
+            # filter hides the ones the TTL monitor has not reached yet
+            cutoff = datetime.utcnow() - timedelta(seconds=CONCURRENT_USER_TTL_SECONDS)
             concurrent_users_collection = get_concurrent_users_collection()
             
-            await concurrent_users_collection.delete_many({
-                'last_activity': {'$lt': one_hour_ago}
+            count = await concurrent_users_collection.count_documents({
+                'last_activity': {'$gte': cutoff}
             })
-            
-            # Count active sessions
-            count = await concurrent_users_collection.count_documents({})
             return count
             
         except Exception as e:
@@ -140,21 +140,32 @@ class APIService:
     
     async def process_youtube_request(self, api_key: str, youtube_url: str, 
                                     content_type: str = 'video', quality: str = '360') -> Dict[str, Any]:
-        """Process YouTube content request with CACHE-FIRST priority"""
+        """Process YouTube content request with CACHE-FIRST priority (latency recorded per answer source)"""
+        started = time.perf_counter()
+        with tracer.span('api_service.process_youtube_request', content_type=content_type, quality=quality) as span:
+            result = await self._process_youtube_request(api_key, youtube_url, content_type, quality)
+            if result.get('status'):
+                source = result.get('source', 'unknown')
+            else:
+                source = 'queued' if result.get('queued') else 'error'
+            if span is not None:
+                span.set_attribute('source', source)
+                span.set_attribute('video_id', result.get('video_id'))
+        content_request_duration.observe(time.perf_counter() - started, content_type=content_type, source=source)
+        return result
+    
+    async def _process_youtube_request(self, api_key: str, youtube_url: str,
+                                       content_type: str, quality: str) -> Dict[str, Any]:
         start_time = datetime.utcnow()
         
         try:
             # CRITICAL: Ensure database connection for caching
-            from database.simple_mongo import init_db, get_content_cache_collection
-            
-            logger.info("🔍 API SERVICE: Starting YouTube request processing...")
-            print("🔍 API SERVICE: Starting YouTube request processing...")  # Console print to ensure visibility
+            from database.repository import init_db, get_content_cache_collection
             
             # Test and initialize database if needed
             collection = get_content_cache_collection()
-            logger.info(f"🔍 Database collection state: {'Available' if collection is not None else 'None'}")
             
-            if collection is None:
+            if collection is None and storage.name == 'mongodb':
                 logger.warning("🔥 CRITICAL: Database not initialized, initializing now...")
                 success = await init_db()
                 collection = get_content_cache_collection()
@@ -162,143 +173,106 @@ class APIService:
                     logger.info("✅ Database connection restored successfully")
                 else:
                     logger.error(f"❌ FAILED to initialize database connection (init_result: {success})")
-            else:
-                logger.info("✅ Database connection already available")
             
-            # Extract video ID
-            video_id = self.youtube_downloader.extract_video_id(youtube_url)
-            logger.info(f"🔍 Processing request for video ID: {video_id}")
+            # Canonicalize: every URL shape of a video maps to one ID and one upstream URL
+            video_id = extract_video_id(youtube_url)
+            youtube_url = canonical_url(video_id)
+            logger.debug(f"🔍 Processing request for video ID: {video_id}")
             
-            # 🚀 STEP 1: Check cache directly from database (PRODUCTION READY)
-            logger.info(f"📱 PRODUCTION CACHE CHECK: Looking for {video_id}...")
-            print(f"📱 PRODUCTION CACHE: Checking database for {video_id}...")
+            if content_type == 'video':
+                quality = normalize_quality(quality)
             
-            # Direct database query for production reliability
-            cached_content = await content_cache_collection.find_one({
-                'youtube_id': video_id,
-                'file_type': content_type,
-                'status': 'active'
-            })
+            # 🚀 STEP 1: Quality ladder lookup - one indexed read resolves exact/nearest quality
+            logger.debug(f"📱 PRODUCTION CACHE CHECK: Looking for {video_id}...")
+            
+            cached_content = None
+            if mongodb_breaker.allow_request():
+                try:
+                    with deadline.db_timeout():
+                        cached_content = await quality_ladder.lookup(video_id, content_type, quality)
+                    mongodb_breaker.record_success()
+                    cache_lookups.inc(content_type=content_type, result='hit' if cached_content else 'miss')
+                except Exception as e:
+                    if not deadline.expired():
+                        mongodb_breaker.record_failure(e)
+                    cache_lookups.inc(content_type=content_type, result='error')
+                    logger.error(f"Cache lookup failed, treating as miss: {e}")
+            else:
+                cache_lookups.inc(content_type=content_type, result='skipped')
+                logger.warning(f"⚡ MongoDB circuit open, skipping cache lookup for {video_id}")
             
             if cached_content:
-                logger.info(f"🎯 PRODUCTION CACHE HIT! Video found: {cached_content['title']}")
-                logger.info(f"📁 Telegram File ID: {cached_content.get('telegram_file_id')}")
-                logger.info(f"📺 Quality: {cached_content.get('quality', 'default')}")
-                logger.info(f"⚡ Ultra-fast production response: 0.3s from cache!")
-                print(f"✅ PRODUCTION CACHE HIT! {cached_content['title']}")
-                print(f"📁 File ID: {cached_content.get('telegram_file_id')}")
-                print(f"⚡ Production response: 0.3s (cached)")
-                
-                # Update access stats
-                await content_cache_collection.update_one(
-                    {'_id': cached_content['_id']},
-                    {
-                        '$inc': {'access_count': 1},
-                        '$set': {'last_accessed': datetime.utcnow()}
-                    }
-                )
+                # 🚀 STEP 2: Entries written before the ladder existed come from the MongoDB backup rows
+                source = 'production_cache' if cached_content['source'] == 'ladder' else 'mongodb_backup_cache'
+                logger.info(f"🎯 Cache hit: {video_id} {cached_content.get('quality') or 'default'} ({source})")
+                logger.debug(f"📁 Telegram File ID: {cached_content.get('telegram_file_id')}")
                 
                 response_time = (datetime.utcnow() - start_time).total_seconds()
-                await self.log_usage(api_key, f'/{content_type}', video_id, response_time, 'production_cache_hit')
+                status = 'production_cache_hit' if source == 'production_cache' else 'mongodb_cache_hit'
+                await self.log_usage(api_key, f'/{content_type}', video_id, response_time, status, quality)
                 
-                # Production response with real data
                 return {
                     'status': True,
                     'cached': True,
-                    'source': 'production_cache',
+                    'source': source,
                     'video_id': video_id,
                     'title': cached_content['title'],
                     'duration': cached_content['duration'],
                     'telegram_file_id': cached_content['telegram_file_id'],
                     'file_type': content_type,
-                    'quality': cached_content.get('quality', quality),
+                    'quality': cached_content.get('quality') or (quality if content_type == 'video' else None),
+                    'requested_quality': cached_content.get('requested_quality'),
                     'file_size': cached_content.get('file_size', 'Unknown'),
                     'upload_date': cached_content.get('upload_date', 'Unknown'),
-                    'access_count': cached_content.get('access_count', 0) + 1,
+                    'access_count': cached_content.get('access_count', 0),
+                    'telegram_url': f"https://t.me/c/{abs(int(TELEGRAM_CHANNEL_ID.replace('-100', '')))}/",
                     'response_time': f"{response_time:.3f}s",
                     'message': 'Ultra-fast response from production cache!'
                 }
-            else:
-                logger.info(f"❌ Telegram cache miss for {video_id}")
-                print(f"❌ Not found in Telegram cache: {video_id}")
-            
-            # 🚀 STEP 2: Check MongoDB backup cache (second priority)
-            logger.info(f"🗄️ SECOND PRIORITY: Checking MongoDB backup cache...")
-            print(f"🗄️ Checking backup cache in MongoDB...")
-            existing_cache = await self._check_existing_telegram_cache(video_id, content_type)
-            
-            if existing_cache:
-                logger.info(f"✅ MONGODB BACKUP CACHE HIT! Found: {existing_cache['title']}")
-                logger.info(f"📁 Telegram File ID: {existing_cache['telegram_file_id']}")
-                logger.info(f"🚫 Skipping download - content already in Telegram!")
-                print(f"✅ MONGODB BACKUP HIT! {existing_cache['title']}")
-                print(f"📁 File ID from backup: {existing_cache['telegram_file_id']}")
-                response_time = (datetime.utcnow() - start_time).total_seconds()
-                await self.log_usage(api_key, f'/{content_type}', video_id, response_time, 'mongodb_cache_hit')
-                
-                return {
-                    'status': True,
-                    'cached': True,
-                    'source': 'mongodb_backup_cache',
-                    'video_id': video_id,
-                    'title': existing_cache['title'],
-                    'duration': existing_cache['duration'],
-                    'telegram_file_id': existing_cache['telegram_file_id'],
-                    'file_type': content_type,
-                    'quality': existing_cache.get('quality', quality),
-                    'file_size': existing_cache.get('file_size', 'Unknown'),
-                    'upload_date': existing_cache.get('upload_date', 'Unknown'),
-                    'telegram_url': f"https://t.me/c/{abs(int(TELEGRAM_CHANNEL_ID.replace('-100', '')))}/"
-                }
-            else:
-                logger.info(f"❌ MongoDB backup cache miss for {video_id}")
-                print(f"❌ Not found in backup cache: {video_id}")
             
             # 🚀 STEP 3: Cache miss - download fresh content (last resort)
-            logger.info(f"❌ COMPLETE CACHE MISS! Must download fresh: {video_id}")
-            logger.info(f"🌐 Hitting external SaveTube CDN...")
-            print(f"❌ CACHE MISS! Downloading fresh content for: {video_id}")
-            print(f"🌐 Connecting to SaveTube CDN...")
+            logger.info(f"❌ Cache miss, downloading fresh: {video_id}")
+            
+            # Download at the requested rung of the quality ladder
+            best_quality = await self._get_best_quality(youtube_url, content_type, quality)
             
-            # Always use highest quality available
-            best_quality = await self._get_best_quality(youtube_url, content_type)
+            # Not enough budget left for SaveTube: cache it in the background instead
+            if not deadline.has_time(REQUEST_DEADLINE_MIN_DOWNLOAD_SECONDS):
+                return await self._queue_for_later(api_key, video_id, content_type, best_quality, quality, start_time)
             
             download_result = await self.youtube_downloader.download_content(
                 youtube_url, best_quality, content_type
             )
             
+            if download_result.get('reason') == 'deadline_exceeded':
+                return await self._queue_for_later(api_key, video_id, content_type, best_quality, quality, start_time)
+            
             if not download_result['status']:
                 response_time = (datetime.utcnow() - start_time).total_seconds()
-                await self.log_usage(api_key, f'/{content_type}', video_id, response_time, 'error')
+                await self.log_usage(api_key, f'/{content_type}', video_id, response_time, 'error', quality)
                 return download_result
             
             # CRITICAL: Start background Telegram upload immediately
             logger.info(f"🚀 STARTING BACKGROUND TELEGRAM UPLOAD: {download_result['title']}")
-            print(f"🚀 BACKGROUND UPLOAD: Caching {download_result['title']} to Telegram...")
             
-            # Use proper async task for background caching
-            import concurrent.futures
-            import threading
+            # Background caching runs on the shared loop, next to the MongoDB client
+            request_id = get_request_id()
+            request_span = tracer.current_span()
             
-            def run_caching_in_thread():
+            async def run_caching():
+                set_request_id(request_id)  # submit() starts from an empty context
                 try:
-                    # Create new event loop for this thread
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(self._cache_content_background(download_result, content_type, quality))
-                    loop.close()
+                    # The upload is part of the request's trace even though it ends later
+                    with tracer.span('background.cache_upload', parent=request_span, video_id=video_id):
+                        await self._cache_content_background(download_result, content_type, quality)
                     logger.info(f"✅ Background upload completed for: {download_result['title']}")
-                    print(f"✅ Background upload completed: {download_result['title']}")
                 except Exception as e:
-                    logger.error(f"Background caching thread failed: {e}")
-                    print(f"❌ Background upload failed: {e}")
+                    logger.error(f"Background caching failed: {e}")
             
-            # Start background thread immediately
-            background_thread = threading.Thread(target=run_caching_in_thread, daemon=True)
-            background_thread.start()
+            background_loop.submit(run_caching())
             
             response_time = (datetime.utcnow() - start_time).total_seconds()
-            await self.log_usage(api_key, f'/{content_type}', video_id, response_time, 'success')
+            await self.log_usage(api_key, f'/{content_type}', video_id, response_time, 'success', quality)
             
             return {
                 'status': True,
@@ -323,50 +297,37 @@ class APIService:
                 'error': str(e)
             }
     
-    async def _check_existing_telegram_cache(self, video_id: str, content_type: str) -> Dict[str, Any]:
-        """Check MongoDB for existing Telegram cached content to prevent duplicates"""
-        try:
-            content_cache_collection = get_content_cache_collection()
-            
-            # CRITICAL FIX: Use correct field mapping for cache lookup
-            existing = await content_cache_collection.find_one({
-                'youtube_id': video_id,  # Fix: Use youtube_id instead of video_id
-                'file_type': content_type,  # Fix: Use file_type instead of content_type  
-                'telegram_file_id': {'$exists': True},
-                'status': 'active'  # Only active cache entries
-            })
-            
-            if existing:
-                logger.info(f"🔄 MONGODB BACKUP CACHE HIT! Found for {video_id} ({content_type})")
-                logger.info(f"📁 Telegram File ID: {existing['telegram_file_id']}")
-                print(f"✅ BACKUP CACHE HIT! Found {video_id} in MongoDB")
-                return {
-                    'title': existing['title'],
-                    'duration': existing['duration'],
-                    'telegram_file_id': existing['telegram_file_id'],
-                    'quality': existing.get('quality'),
-                    'file_size': existing.get('file_size'),
-                    'upload_date': existing.get('upload_date')
-                }
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error checking existing cache: {e}")
-            return None
+    async def _queue_for_later(self, api_key: str, video_id: str, content_type: str,
+                               download_quality: str, quality: str, start_time: datetime) -> Dict[str, Any]:
+        """Hand a cache miss the request could not finish in time to the prefetcher"""
+        from services.prefetch_service import cache_prefetcher
+        job = cache_prefetcher.submit([video_id], content_type, download_quality)
+        logger.info(f"⏱️ Deadline reached for {video_id}, queued prefetch job {job['job_id']}")
+        
+        response_time = (datetime.utcnow() - start_time).total_seconds()
+        await self.log_usage(api_key, f'/{content_type}', video_id, response_time, 'queued', quality)
+        
+        return {
+            'status': False,
+            'queued': True,
+            'reason': 'deadline_exceeded',
+            'video_id': video_id,
+            'file_type': content_type,
+            'quality': quality if content_type == 'video' else None,
+            'prefetch_job_id': job['job_id'],
+            'retry_after': REQUEST_QUEUED_RETRY_AFTER_SECONDS,
+            'message': 'Not cached yet and the request deadline was reached. Queued for caching, retry shortly.'
+        }
     
-    async def _get_best_quality(self, youtube_url: str, content_type: str) -> str:
-        """Get the best quality available for content"""
+    async def _get_best_quality(self, youtube_url: str, content_type: str, quality: str = None) -> str:
+        """Get the download quality for a request - the requested rung of the quality ladder"""
         try:
-            # For videos: Try 1080p > 720p > 480p > 360p
             if content_type == 'video':
-                quality_priorities = ['1080', '720', '480', '360']
-            else:
-                # For audio: Always highest quality
-                quality_priorities = ['320', '256', '192', '128']
+                requested = normalize_quality(quality)
+                return requested if requested in VIDEO_LADDER else VIDEO_LADDER[-1]
             
-            # Return highest quality (simplified for now)
-            return quality_priorities[0]
+            # For audio: Always highest quality
+            return '320'
             
         except Exception as e:
             logger.error(f"Error getting best quality: {e}")
@@ -455,7 +416,6 @@ class APIService:
                 total_size = 0
                 
                 logger.info(f"📥 Background: Downloading {title}...")
-                print(f"📥 Background: Downloading {title}...")  # Console output
                 
                 async for chunk in response.aiter_bytes(chunk_size=8192):
                     file_content.write(chunk)
@@ -524,7 +484,6 @@ class APIService:
                     telegram_file_id = message.video.file_id
                 
                 logger.info(f"✅ Background: Successfully uploaded to Telegram! File ID: {telegram_file_id}")
-                print(f"✅ Background: Successfully uploaded to Telegram! File ID: {telegram_file_id}")
                 
                 # Save to MongoDB to prevent future duplicates
                 cache_data = {
@@ -546,8 +505,8 @@ class APIService:
         try:
             time_ago = datetime.utcnow() - timedelta(hours=hours)
             
-            usage_stats_collection = get_usage_stats_collection()
-            api_keys_collection = get_api_keys_collection()
+            usage_stats_collection = get_usage_stats_collection('analytics_read')
+            api_keys_collection = get_api_keys_collection('analytics_read')
             
             # Total requests
             total_requests = await usage_stats_collection.count_documents({
@@ -0,0 +1,292 @@
+"""
+Cost-aware cache retention - pluggable eviction policies over the quality ladder
+"""
+import asyncio
+import heapq
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from pymongo import UpdateOne
+from config import (
+    CACHE_RETENTION_POLICY, CACHE_RETENTION_BATCH_SIZE, CACHE_RETENTION_MAX_EVICTIONS,
+    CACHE_RETENTION_HOT_WINDOW_MINUTES, CACHE_RETENTION_MAX_BYTES,
+    CACHE_RETENTION_LFU_HALF_LIFE_HOURS, CACHE_REFILL_BASE_COST_SECONDS,
+    CACHE_REFILL_BYTES_PER_SECOND
+)
+from database.repository import get_content_ladder_collection, get_content_cache_collection
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+class RetentionPolicy(ABC):
+    """Scores a cached slot; the lowest scores are evicted first"""
+    name = 'base'
+
+    @abstractmethod
+    def score(self, slot: Dict[str, Any], now: float) -> float:
+        """Eviction score of one slot at time `now` (epoch seconds)"""
+
+    def on_evict(self, score: float):
+        """Hook called with the score of every evicted slot"""
+
+class LRUPolicy(RetentionPolicy):
+    """Least recently used: older last access scores lower"""
+    name = 'lru'
+
+    def score(self, slot, now):
+        return slot['last_accessed_ts']
+
+class LFUDecayPolicy(RetentionPolicy):
+    """Least frequently used, with access counts halving every half-life of idleness"""
+    name = 'lfu'
+
+    def __init__(self, half_life_hours: float = CACHE_RETENTION_LFU_HALF_LIFE_HOURS):
+        self.half_life = half_life_hours * 3600
+
+    def score(self, slot, now):
+        idle = max(0.0, now - slot['last_accessed_ts'])
+        return slot['access_count'] * 0.5 ** (idle / self.half_life)
+
+class GDSFPolicy(RetentionPolicy):
+    """Greedy-Dual-Size-Frequency ranking: frequency * refill_cost / size.
+
+    Refill cost is the estimated seconds to download and re-upload the file,
+    so small files that are expensive relative to their size are kept longer.
+    Scores are computed afresh on every run rather than frozen at access time,
+    so classic GDSF's inflation value L would shift every score equally;
+    instead the frequency decays like LFUDecayPolicy's, which ages out entries
+    that stopped being requested.
+    """
+    name = 'gdsf'
+
+    def __init__(self, base_cost: float = CACHE_REFILL_BASE_COST_SECONDS,
+                 bytes_per_second: float = CACHE_REFILL_BYTES_PER_SECOND,
+                 half_life_hours: float = CACHE_RETENTION_LFU_HALF_LIFE_HOURS):
+        self.base_cost = base_cost
+        self.bytes_per_second = bytes_per_second
+        self.half_life = half_life_hours * 3600
+
+    def score(self, slot, now):
+        size = max(slot['file_size'], 1)
+        cost = self.base_cost + size / self.bytes_per_second
+        idle = max(0.0, now - slot['last_accessed_ts'])
+        frequency = (slot['access_count'] + 1) * 0.5 ** (idle / self.half_life)
+        return frequency * cost / size
+
+class CacheRetentionEngine:
+    """Selects and evicts cold quality slots in bounded batches, with a dry-run report"""
+
+    def __init__(self):
+        self.policies: Dict[str, RetentionPolicy] = {
+            'lru': LRUPolicy(),
+            'lfu': LFUDecayPolicy(),
+            'gdsf': GDSFPolicy()
+        }
+        self.default_policy = CACHE_RETENTION_POLICY if CACHE_RETENTION_POLICY in self.policies else 'gdsf'
+        self.batch_size = CACHE_RETENTION_BATCH_SIZE
+        self.max_evictions = CACHE_RETENTION_MAX_EVICTIONS
+        self.hot_window = timedelta(minutes=CACHE_RETENTION_HOT_WINDOW_MINUTES)
+        self.max_bytes = CACHE_RETENTION_MAX_BYTES
+
+    def register_policy(self, policy: RetentionPolicy):
+        """Add a custom retention policy"""
+        self.policies[policy.name] = policy
+
+    def _ladder(self):
+        return get_content_ladder_collection()
+
+    @staticmethod
+    def _timestamp(value) -> float:
+        if isinstance(value, datetime):
+            return value.timestamp()
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value).timestamp()
+            except ValueError:
+                return 0.0
+        return 0.0
+
+    @staticmethod
+    def _size(value) -> int:
+        return value if isinstance(value, int) else 0
+
+    async def _scan(self, policy: RetentionPolicy, hot_cutoff: datetime, idle_cutoff: Optional[datetime],
+                    limit: int, report: Dict[str, Any]) -> List[tuple]:
+        """Walk the ladder in _id order, keeping the `limit` lowest-scored eligible slots"""
+        collection = self._ladder()
+        now = time.time()
+        heap: List[tuple] = []  # max-heap via negated score
+        last_id = None
+
+        while True:
+            query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+            batch = await collection.find(query, {'youtube_id': 1, 'file_type': 1, 'qualities': 1}) \
+                .sort('_id', 1).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+            last_id = batch[-1]['_id']
+            report['scanned_docs'] += len(batch)
+
+            for doc in batch:
+                for quality, entry in (doc.get('qualities') or {}).items():
+                    report['scanned_slots'] += 1
+                    size = self._size(entry.get('file_size'))
+                    report['total_bytes'] += size
+                    last_accessed = entry.get('last_accessed')
+                    last_ts = self._timestamp(last_accessed or entry.get('upload_date'))
+
+                    # Never evict what is hot right now, whatever the policy says
+                    if last_ts >= hot_cutoff.timestamp():
+                        report['protected_hot'] += 1
+                        continue
+                    if idle_cutoff is not None and last_ts >= idle_cutoff.timestamp():
+                        continue
+
+                    slot = {
+                        'doc_id': doc['_id'],
+                        'video_id': doc.get('youtube_id'),
+                        'file_type': doc.get('file_type'),
+                        'quality': quality,
+                        'telegram_file_id': entry.get('telegram_file_id'),
+                        'content_hash': entry.get('content_hash'),
+                        'file_size': size,
+                        'access_count': entry.get('access_count') or 0,
+                        'last_accessed_ts': last_ts
+                    }
+                    score = policy.score(slot, now)
+                    item = (-score, report['scanned_slots'], slot)
+                    if len(heap) < limit:
+                        heapq.heappush(heap, item)
+                    elif -heap[0][0] > score:
+                        heapq.heapreplace(heap, item)
+
+            await asyncio.sleep(0)  # yield between batches
+
+        return sorted(((-neg, slot) for neg, _, slot in heap), key=lambda pair: pair[0])
+
+    async def run(self, policy_name: Optional[str] = None, dry_run: bool = True,
+                  max_evictions: Optional[int] = None, max_bytes: Optional[int] = None,
+                  min_idle_days: Optional[float] = None) -> Dict[str, Any]:
+        """Plan (and unless dry_run, apply) evictions. Needs min_idle_days or a byte target.
+
+        With max_bytes, the lowest-scored slots are evicted until the cache fits;
+        min_idle_days only narrows which slots may be evicted.
+        """
+        started = time.time()
+        policy_name = policy_name or self.default_policy
+        policy = self.policies.get(policy_name)
+        if policy is None:
+            return {'status': False, 'error': f"Unknown retention policy: {policy_name}"}
+
+        max_evictions = self.max_evictions if max_evictions is None else max_evictions
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        now = datetime.utcnow()
+        idle_cutoff = now - timedelta(days=min_idle_days) if min_idle_days else None
+
+        report = {
+            'status': True,
+            'policy': policy.name,
+            'dry_run': dry_run,
+            'scanned_docs': 0,
+            'scanned_slots': 0,
+            'protected_hot': 0,
+            'total_bytes': 0,
+            'evicted': [],
+            'evicted_count': 0,
+            'bytes_freed': 0,
+            'legacy_rows_removed': 0,
+            'stopped_by': None
+        }
+
+        if self._ladder() is None:
+            return {'status': False, 'error': 'Cache collection not available'}
+        if idle_cutoff is None and not max_bytes:
+            report['message'] = 'No eviction target: set min_idle_days or max_bytes'
+            return report
+
+        ranked = await self._scan(policy, now - self.hot_window, idle_cutoff, max_evictions, report)
+
+        selected, report['stopped_by'] = self._select(ranked, report['total_bytes'], max_bytes, max_evictions)
+
+        for score, slot in selected:
+            report['evicted'].append({
+                'video_id': slot['video_id'],
+                'file_type': slot['file_type'],
+                'quality': slot['quality'],
+                'file_size': slot['file_size'],
+                'access_count': slot['access_count'],
+                'last_accessed': datetime.utcfromtimestamp(slot['last_accessed_ts']).isoformat() if slot['last_accessed_ts'] else None,
+                'score': float(f"{score:.6g}")
+            })
+            report['bytes_freed'] += slot['file_size']
+        report['evicted_count'] = len(selected)
+
+        if not dry_run and selected:
+            await self._apply(selected, policy)
+            report['legacy_rows_removed'] = await self._cleanup_inactive_legacy(now)
+
+        report['duration_ms'] = round((time.time() - started) * 1000, 1)
+        logger.info(f"🧹 Cache retention ({policy.name}{', dry run' if dry_run else ''}): "
+                    f"{report['evicted_count']} slots, {report['bytes_freed'] / (1024*1024):.1f}MB")
+        return report
+
+    @staticmethod
+    def _select(ranked: List[tuple], total_bytes: int, max_bytes: Optional[int],
+                max_evictions: int) -> Tuple[List[tuple], str]:
+        """Take ranked (score, slot) pairs until the byte target is met; returns (selected, stopped_by)"""
+        selected = []
+        excess = total_bytes - max_bytes if max_bytes else None
+        for score, slot in ranked:
+            if excess is not None and excess <= 0:
+                return selected, 'byte_target'
+            selected.append((score, slot))
+            if excess is not None:
+                excess -= slot['file_size']
+        if excess is not None and excess <= 0:
+            return selected, 'byte_target'
+        # ranked holds at most max_evictions slots
+        return selected, 'max_evictions' if len(selected) >= max_evictions else 'candidates_exhausted'
+
+    async def _apply(self, selected: List[tuple], policy: RetentionPolicy):
+        """Unset evicted ladder slots and drop their legacy rows, batch by batch"""
+        ladder_collection = self._ladder()
+        cache_collection = get_content_cache_collection()
+
+        for i in range(0, len(selected), self.batch_size):
+            chunk = selected[i:i + self.batch_size]
+            operations = [
+                # Only unset if the slot was not replaced since the scan
+                UpdateOne(
+                    {'_id': slot['doc_id'], f"qualities.{slot['quality']}.telegram_file_id": slot['telegram_file_id']},
+                    {'$unset': {f"qualities.{slot['quality']}": ''}}
+                )
+                for _, slot in chunk
+            ]
+            await ladder_collection.bulk_write(operations, ordered=False)
+
+            file_ids = [slot['telegram_file_id'] for _, slot in chunk if slot['telegram_file_id']]
+            if cache_collection is not None and file_ids:
+                await cache_collection.delete_many({'telegram_file_id': {'$in': file_ids}})
+
+            for score, _ in chunk:
+                policy.on_evict(score)
+
+        await ladder_collection.delete_many({
+            '_id': {'$in': list({slot['doc_id'] for _, slot in selected})},
+            'qualities': {}
+        })
+
+    async def _cleanup_inactive_legacy(self, now: datetime) -> int:
+        """Legacy rows already marked inactive (Telegram file gone) for a week are dead weight"""
+        cache_collection = get_content_cache_collection()
+        if cache_collection is None:
+            return 0
+        result = await cache_collection.delete_many({
+            'status': 'inactive',
+            'last_verified': {'$lt': now - timedelta(days=7)}
+        })
+        return result.deleted_count
+
+# Global retention engine instance
+cache_retention = CacheRetentionEngine()
@@ -0,0 +1,181 @@
+"""
+Popularity-driven predictive cache warming
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Tuple
+from config import (
+    CACHE_WARMER_INTERVAL_SECONDS, CACHE_WARMER_WINDOW_MINUTES,
+    CACHE_WARMER_MIN_MISSES, CACHE_WARMER_MIN_REQUESTS,
+    CACHE_WARMER_UPLOAD_BUDGET, CACHE_WARMER_COOLDOWN_MINUTES
+)
+from database.repository import get_usage_stats_collection, get_content_ladder_collection
+from services.prefetch_service import cache_prefetcher
+from services.quality_ladder import quality_ladder, normalize_quality
+from utils.background_loop import background_loop
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+# usage_stats statuses written by APIService.log_usage for a cache miss
+# (fresh download, or queued because the request deadline ran out)
+MISS_STATUSES = ['success', 'queued']
+DEFAULT_QUALITY = '360'
+
+class PopularityCacheWarmer:
+    """Ranks frequently missed video IDs and fills their missing qualities in the background"""
+
+    def __init__(self):
+        self.interval = CACHE_WARMER_INTERVAL_SECONDS
+        self.window_minutes = CACHE_WARMER_WINDOW_MINUTES
+        self.min_misses = CACHE_WARMER_MIN_MISSES
+        self.min_requests = CACHE_WARMER_MIN_REQUESTS
+        self.upload_budget = CACHE_WARMER_UPLOAD_BUDGET
+        self.cooldown = CACHE_WARMER_COOLDOWN_MINUTES * 60
+        self.recently_warmed: Dict[Tuple[str, str, str], float] = {}
+        self.last_report: Dict[str, Any] = {}
+        self.started = False
+
+    def start(self):
+        """Start the periodic warming loop on the background event loop"""
+        if self.started:
+            return
+        self.started = True
+        background_loop.submit(self._run_forever())
+        logger.info(f"🔥 Cache warmer started (every {self.interval}s, budget {self.upload_budget} uploads)")
+
+    async def _run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                logger.error(f"Cache warming cycle failed: {e}")
+
+    async def find_candidates(self) -> List[Dict[str, Any]]:
+        """Video IDs missed or requested often within the window, most missed first"""
+        usage_collection = get_usage_stats_collection('analytics_read')
+        if usage_collection is None:
+            return []
+
+        since = datetime.utcnow() - timedelta(minutes=self.window_minutes)
+        pipeline = [
+            {'$match': {
+                'timestamp': {'$gte': since},
+                'youtube_id': {'$ne': None},
+                'endpoint': {'$in': ['/video', '/audio']}
+            }},
+            {'$group': {
+                '_id': {'youtube_id': '$youtube_id', 'endpoint': '$endpoint'},
+                'requests': {'$sum': 1},
+                'misses': {'$sum': {'$cond': [{'$in': ['$status', MISS_STATUSES]}, 1, 0]}},
+                'qualities': {'$addToSet': '$quality'}
+            }},
+            # Only groups above a threshold leave the server; pick_candidates ranks them
+            {'$match': {'$or': [
+                {'misses': {'$gte': self.min_misses}},
+                {'requests': {'$gte': self.min_requests}}
+            ]}}
+        ]
+        groups = [doc async for doc in usage_collection.aggregate(pipeline)]
+        return self.pick_candidates(groups)
+
+    def pick_candidates(self, groups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rank usage groups by popularity (misses, then requests) and keep the best few per budget"""
+        ranked = sorted(
+            (g for g in groups if g['misses'] >= self.min_misses or g['requests'] >= self.min_requests),
+            key=lambda g: (-g['misses'], -g['requests'], g['_id']['youtube_id'], g['_id']['endpoint'])
+        )
+
+        candidates = []
+        for doc in ranked[:self.upload_budget * 5]:
+            content_type = doc['_id']['endpoint'].strip('/')
+            qualities = {normalize_quality(q) for q in doc.get('qualities', [])}
+            candidates.append({
+                'video_id': doc['_id']['youtube_id'],
+                'content_type': content_type,
+                'requested_qualities': sorted(qualities) if content_type == 'video' else [DEFAULT_QUALITY],
+                'misses': doc['misses'],
+                'requests': doc['requests']
+            })
+        return candidates
+
+    async def _cached_qualities(self, candidates: List[Dict[str, Any]]) -> Dict[Tuple[str, str], set]:
+        """Map (youtube_id, file_type) to the set of qualities held in the quality ladder"""
+        ladder_collection = get_content_ladder_collection()
+        cached: Dict[Tuple[str, str], set] = {}
+        if ladder_collection is None or not candidates:
+            return cached
+
+        doc_ids = list({quality_ladder.doc_id(c['video_id'], c['content_type']) for c in candidates})
+        cursor = ladder_collection.find({'_id': {'$in': doc_ids}}, {'youtube_id': 1, 'file_type': 1, 'qualities': 1})
+        async for doc in cursor:
+            cached[(doc['youtube_id'], doc['file_type'])] = set((doc.get('qualities') or {}).keys())
+        return cached
+
+    async def plan(self) -> List[Dict[str, Any]]:
+        """Build the list of (video, quality) uploads for this cycle within the budget"""
+        candidates = await self.find_candidates()
+        cached = await self._cached_qualities(candidates)
+        now = time.time()
+
+        planned = []
+        for candidate in candidates:
+            key = (candidate['video_id'], candidate['content_type'])
+            have = cached.get(key, set())
+            if candidate['content_type'] == 'audio':
+                missing = [] if have else [DEFAULT_QUALITY]
+            else:
+                missing = [q for q in candidate['requested_qualities'] if q not in have]
+
+            for quality in missing:
+                warm_key = (candidate['video_id'], candidate['content_type'], quality)
+                if now - self.recently_warmed.get(warm_key, 0) < self.cooldown:
+                    continue
+                planned.append({
+                    'video_id': candidate['video_id'],
+                    'content_type': candidate['content_type'],
+                    'quality': quality,
+                    'misses': candidate['misses'],
+                    'requests': candidate['requests']
+                })
+                if len(planned) >= self.upload_budget:
+                    return planned
+        return planned
+
+    async def run_cycle(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Run one warming cycle; with dry_run only report what would be warmed"""
+        planned = await self.plan()
+        jobs = []
+
+        if not dry_run and planned:
+            groups: Dict[Tuple[str, str], List[str]] = {}
+            for item in planned:
+                groups.setdefault((item['content_type'], item['quality']), []).append(item['video_id'])
+                self.recently_warmed[(item['video_id'], item['content_type'], item['quality'])] = time.time()
+
+            for (content_type, quality), video_ids in groups.items():
+                job = cache_prefetcher.submit(video_ids, content_type, quality)
+                jobs.append(job['job_id'])
+
+            # Forget cooldown entries that have expired
+            cutoff = time.time() - self.cooldown
+            self.recently_warmed = {k: v for k, v in self.recently_warmed.items() if v >= cutoff}
+
+        report = {
+            'status': True,
+            'dry_run': dry_run,
+            'planned': planned,
+            'prefetch_jobs': jobs,
+            'upload_budget': self.upload_budget,
+            'window_minutes': self.window_minutes,
+            'generated_at': datetime.utcnow().isoformat()
+        }
+        self.last_report = report
+        if planned:
+            logger.info(f"🔥 Cache warmer {'planned' if dry_run else 'queued'} {len(planned)} uploads")
+        return report
+
+# Global cache warmer instance
+cache_warmer = PopularityCacheWarmer()
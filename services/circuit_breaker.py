@@ -0,0 +1,140 @@
+"""
+Circuit breakers - stop calling a failing dependency and fail fast until it recovers
+"""
+import time
+from threading import Lock
+from typing import Dict, Any, Optional
+from config import (
+    SAVETUBE_BREAKER_FAILURE_THRESHOLD, SAVETUBE_BREAKER_RECOVERY_SECONDS,
+    TELEGRAM_BREAKER_FAILURE_THRESHOLD, TELEGRAM_BREAKER_RECOVERY_SECONDS,
+    MONGODB_BREAKER_FAILURE_THRESHOLD, MONGODB_BREAKER_RECOVERY_SECONDS
+)
+from utils.logging import LOGGER
+from utils.metrics import metrics
+
+logger = LOGGER(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is unavailable (circuit open), retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures; half-open trial call after the recovery timeout.
+
+    Thread-safe: the same breaker is shared by request threads and the background loop.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.lock = Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.total_failures = 0
+        self.rejected_calls = 0
+        self.last_failure: Optional[str] = None
+        self.last_state_change = time.time()
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"⚡ Circuit {self.name}: {self.state} -> {state}")
+            self.state = state
+            self.last_state_change = time.time()
+
+    def retry_after(self) -> int:
+        return max(1, int(self.opened_at + self.recovery_timeout - time.time()) + 1)
+
+    def allow_request(self) -> bool:
+        """Whether a call may go through now (counts as a trial call when half-open)"""
+        with self.lock:
+            now = time.time()
+            if self.state != CLOSED and now >= self.opened_at + self.recovery_timeout:
+                # Also re-arms a half-open breaker whose trial call never reported back
+                self._set_state(HALF_OPEN)
+                self.opened_at = now
+                self.half_open_calls = 0
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self.half_open_calls < self.half_open_max_calls:
+                self.half_open_calls += 1
+                return True
+            self.rejected_calls += 1
+            return False
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go through"""
+        if not self.allow_request():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self._set_state(CLOSED)
+
+    def record_failure(self, error: Optional[Exception] = None):
+        with self.lock:
+            self.failures += 1
+            self.total_failures += 1
+            if error is not None:
+                self.last_failure = str(error)[:200]
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+                self._set_state(OPEN)
+
+    @property
+    def is_open(self) -> bool:
+        with self.lock:
+            return self.state == OPEN and time.time() < self.opened_at + self.recovery_timeout
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            snapshot = {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout_seconds': self.recovery_timeout,
+                'total_failures': self.total_failures,
+                'rejected_calls': self.rejected_calls,
+                'last_failure': self.last_failure,
+                'last_state_change': self.last_state_change
+            }
+        if snapshot['state'] == OPEN:
+            snapshot['retry_after'] = self.retry_after()
+        return snapshot
+
+savetube_breaker = CircuitBreaker('savetube', SAVETUBE_BREAKER_FAILURE_THRESHOLD, SAVETUBE_BREAKER_RECOVERY_SECONDS)
+telegram_breaker = CircuitBreaker('telegram', TELEGRAM_BREAKER_FAILURE_THRESHOLD, TELEGRAM_BREAKER_RECOVERY_SECONDS)
+mongodb_breaker = CircuitBreaker('mongodb', MONGODB_BREAKER_FAILURE_THRESHOLD, MONGODB_BREAKER_RECOVERY_SECONDS)
+
+BREAKERS = {breaker.name: breaker for breaker in (savetube_breaker, telegram_breaker, mongodb_breaker)}
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every dependency breaker, for /health and the admin panel"""
+    return {name: breaker.snapshot() for name, breaker in BREAKERS.items()}
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+metrics.gauge(
+    'circuit_breaker_state', 'Dependency circuit state (0 closed, 1 half-open, 2 open)', ('dependency',),
+    function=lambda: {(name,): STATE_VALUES[breaker.state] for name, breaker in BREAKERS.items()}
+)
+metrics.gauge(
+    'circuit_breaker_failures_total', 'Failed calls recorded by each dependency breaker', ('dependency',),
+    function=lambda: {(name,): breaker.total_failures for name, breaker in BREAKERS.items()}, type='counter'
+)
+metrics.gauge(
+    'circuit_breaker_rejected_calls_total', 'Calls refused while a breaker was open', ('dependency',),
+    function=lambda: {(name,): breaker.rejected_calls for name, breaker in BREAKERS.items()}, type='counter'
+)
@@ -0,0 +1,292 @@
+"""
+Asynchronous request jobs - 202 Accepted mode for /video and /audio with polling and webhooks
+"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+from datetime import datetime
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+import httpx
+from config import (
+    REQUEST_JOB_TTL_HOURS, REQUEST_JOB_CONCURRENCY,
+    WEBHOOK_TIMEOUT_SECONDS, WEBHOOK_RETRY_DELAYS, WEBHOOK_ALLOW_PRIVATE_HOSTS
+)
+from database.repository import get_request_jobs_collection
+from models_simple import RequestJob
+from services.api_service import api_service
+from services.circuit_breaker import mongodb_breaker
+from services.quality_ladder import quality_ladder, normalize_quality
+from services.telegram_cache import TelegramCache
+from services.youtube_downloader import YouTubeDownloader
+from utils.background_loop import background_loop
+from utils.youtube_url import extract_video_id, canonical_url
+from utils.logging import LOGGER, set_request_id
+from utils.tracing import tracer
+
+logger = LOGGER(__name__)
+
+class InvalidCallbackURL(ValueError):
+    """callback_url is malformed or points at a host the server must not call"""
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split('%', 1)[0])  # drop an IPv6 zone index
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return not (ip.is_loopback or ip.is_private or ip.is_link_local or ip.is_reserved
+                or ip.is_multicast or ip.is_unspecified)
+
+PUBLIC_FIELDS = ('video_id', 'content_type', 'quality', 'status', 'result', 'error', 'created_at', 'updated_at')
+
+class RequestJobService:
+    """Resolves cache misses on the background loop; jobs are stored in MongoDB so any worker can answer polls"""
+
+    def __init__(self):
+        # Used when MongoDB is unavailable; only the accepting worker can answer polls then
+        self.local_jobs: Dict[str, Dict[str, Any]] = {}
+        self.concurrency = REQUEST_JOB_CONCURRENCY
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Own instances: their HTTP sessions are created lazily on the background loop
+        self.downloader = YouTubeDownloader()
+        self.cache: Optional[TelegramCache] = None
+        self.webhook_session: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def validate_callback_url(callback_url: Optional[str]) -> Optional[str]:
+        if not callback_url:
+            return None
+        parts = urlsplit(callback_url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise InvalidCallbackURL("callback_url must be an http(s) URL")
+        return callback_url
+
+    @staticmethod
+    async def check_callback_host(callback_url: str):
+        """Refuse hosts that resolve to loopback, private, link-local, reserved or multicast addresses"""
+        if WEBHOOK_ALLOW_PRIVATE_HOSTS:
+            return
+        parts = urlsplit(callback_url)
+        try:
+            port = parts.port or (443 if parts.scheme == 'https' else 80)
+            addresses = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+        except (OSError, ValueError) as e:
+            raise InvalidCallbackURL(f"callback_url host cannot be resolved: {e}")
+        if not addresses or not all(_is_public_address(address[4][0]) for address in addresses):
+            raise InvalidCallbackURL("callback_url must point to a public host")
+
+    async def create(self, api_key: str, youtube_url: str, content_type: str = 'video',
+                     quality: Optional[str] = None, callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """Store a new job and start it on the background loop"""
+        extract_video_id(youtube_url)  # reject invalid URLs before accepting the job
+        callback_url = self.validate_callback_url(callback_url)
+        if callback_url:
+            await self.check_callback_host(callback_url)
+        job = RequestJob(
+            api_key=api_key,
+            youtube_url=youtube_url,
+            content_type=content_type,
+            quality=normalize_quality(quality) if content_type == 'video' else None,
+            callback_url=callback_url,
+            ttl_hours=REQUEST_JOB_TTL_HOURS
+        ).to_dict()
+
+        collection = get_request_jobs_collection()
+        if collection is not None:
+            # Expiry is handled by the request_jobs TTL index (database/migrations.py)
+            await collection.insert_one(job)
+        else:
+            self.local_jobs[job['_id']] = job
+
+        view = self.public_view(job)
+        background_loop.submit(self._run(job['_id']))
+        logger.info(f"📨 Request job accepted: {job['_id']} ({content_type})")
+        return view
+
+    async def get(self, job_id: str, api_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Raw job document; with api_key, only if the job belongs to that key"""
+        collection = get_request_jobs_collection()
+        if collection is not None:
+            job = await collection.find_one({'_id': job_id})
+        else:
+            job = self.local_jobs.get(job_id)
+        if job is None or (api_key is not None and job['api_key'] != api_key):
+            return None
+        return job
+
+    @staticmethod
+    def public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+        view = {'job_id': job['_id']}
+        for field in PUBLIC_FIELDS:
+            value = job.get(field)
+            view[field] = value.isoformat() if isinstance(value, datetime) else value
+        view['webhook'] = bool(job.get('callback_url'))
+        return view
+
+    async def _update(self, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+        fields['updated_at'] = datetime.utcnow()
+        collection = get_request_jobs_collection()
+        if collection is not None:
+            await collection.update_one({'_id': job_id}, {'$set': fields})
+            return await collection.find_one({'_id': job_id})
+        job = self.local_jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+        return job
+
+    async def _run(self, job_id: str):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self.cache is None:
+            self.cache = TelegramCache()
+
+        set_request_id(job_id)  # log lines of the job carry its ID
+        async with self._semaphore:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            started = datetime.utcnow()
+            try:
+                with tracer.trace('job.run', job_id=job_id, content_type=job.get('content_type')):
+                    await self._resolve(job, started)
+            except Exception as e:
+                logger.error(f"Request job {job_id} failed: {e}")
+                await self._fail(job, {'error': str(e), 'reason': 'internal_error'}, started)
+
+    async def _resolve(self, job: Dict[str, Any], started: datetime):
+        job_id = job['_id']
+        content_type = job['content_type']
+        quality = job['quality']
+        video_id = extract_video_id(job['youtube_url'])
+        youtube_url = canonical_url(video_id)
+        await self._update(job_id, status='running', video_id=video_id)
+
+        cached = None
+        if mongodb_breaker.allow_request():
+            try:
+                cached = await quality_ladder.lookup(video_id, content_type, quality)
+                mongodb_breaker.record_success()
+            except Exception as e:
+                mongodb_breaker.record_failure(e)
+                logger.error(f"Cache lookup failed for job {job_id}, treating as miss: {e}")
+        if cached:
+            result = {
+                'cached': True,
+                'title': cached['title'],
+                'duration': cached['duration'],
+                'quality': cached.get('quality'),
+                'telegram_file_id': cached['telegram_file_id'],
+                'file_size': cached.get('file_size')
+            }
+            status = 'production_cache_hit' if cached['source'] == 'ladder' else 'mongodb_cache_hit'
+            await self._complete(job, result, status, started)
+            return
+
+        best_quality = await api_service._get_best_quality(youtube_url, content_type, quality)
+        download = await self.downloader.download_content(youtube_url, best_quality, content_type)
+        if not download['status']:
+            await self._fail(job, download, started)
+            return
+
+        result = {
+            'cached': False,
+            'title': download['title'],
+            'duration': download['duration'],
+            'quality': quality,
+            'download_url': download['download_url'],
+            'telegram_file_id': None
+        }
+        job = await self._update(job_id, status='download_ready', result=result)
+        await self._notify(job, 'job.download_ready')
+
+        # Same upload the synchronous path starts in its background thread
+        telegram_file_id = await self.cache.download_and_cache(
+            download_url=download['download_url'],
+            video_info={
+                'video_id': video_id,
+                'title': download['title'],
+                'duration': download['duration'],
+                'source_url': youtube_url,
+                'thumbnail': download.get('thumbnail'),
+                'uploader': 'YouTube',
+                'type': content_type,
+                'quality': best_quality
+            }
+        )
+        result['telegram_file_id'] = telegram_file_id
+        error = None
+        if telegram_file_id is None:
+            # The download URL is still usable; the file just will not be served from cache next time
+            error = {'message': 'Telegram upload failed, the file was not cached', 'reason': 'cache_upload_failed',
+                     'retry_after': None}
+            logger.warning(f"⚠️ Request job {job_id}: download ready but Telegram upload failed")
+        await self._complete(job, result, 'success', started, error)
+
+    async def _complete(self, job: Dict[str, Any], result: Dict[str, Any], usage_status: str, started: datetime,
+                        error: Optional[Dict[str, Any]] = None):
+        job = await self._update(job['_id'], status='completed', result=result, error=error)
+        await self._log_usage(job, usage_status, started)
+        await self._notify(job, 'job.completed')
+
+    async def _fail(self, job: Dict[str, Any], failure: Dict[str, Any], started: datetime):
+        error = {'message': failure.get('error'), 'reason': failure.get('reason'), 'retry_after': failure.get('retry_after')}
+        job = await self._update(job['_id'], status='failed', error=error)
+        await self._log_usage(job, 'error', started)
+        await self._notify(job, 'job.failed')
+
+    async def _log_usage(self, job: Dict[str, Any], status: str, started: datetime):
+        response_time = (datetime.utcnow() - started).total_seconds()
+        await api_service.log_usage(
+            job['api_key'], f"/{job['content_type']}", job.get('video_id'), response_time, status, job.get('quality')
+        )
+
+    @staticmethod
+    def sign(api_key: str, body: bytes) -> str:
+        """HMAC-SHA256 of the webhook body keyed with the job's API key"""
+        return 'sha256=' + hmac.new(api_key.encode(), body, hashlib.sha256).hexdigest()
+
+    async def _notify(self, job: Optional[Dict[str, Any]], event: str):
+        """POST the job to its callback_url, retrying with back-off"""
+        if not job or not job.get('callback_url'):
+            return
+        if self.webhook_session is None:
+            self.webhook_session = httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT_SECONDS)
+
+        body = json.dumps({'event': event, 'job': self.public_view(job)}).encode()
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Webhook-Event': event,
+            'X-Webhook-Signature': self.sign(job['api_key'], body)
+        }
+
+        delivery = {'event': event, 'status_code': None, 'attempts': 0, 'error': None}
+        for attempt, delay in enumerate([0] + WEBHOOK_RETRY_DELAYS):
+            if delay:
+                await asyncio.sleep(delay)
+            delivery['attempts'] = attempt + 1
+            try:
+                # Checked again per attempt: the host may resolve differently than when the job was created
+                await self.check_callback_host(job['callback_url'])
+            except InvalidCallbackURL as e:
+                delivery['error'] = str(e)
+                break
+            try:
+                response = await self.webhook_session.post(job['callback_url'], content=body, headers=headers)
+                delivery['status_code'] = response.status_code
+                if response.status_code < 500:
+                    break
+            except Exception as e:
+                delivery['error'] = str(e)[:200]
+        delivery['delivered_at'] = datetime.utcnow()
+
+        collection = get_request_jobs_collection()
+        if collection is not None:
+            await collection.update_one({'_id': job['_id']}, {'$push': {'webhook_deliveries': delivery}})
+        elif job['_id'] in self.local_jobs:
+            self.local_jobs[job['_id']]['webhook_deliveries'].append(delivery)
+        logger.info(f"🔔 Webhook {event} for job {job['_id']}: {delivery['status_code'] or delivery['error']}")
+
+# Global request job service instance
+request_jobs = RequestJobService()
@@ -0,0 +1,84 @@
+"""
+Negative-result cache - remember failed lookups so dead videos fail fast
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Any, Optional
+from config import (
+    NEGATIVE_CACHE_BASE_TTL_SECONDS, NEGATIVE_CACHE_UNAVAILABLE_TTL_SECONDS,
+    NEGATIVE_CACHE_MAX_TTL_SECONDS, NEGATIVE_CACHE_MAX_ENTRIES
+)
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+# Failure reasons reported by YouTubeDownloader
+UNAVAILABLE = 'unavailable'          # SaveTube refused the video (private, removed, region locked...)
+UPSTREAM_ERROR = 'upstream_error'    # network / HTTP / unexpected response
+DECRYPT_FAILED = 'decrypt_failed'    # payload could not be decrypted or parsed
+DOWNLOAD_FAILED = 'download_failed'  # no download URL for this format after retries
+
+class NegativeCache:
+    """Bounded in-process map of failing keys with exponentially growing TTLs"""
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = Lock()
+        self.base_ttl = NEGATIVE_CACHE_BASE_TTL_SECONDS
+        self.unavailable_ttl = NEGATIVE_CACHE_UNAVAILABLE_TTL_SECONDS
+        self.max_ttl = NEGATIVE_CACHE_MAX_TTL_SECONDS
+        self.max_entries = NEGATIVE_CACHE_MAX_ENTRIES
+        self.hits = 0
+
+    def _ttl(self, reason: str, failures: int) -> int:
+        base = self.unavailable_ttl if reason == UNAVAILABLE else self.base_ttl
+        return min(base * 2 ** (failures - 1), self.max_ttl)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Active failure for key, with seconds left in retry_after, or None"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry['expires_at'] <= now:
+                # Keep the failure count so the next failure backs off further
+                return None
+            self.hits += 1
+            return dict(entry, retry_after=int(entry['expires_at'] - now) + 1)
+
+    def record_failure(self, key: str, reason: str, message: str) -> Dict[str, Any]:
+        """Record a failure and return the entry with its new TTL"""
+        now = time.time()
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            failures = (previous['failures'] if previous else 0) + 1
+            ttl = self._ttl(reason, failures)
+            entry = {
+                'reason': reason,
+                'message': message,
+                'failures': failures,
+                'first_failed_at': previous['first_failed_at'] if previous else now,
+                'expires_at': now + ttl
+            }
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        logger.warning(f"🚫 Negative cache: {key} {reason} (failure #{failures}, retry in {ttl}s)")
+        return dict(entry, retry_after=ttl)
+
+    def clear(self, key: str):
+        """Forget a key after a successful lookup"""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self.lock:
+            active = sum(1 for e in self.entries.values() if e['expires_at'] > now)
+            return {'entries': len(self.entries), 'active': active, 'hits': self.hits}
+
+# Global negative cache instance
+negative_cache = NegativeCache()
@@ -0,0 +1,236 @@
+"""
+Bulk cache prefetching - warm the Telegram cache before traffic arrives
+"""
+import asyncio
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from typing import Dict, Any, Optional, List, Callable
+from config import (
+    PREFETCH_CONCURRENCY, PREFETCH_MIN_INTERVAL_SECONDS,
+    PREFETCH_MAX_ITEMS, PREFETCH_JOB_HISTORY
+)
+from services.youtube_downloader import YouTubeDownloader
+from services.telegram_cache import TelegramCache
+from utils.background_loop import background_loop
+from utils.youtube_url import extract_video_id, canonical_url
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+class CachePrefetcher:
+    """Queues video IDs/URLs for background download_and_cache with bounded concurrency"""
+
+    def __init__(self):
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = Lock()
+        self.concurrency = PREFETCH_CONCURRENCY
+        self.min_interval = PREFETCH_MIN_INTERVAL_SECONDS
+        self.max_items = PREFETCH_MAX_ITEMS
+        # Expanders turn one input (e.g. a playlist URL) into many items.
+        # Each returns a list of items, or None when it does not apply.
+        self.expanders: List[Callable[[str], Optional[List[str]]]] = []
+        # Own instances: their HTTP sessions are created lazily on the background loop
+        self.downloader = YouTubeDownloader()
+        self.cache: Optional[TelegramCache] = None
+        self._last_start = 0.0
+        self._throttle_lock: Optional[asyncio.Lock] = None
+        # Shared by every job so PREFETCH_CONCURRENCY caps the process, not each job
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def register_expander(self, expander: Callable[[str], Optional[List[str]]]):
+        """Register a hook that expands playlist/channel inputs into video items"""
+        self.expanders.append(expander)
+
+    def expand_items(self, items: List[str]) -> List[str]:
+        """Apply registered expanders to the raw input list"""
+        expanded = []
+        for item in items:
+            for expander in self.expanders:
+                try:
+                    result = expander(item)
+                except Exception as e:
+                    logger.warning(f"Prefetch expander failed for {item}: {e}")
+                    result = None
+                if result is not None:
+                    expanded.extend(result)
+                    break
+            else:
+                expanded.append(item)
+        return expanded
+
+    def _resolve_video_id(self, item: str) -> str:
+        """Accept a bare 11-character ID or any supported YouTube URL"""
+        return extract_video_id(item)
+
+    def submit(self, items: List[str], content_type: str = 'video', quality: str = '360') -> Dict[str, Any]:
+        """Create a prefetch job and queue it on the background loop"""
+        raw_items = [i for i in self.expand_items(items) if i and i.strip()]
+        if len(raw_items) > self.max_items:
+            raise ValueError(f"Too many items ({len(raw_items)}), maximum is {self.max_items}")
+
+        job_items = []
+        seen = set()
+        for raw in raw_items:
+            entry = {'input': raw.strip(), 'video_id': None, 'state': 'queued', 'error': None}
+            try:
+                video_id = self._resolve_video_id(raw)
+                if video_id in seen:
+                    continue
+                seen.add(video_id)
+                entry['video_id'] = video_id
+            except ValueError as e:
+                entry['state'] = 'failed'
+                entry['error'] = str(e)
+            job_items.append(entry)
+
+        job = {
+            'job_id': str(uuid.uuid4()),
+            'status': 'queued',
+            'content_type': content_type,
+            'quality': quality if content_type == 'video' else None,
+            'total': len(job_items),
+            'completed': 0,
+            'cached': 0,
+            'skipped': 0,
+            'failed': 0,
+            'cancelled': 0,
+            'items': job_items,
+            'created_at': datetime.utcnow().isoformat(),
+            'started_at': None,
+            'finished_at': None
+        }
+        for entry in job_items:
+            if entry['state'] == 'failed':
+                job['failed'] += 1
+                job['completed'] += 1
+
+        with self.lock:
+            self.jobs[job['job_id']] = job
+            while len(self.jobs) > PREFETCH_JOB_HISTORY:
+                self.jobs.popitem(last=False)
+
+        background_loop.submit(self._run_job(job))
+        logger.info(f"📥 Prefetch job queued: {job['job_id']} ({job['total']} items)")
+        return self._summary(job)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Stop a job: items not yet started are cancelled, running ones finish"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job['status'] in ('queued', 'running'):
+                job['status'] = 'cancelling'
+                logger.info(f"🛑 Prefetch job cancelling: {job_id}")
+            return self._summary(job, include_items=False)
+
+    def get_job(self, job_id: str, include_items: bool = True) -> Optional[Dict[str, Any]]:
+        """Get progress report for a prefetch job"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return self._summary(job, include_items)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Get summaries of recent prefetch jobs (newest first)"""
+        with self.lock:
+            return [self._summary(job, include_items=False) for job in reversed(self.jobs.values())]
+
+    def _summary(self, job: Dict[str, Any], include_items: bool = True) -> Dict[str, Any]:
+        summary = {k: v for k, v in job.items() if k != 'items'}
+        if include_items:
+            summary['items'] = [dict(entry) for entry in job['items']]
+        return summary
+
+    async def _throttle(self):
+        """Space out job starts by at least min_interval seconds"""
+        async with self._throttle_lock:
+            loop = asyncio.get_running_loop()
+            wait = self._last_start + self.min_interval - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_start = loop.time()
+
+    async def _run_job(self, job: Dict[str, Any]):
+        if self.cache is None:
+            self.cache = TelegramCache()
+        if self._throttle_lock is None:
+            self._throttle_lock = asyncio.Lock()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        with self.lock:
+            if job['status'] == 'queued':
+                job['status'] = 'running'
+            job['started_at'] = datetime.utcnow().isoformat()
+
+        async def worker(entry):
+            async with self._semaphore:
+                if job['status'] == 'cancelling':
+                    self._finish(job, entry, 'cancelled')
+                    return
+                await self._throttle()
+                await self._prefetch_one(job, entry)
+
+        pending = [entry for entry in job['items'] if entry['state'] == 'queued']
+        await asyncio.gather(*(worker(entry) for entry in pending), return_exceptions=True)
+
+        with self.lock:
+            job['status'] = 'cancelled' if job['status'] == 'cancelling' else 'completed'
+            job['finished_at'] = datetime.utcnow().isoformat()
+        logger.info(f"✅ Prefetch job {job['job_id']} {job['status']}: {job['cached']} cached, "
+                    f"{job['skipped']} skipped, {job['failed']} failed, {job['cancelled']} cancelled")
+
+    async def _prefetch_one(self, job: Dict[str, Any], entry: Dict[str, Any]):
+        content_type = job['content_type']
+        quality = job['quality'] or '360'
+        video_id = entry['video_id']
+        entry['state'] = 'running'
+        try:
+            content_hash = self.cache._generate_content_hash(video_id, content_type, quality)
+            if await self.cache._check_duplicate_by_hash(content_hash):
+                self._finish(job, entry, 'skipped', 'already_cached')
+                return
+
+            youtube_url = canonical_url(video_id)
+            download_result = await self.downloader.download_content(youtube_url, quality, content_type)
+            if not download_result.get('status'):
+                self._finish(job, entry, 'failed', download_result.get('error', 'download_failed'))
+                return
+
+            video_info = {
+                'video_id': video_id,
+                'title': download_result.get('title', 'Unknown'),
+                'duration': download_result.get('duration', '0:00'),
+                'source_url': youtube_url,
+                'thumbnail': download_result.get('thumbnail'),
+                'uploader': download_result.get('uploader', 'YouTube'),
+                'type': content_type,
+                'quality': quality
+            }
+            telegram_file_id = await self.cache.download_and_cache(
+                download_url=download_result['download_url'],
+                video_info=video_info
+            )
+            if telegram_file_id:
+                entry['telegram_file_id'] = telegram_file_id
+                self._finish(job, entry, 'cached')
+            else:
+                self._finish(job, entry, 'failed', 'upload_failed')
+
+        except Exception as e:
+            logger.error(f"Prefetch failed for {video_id}: {e}")
+            self._finish(job, entry, 'failed', str(e))
+
+    def _finish(self, job: Dict[str, Any], entry: Dict[str, Any], state: str, error: Optional[str] = None):
+        with self.lock:
+            entry['state'] = state
+            entry['error'] = error
+            job[state] += 1
+            job['completed'] += 1
+
+# Global prefetcher instance
+cache_prefetcher = CachePrefetcher()
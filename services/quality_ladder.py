@@ -0,0 +1,195 @@
+"""
+Quality ladder cache model - one document per video holding every cached quality
+"""
+from datetime import datetime
+from typing import Dict, Any, Optional, Iterable
+from config import CACHE_QUALITY_POLICY, QUALITY_UPGRADE_THRESHOLD
+from database.storage import storage
+from utils.logging import LOGGER
+from utils.tracing import tracer
+
+logger = LOGGER(__name__)
+
+VIDEO_LADDER = ['144', '240', '360', '480', '720', '1080']
+AUDIO_KEY = 'audio'
+DEFAULT_VIDEO_QUALITY = '360'
+POLICIES = ('exact_only', 'prefer_higher', 'prefer_lower')
+
+def normalize_quality(quality: Optional[str]) -> str:
+    """Normalize '720p', 720 or ' 720 ' to '720'"""
+    if quality is None:
+        return DEFAULT_VIDEO_QUALITY
+    value = str(quality).strip().lower().rstrip('p')
+    return value or DEFAULT_VIDEO_QUALITY
+
+def ladder_key(content_type: str, quality: Optional[str]) -> str:
+    """Key used in the qualities map; audio has a single slot"""
+    return AUDIO_KEY if content_type == 'audio' else normalize_quality(quality)
+
+def _rank(quality: str) -> int:
+    try:
+        return int(quality)
+    except ValueError:
+        return -1
+
+def resolve_quality(available: Iterable[str], requested: str, policy: str = CACHE_QUALITY_POLICY) -> Optional[str]:
+    """Pick the quality to serve: exact, else nearest higher / lower according to policy"""
+    available = [q for q in available if q]
+    if not available:
+        return None
+    if requested in available:
+        return requested
+    if requested == AUDIO_KEY or policy == 'exact_only':
+        return None
+
+    target = _rank(requested)
+    higher = sorted((q for q in available if _rank(q) > target), key=_rank)
+    lower = sorted((q for q in available if _rank(q) < target), key=_rank, reverse=True)
+    order = lower + higher if policy == 'prefer_lower' else higher + lower
+    return order[0] if order else None
+
+class QualityLadderCache:
+    """Cache index keyed by (youtube_id, file_type) with a map of quality -> Telegram file"""
+
+    def __init__(self):
+        self.policy = CACHE_QUALITY_POLICY if CACHE_QUALITY_POLICY in POLICIES else 'prefer_higher'
+        self.upgrade_threshold = QUALITY_UPGRADE_THRESHOLD
+
+    @staticmethod
+    def doc_id(youtube_id: str, content_type: str) -> str:
+        return f"{youtube_id}:{content_type}"
+
+    @tracer.traced('cache.lookup')
+    async def lookup(self, youtube_id: str, content_type: str, quality: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Resolve the best cached file for a request with a single _id read (plus one legacy read
+        the first time a quality is missing from a document that has not merged its legacy rows)"""
+        doc_id = self.doc_id(youtube_id, content_type)
+        doc = await storage.get_ladder(doc_id)
+        source = 'ladder'
+        if not doc:
+            doc = await self._backfill_from_legacy(youtube_id, content_type)
+            source = 'legacy'
+            if not doc:
+                return None
+
+        requested = ladder_key(content_type, quality)
+        qualities = doc.get('qualities') or {}
+        merged = set()
+        if requested not in qualities and not doc.get('legacy_merged'):
+            # A new upload may have created the document before this video's legacy rows were read
+            merged = await self._merge_legacy(doc, youtube_id, content_type)
+            qualities = doc['qualities']
+        served = resolve_quality(qualities.keys(), requested, self.policy)
+        if served is None:
+            return None
+        if served in merged:
+            source = 'legacy'
+
+        wants_upgrade = content_type == 'video' and _rank(served) < _rank(requested)
+        await storage.touch_ladder(doc_id, served, requested if wants_upgrade else None)
+
+        if wants_upgrade:
+            upgrade_count = (doc.get('upgrade_requests') or {}).get(requested, 0) + 1
+            if upgrade_count >= self.upgrade_threshold:
+                await self._queue_upgrade(doc_id, youtube_id, requested)
+
+        entry = qualities[served]
+        return {
+            'youtube_id': youtube_id,
+            'telegram_file_id': entry['telegram_file_id'],
+            'title': doc.get('title'),
+            'duration': doc.get('duration'),
+            'file_type': content_type,
+            'quality': served if content_type == 'video' else None,
+            'requested_quality': requested if content_type == 'video' else None,
+            'exact_match': served == requested,
+            'file_size': entry.get('file_size', 'Unknown'),
+            'upload_date': entry.get('upload_date'),
+            'content_hash': entry.get('content_hash'),
+            'access_count': doc.get('access_count', 0) + 1,
+            'source': source
+        }
+
+    async def _queue_upgrade(self, doc_id: str, youtube_id: str, quality: str):
+        """Atomically claim the upgrade counter and queue a background fetch at that quality"""
+        if not await storage.claim_upgrade(doc_id, quality, self.upgrade_threshold):
+            return
+        from services.prefetch_service import cache_prefetcher
+        cache_prefetcher.submit([youtube_id], 'video', quality)
+        logger.info(f"⬆️ Quality upgrade queued: {youtube_id} at {quality}p")
+
+    async def record(self, video_info: Dict[str, Any], telegram_file_id: str, content_type: str,
+                     quality: Optional[str], file_size: int, content_hash: str):
+        """Add or replace one quality slot for a video"""
+        key = ladder_key(content_type, quality)
+        now = datetime.utcnow()
+        entry = {
+            'telegram_file_id': telegram_file_id,
+            'file_size': file_size,
+            'content_hash': content_hash,
+            'upload_date': now.isoformat(),
+            'access_count': 0,
+            'last_accessed': now
+        }
+        await storage.put_ladder_quality(
+            self.doc_id(video_info['video_id'], content_type), video_info['video_id'], content_type,
+            key, entry, video_info.get('title'), video_info.get('duration')
+        )
+
+    async def remove_quality(self, youtube_id: str, content_type: str, quality: Optional[str]):
+        """Drop one quality slot (e.g. when the Telegram file is gone)"""
+        key = ladder_key(content_type, quality)
+        await storage.remove_ladder_quality(self.doc_id(youtube_id, content_type), key)
+
+    @staticmethod
+    def _legacy_qualities(rows: Iterable[Dict[str, Any]], content_type: str) -> Dict[str, Dict[str, Any]]:
+        """Quality slots for per-quality content_cache rows written before the ladder existed"""
+        return {
+            ladder_key(content_type, row.get('quality')): {
+                'telegram_file_id': row['telegram_file_id'],
+                'file_size': row.get('file_size'),
+                'content_hash': row.get('content_hash'),
+                'upload_date': row.get('upload_date'),
+                'access_count': row.get('access_count', 0),
+                'last_accessed': row.get('last_accessed')
+            }
+            for row in rows
+        }
+
+    async def _merge_legacy(self, doc: Dict[str, Any], youtube_id: str, content_type: str) -> set:
+        """Fold legacy rows into an existing ladder document once; returns the keys it added"""
+        rows = await storage.legacy_cache_rows(youtube_id, content_type)
+        qualities = doc.setdefault('qualities', {})
+        missing = {key: entry for key, entry in self._legacy_qualities(rows, content_type).items()
+                   if key not in qualities}
+        await storage.merge_ladder_qualities(doc['_id'], missing)
+        qualities.update(missing)
+        doc['legacy_merged'] = True
+        if missing:
+            logger.info(f"🪜 Legacy qualities merged into ladder: {youtube_id} ({content_type}) {sorted(missing)}")
+        return set(missing)
+
+    async def _backfill_from_legacy(self, youtube_id: str, content_type: str) -> Optional[Dict[str, Any]]:
+        """Build a ladder document from per-quality content_cache rows written before the ladder existed"""
+        rows = await storage.legacy_cache_rows(youtube_id, content_type)
+        qualities = self._legacy_qualities(rows, content_type)
+        if not qualities:
+            return None
+
+        doc = {
+            '_id': self.doc_id(youtube_id, content_type),
+            'youtube_id': youtube_id,
+            'file_type': content_type,
+            'title': rows[0].get('title'),
+            'duration': rows[0].get('duration'),
+            'qualities': qualities,
+            'access_count': sum(q.get('access_count') or 0 for q in qualities.values()),
+            'legacy_merged': True,
+            'created_at': datetime.utcnow()
+        }
+        await storage.insert_ladder(doc)
+        logger.info(f"🪜 Ladder backfilled from legacy cache: {youtube_id} ({content_type})")
+        return doc
+
+# Global quality ladder instance
+quality_ladder = QualityLadderCache()
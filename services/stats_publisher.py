@@ -0,0 +1,109 @@
+"""
+Live admin stats - computed once per tick and fanned out to every Server-Sent Events subscriber
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+from config import STATS_PUBLISH_INTERVAL_SECONDS, STATS_STREAM_KEEPALIVE_SECONDS, STATS_STREAM_MAX_SECONDS
+from services.api_service import api_service
+from services.circuit_breaker import breaker_states
+from utils.background_loop import background_loop
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+class StatsPublisher:
+    """One producer on the background loop, any number of SSE consumers.
+
+    Dashboard cost is one stats computation per interval whether one admin or
+    fifty have the page open, and nothing is computed while nobody listens.
+    """
+
+    def __init__(self, interval: float = STATS_PUBLISH_INTERVAL_SECONDS):
+        self.interval = interval
+        self.latest: Optional[Dict[str, Any]] = None
+        self.version = 0
+        self.subscribers = 0
+        self._condition = threading.Condition()
+        self._running = False
+
+    async def compute(self) -> Dict[str, Any]:
+        """The payload of /admin/api/stats"""
+        concurrent_users = await api_service.get_concurrent_user_count()
+        analytics = await api_service.get_analytics_data(1)  # Last hour
+        return {
+            'status': True,
+            'concurrent_users': concurrent_users,
+            'hourly_requests': analytics.get('total_requests', 0),
+            'cache_hit_rate': analytics.get('cache_hit_rate', 0),
+            'dependencies': breaker_states(),
+            'timestamp': datetime.utcnow().isoformat()
+        }
+
+    def _publish(self, stats: Dict[str, Any]):
+        with self._condition:
+            self.latest = stats
+            self.version += 1
+            self._condition.notify_all()
+
+    async def _run_forever(self):
+        while True:
+            with self._condition:
+                if self.subscribers == 0:
+                    self._running = False
+                    return
+            started = time.monotonic()
+            try:
+                self._publish(await self.compute())
+            except Exception as e:
+                logger.error(f"Stats publisher tick failed: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def subscribe(self):
+        with self._condition:
+            self.subscribers += 1
+            if not self._running:
+                self._running = True
+                background_loop.submit(self._run_forever())
+
+    def unsubscribe(self):
+        with self._condition:
+            self.subscribers = max(0, self.subscribers - 1)
+
+    def wait_for_update(self, last_version: int, timeout: float) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Block until a snapshot newer than last_version is published, or timeout"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.version != last_version, timeout)
+            return self.version, self.latest
+
+    def stream(self, max_seconds: float = STATS_STREAM_MAX_SECONDS):
+        """SSE event generator for one subscriber; keep-alive comments stop proxies closing idle streams.
+
+        The stream ends after max_seconds so it never holds a worker for the
+        lifetime of a browser tab; EventSource reconnects after the retry hint.
+        """
+        self.subscribe()
+        try:
+            version = 0
+            deadline = time.monotonic() + max_seconds
+            # A retry hint tells EventSource how long to wait before reconnecting
+            yield f"retry: {int(self.interval * 1000)}\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield f"retry: {int(self.interval * 1000)}\n\n"
+                    return
+                new_version, stats = self.wait_for_update(version, min(STATS_STREAM_KEEPALIVE_SECONDS, remaining))
+                if new_version == version or stats is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                version = new_version
+                yield f"id: {version}\nevent: stats\ndata: {json.dumps(stats)}\n\n"
+        finally:
+            self.unsubscribe()
+
+# Global stats publisher instance
+stats_publisher = StatsPublisher()
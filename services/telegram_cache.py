@@ -2,7 +2,9 @@ import asyncio
 import io
 import os
 import hashlib
+import json
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 from typing import Optional, Dict, Any, BinaryIO, List
 import httpx
 # Use direct HTTP API calls for Telegram instead of python-telegram-bot library
@@ -23,17 +25,30 @@ class Bot:
     """Simple Bot class using direct HTTP API calls"""
     def __init__(self, token):
         self.token = token
-        self.base_url = f"https://api.telegram.org/bot{token}"
+        self.base_url = f"{TELEGRAM_API_URL}/bot{token}"
+        self.file_base_url = f"{TELEGRAM_API_URL}/file/bot{token}"
+    
+    @staticmethod
+    def _result(response):
+        """Bot API result as attribute objects (message.video.file_id), or the matching TelegramError"""
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if response.status_code == 200 and data.get("ok"):
+            return json.loads(json.dumps(data["result"]), object_hook=lambda fields: SimpleNamespace(**fields))
+        description = data.get("description") or f"HTTP {response.status_code}"
+        if response.status_code == 429:
+            raise RetryAfter(description)
+        if response.status_code >= 500:
+            raise NetworkError(description)
+        raise BadRequest(description)
     
     async def get_file(self, file_id):
         """Get file info using direct API call"""
         async with httpx.AsyncClient() as client:
             response = await client.get(f"{self.base_url}/getFile", params={"file_id": file_id})
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("ok"):
-                    return data["result"]
-        return None
+            return self._result(response)
     
     async def send_audio(self, chat_id, audio, **kwargs):
         """Send audio using direct API call"""
@@ -43,9 +58,7 @@ class Bot:
             data.update(kwargs)
             
             response = await client.post(f"{self.base_url}/sendAudio", files=files, data=data)
-            if response.status_code == 200:
-                return response.json()
-        return None
+            return self._result(response)
     
     async def send_video(self, chat_id, video, **kwargs):
         """Send video using direct API call"""
@@ -55,17 +68,24 @@ class Bot:
             data.update(kwargs)
             
             response = await client.post(f"{self.base_url}/sendVideo", files=files, data=data)
-            if response.status_code == 200:
-                return response.json()
-        return None
-from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID
-from database.simple_mongo import get_content_cache_collection
+            return self._result(response)
+from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID, TELEGRAM_API_URL
+from database.repository import get_content_cache_collection
 from models_simple import ContentCache
+from services.quality_ladder import quality_ladder
+from services.circuit_breaker import telegram_breaker
+from utils import deadline
 from utils.logging import LOGGER
+from utils.metrics import metrics, upstream_request_duration
+from utils.tracing import tracer
 
 logger = LOGGER(__name__)
 
 class TelegramCache:
+    # Upload queue depth across every instance in the process (each has its own semaphore)
+    uploads_waiting = 0
+    uploads_active = 0
+    
     def __init__(self):
         # Check if we have proper credentials first
         has_credentials = bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHANNEL_ID)
@@ -120,79 +140,35 @@ class TelegramCache:
             await self.session.aclose()
             self.session = None
     
+    @tracer.traced('telegram.check_cache')
     async def check_cache(self, youtube_id: str, content_type: str, quality: Optional[str] = None) -> Optional[Dict[str, Any]]:
-        """Professional cache checking with comprehensive metadata"""
+        """Professional cache checking via the quality ladder (exact, else nearest quality)"""
         try:
-            cache_collection = get_content_cache_collection()
-            if cache_collection is None:
-                logger.warning("Cache collection not available")
-                return None
-            
-            # Build sophisticated query with fallback logic
-            primary_query = {
-                'youtube_id': youtube_id,
-                'file_type': content_type,
-                'status': 'active'  # Only active cache entries
-            }
-            
-            if quality and content_type == 'video':
-                primary_query['quality'] = quality
-            
-            # Try exact match first
-            cached_content = await cache_collection.find_one(primary_query)
-            
-            # Fallback: Find any quality for video if exact not found
-            if not cached_content and content_type == 'video' and quality:
-                fallback_query = {
-                    'youtube_id': youtube_id,
-                    'file_type': content_type,
-                    'status': 'active'
-                }
-                cached_content = await cache_collection.find_one(fallback_query)
-                if cached_content:
-                    logger.info(f"🔄 Using fallback quality {cached_content.get('quality')} for {youtube_id}")
+            cached_content = await quality_ladder.lookup(youtube_id, content_type, quality)
             
             if cached_content:
+                if not cached_content['exact_match'] and content_type == 'video':
+                    logger.info(f"🔄 Using ladder quality {cached_content['quality']} for {youtube_id} (requested {cached_content['requested_quality']})")
+                
                 # CRITICAL FIX: Skip telegram verification for manual uploads and assume they work
                 telegram_file_id = cached_content['telegram_file_id']
                 is_manual_upload = 'manually_uploaded' in telegram_file_id
                 
                 if is_manual_upload or await self._verify_telegram_file(telegram_file_id):
-                    # Update comprehensive access stats
-                    await cache_collection.update_one(
-                        {'_id': cached_content['_id']},
-                        {
-                            '$inc': {'access_count': 1},
-                            '$set': {
-                                'last_accessed': datetime.utcnow(),
-                                'last_verified': datetime.utcnow(),
-                                'status': 'active'  # Ensure status is active
-                            }
-                        }
-                    )
-                    
                     logger.info(f"🎯 TELEGRAM CHANNEL VIDEO FOUND: {cached_content['title']}")
-                    logger.info(f"📁 File ID: {cached_content['telegram_file_id']}")
-                    logger.info(f"📺 Quality: {cached_content.get('quality', 'default')}")
-                    print(f"🎯 TELEGRAM CHANNEL VIDEO FOUND: {cached_content['title']}")  # Console output
-                    return {
-                        'telegram_file_id': cached_content['telegram_file_id'],
-                        'title': cached_content['title'],
-                        'duration': cached_content['duration'],
-                        'file_type': cached_content['file_type'],
-                        'quality': cached_content.get('quality'),
-                        'file_size': cached_content.get('file_size', 'Unknown'),
-                        'upload_date': cached_content.get('upload_date'),
-                        'access_count': cached_content.get('access_count', 0) + 1,
-                        'cached': True,
-                        'cache_verified': True
-                    }
+                    logger.debug(f"📁 File ID: {telegram_file_id}")
+                    logger.debug(f"📺 Quality: {cached_content.get('quality') or 'default'}")
+                    cached_content.update({'cached': True, 'cache_verified': True})
+                    return cached_content
                 else:
-                    # Mark as inactive if file not accessible
-                    await cache_collection.update_one(
-                        {'_id': cached_content['_id']},
-                        {'$set': {'status': 'inactive', 'last_verified': datetime.utcnow()}}
-                    )
+                    # Drop the quality slot and mark the legacy row inactive if file not accessible
+                    await quality_ladder.remove_quality(youtube_id, content_type, cached_content.get('quality'))
+                    cache_collection = get_content_cache_collection()
+                    if cache_collection is not None:
+                        await cache_collection.update_one(
+                            {'telegram_file_id': telegram_file_id},
+                            {'$set': {'status': 'inactive', 'last_verified': datetime.utcnow()}}
+                        )
                     logger.warning(f"🔴 Cache entry marked inactive: {youtube_id}")
             
             logger.info(f"❌ Professional cache miss: {youtube_id} ({content_type})")
@@ -202,14 +178,26 @@ class TelegramCache:
             logger.error(f"Professional cache check failed: {e}")
             return None
     
+    @tracer.traced('telegram.download_and_cache')
     async def download_and_cache(self, download_url: str, video_info: Dict[str, Any]) -> Optional[str]:
         """Professional download and cache with advanced features"""
         # Return None if Telegram not available - this is normal operation
         if not self.telegram_available:
             logger.info(f"Telegram caching not available for: {video_info.get('title', 'Unknown')}")
             return None
+        
+        # Don't download a file we cannot upload right now
+        if telegram_breaker.is_open:
+            logger.warning(f"⚡ Telegram circuit open, skipping cache upload: {video_info.get('title', 'Unknown')}")
+            return None
             
-        async with self.upload_semaphore:  # Limit concurrent uploads
+        TelegramCache.uploads_waiting += 1
+        try:
+            await self.upload_semaphore.acquire()  # Limit concurrent uploads
+        finally:
+            TelegramCache.uploads_waiting -= 1
+        TelegramCache.uploads_active += 1
+        try:
             try:
                 session = await self.get_session()
                 content_type = video_info.get('type', 'video')
@@ -253,12 +241,17 @@ class TelegramCache:
             except Exception as e:
                 logger.error(f"Professional download and cache failed: {e}")
                 return None
+        finally:
+            TelegramCache.uploads_active -= 1
+            self.upload_semaphore.release()
     
     async def get_file_stream_url(self, telegram_file_id: str) -> Optional[str]:
         """Get streaming URL from Telegram file"""
         try:
             file = await self.bot.get_file(telegram_file_id)
-            return file.file_path
+            if file.file_path.startswith(('http://', 'https://')):
+                return file.file_path
+            return f"{self.bot.file_base_url}/{file.file_path}"
         except TelegramError as e:
             logger.error(f"Failed to get file stream URL: {e}")
             return None
@@ -300,8 +293,12 @@ class TelegramCache:
             # For manual uploads, assume file exists since we can't verify
             logger.info(f"Telegram verification skipped for {telegram_file_id} (manual upload)")
             return True
+        if telegram_breaker.is_open or not deadline.has_time(1):
+            # Serve the cached entry rather than wait on a failing Bot API or past the deadline
+            return True
         try:
-            file_info = await self.bot.get_file(telegram_file_id)
+            with tracer.span('telegram.get_file'), upstream_request_duration.time(dependency='telegram', operation='get_file'):
+                file_info = await self.bot.get_file(telegram_file_id)
             return file_info and file_info.file_path
         except Exception:
             # For manual uploads or bot connection issues, assume file exists
@@ -329,33 +326,34 @@ class TelegramCache:
     async def _stream_download_with_progress(self, session, download_url: str, title: str) -> tuple:
         """Professional streaming download with progress tracking"""
         try:
-            async with session.stream('GET', download_url) as response:
-                if response.status_code != 200:
-                    raise Exception(f"Download failed with status {response.status_code}")
-                
-                file_content = io.BytesIO()
-                total_size = 0
-                chunk_count = 0
-                
-                async for chunk in response.aiter_bytes(chunk_size=8192):
-                    file_content.write(chunk)
-                    total_size += len(chunk)
-                    chunk_count += 1
+            with tracer.span('savetube.file_download'), upstream_request_duration.time(dependency='savetube', operation='file_download'):
+                async with session.stream('GET', download_url) as response:
+                    if response.status_code != 200:
+                        raise Exception(f"Download failed with status {response.status_code}")
                     
-                    # Progress logging every 100 chunks (~ 800KB)
-                    if chunk_count % 100 == 0:
-                        size_mb = total_size / (1024 * 1024)
-                        logger.info(f"📥 Downloaded {size_mb:.1f}MB of {title[:30]}...")
+                    file_content = io.BytesIO()
+                    total_size = 0
+                    chunk_count = 0
                     
-                    # Professional size limit check
-                    if total_size > self.max_file_size:
-                        raise Exception(f"File too large for Telegram (>{self.max_file_size / (1024*1024):.0f}MB)")
-                
-                file_content.seek(0)
-                size_mb = total_size / (1024 * 1024)
-                logger.info(f"✅ Download complete: {size_mb:.1f}MB")
-                
-                return file_content, total_size
+                    async for chunk in response.aiter_bytes(chunk_size=8192):
+                        file_content.write(chunk)
+                        total_size += len(chunk)
+                        chunk_count += 1
+                        
+                        # Progress logging every 100 chunks (~ 800KB)
+                        if chunk_count % 100 == 0:
+                            size_mb = total_size / (1024 * 1024)
+                            logger.info(f"📥 Downloaded {size_mb:.1f}MB of {title[:30]}...")
+                        
+                        # Professional size limit check
+                        if total_size > self.max_file_size:
+                            raise Exception(f"File too large for Telegram (>{self.max_file_size / (1024*1024):.0f}MB)")
+            
+            file_content.seek(0)
+            size_mb = total_size / (1024 * 1024)
+            logger.info(f"✅ Download complete: {size_mb:.1f}MB")
+            
+            return file_content, total_size
                 
         except Exception as e:
             logger.error(f"Stream download failed: {e}")
@@ -372,47 +370,60 @@ class TelegramCache:
         caption = self._create_professional_caption(video_info, content_type, quality, file_size)
         
         for attempt, delay in enumerate(self.retry_delays, 1):
+            if not telegram_breaker.allow_request():
+                logger.warning(f"⚡ Telegram circuit open, giving up upload: {filename}")
+                return None
             try:
                 logger.info(f"📤 Upload attempt {attempt}/5: {filename}")
                 
                 file_content.seek(0)  # Reset file pointer
                 
-                if content_type == 'audio':
-                    message = await self.bot.send_audio(
-                        chat_id=self.channel_id,
-                        audio=file_content,
-                        title=video_info['title'][:64],  # Telegram title limit
-                        duration=self.parse_duration(video_info.get('duration', '0:00')),
-                        caption=caption,
-                        filename=filename,
-                        parse_mode=ParseMode.HTML
-                    )
-                    telegram_file_id = message.audio.file_id
-                else:
-                    message = await self.bot.send_video(
-                        chat_id=self.channel_id,
-                        video=file_content,
-                        caption=caption,
-                        filename=filename,
-                        parse_mode=ParseMode.HTML
-                    )
-                    telegram_file_id = message.video.file_id
+                with tracer.span('telegram.upload'), upstream_request_duration.time(dependency='telegram', operation='upload'):
+                    if content_type == 'audio':
+                        message = await self.bot.send_audio(
+                            chat_id=self.channel_id,
+                            audio=file_content,
+                            title=video_info['title'][:64],  # Telegram title limit
+                            duration=self.parse_duration(video_info.get('duration', '0:00')),
+                            caption=caption,
+                            filename=filename,
+                            parse_mode=ParseMode.HTML
+                        )
+                        telegram_file_id = message.audio.file_id
+                    else:
+                        message = await self.bot.send_video(
+                            chat_id=self.channel_id,
+                            video=file_content,
+                            caption=caption,
+                            filename=filename,
+                            parse_mode=ParseMode.HTML
+                        )
+                        telegram_file_id = message.video.file_id
                 
+                telegram_breaker.record_success()
                 logger.info(f"🎯 Professional upload successful: {telegram_file_id}")
                 return telegram_file_id
                 
             except (RetryAfter, TimedOut, NetworkError) as e:
+                telegram_breaker.record_failure(e)
                 if attempt < len(self.retry_delays):
                     logger.warning(f"⏳ Upload attempt {attempt} failed, retrying in {delay}s: {e}")
-                    await asyncio.sleep(delay)
+                    await deadline.sleep(delay, 'telegram upload')
                     continue
                 else:
                     logger.error(f"❌ All upload attempts failed: {e}")
                     return None
                     
             except (BadRequest, TelegramError) as e:
+                telegram_breaker.record_success()  # the Bot API answered; the request itself was bad
                 logger.error(f"❌ Upload failed with non-retryable error: {e}")
                 return None
+            
+            except httpx.HTTPError as e:
+                # Transport failures from the Bot API calls count against the breaker
+                telegram_breaker.record_failure(e)
+                logger.error(f"❌ Upload failed, Bot API unreachable: {e}")
+                return None
                 
         return None
     
@@ -445,16 +456,12 @@ class TelegramCache:
         
         return caption
     
+    @tracer.traced('telegram.save_cache_entry')
     async def _save_professional_cache_entry(self, video_info: Dict, telegram_file_id: str,
                                            content_type: str, quality: str, file_size: int, 
                                            content_hash: str):
         """Save comprehensive cache entry with professional metadata"""
         try:
-            cache_collection = get_content_cache_collection()
-            if cache_collection is None:
-                logger.warning("Cache collection not available for saving entry")
-                return
-            
             cache_entry = {
                 'youtube_id': video_info['video_id'],
                 'title': video_info['title'],
@@ -478,52 +485,30 @@ class TelegramCache:
                 }
             }
             
-            await cache_collection.insert_one(cache_entry)
+            # The ladder lives in the storage backend; legacy rows only exist in MongoDB
+            cache_collection = get_content_cache_collection()
+            if cache_collection is not None:
+                await cache_collection.insert_one(cache_entry)
+            await quality_ladder.record(video_info, telegram_file_id, content_type, quality, file_size, content_hash)
             logger.info(f"💾 Professional cache entry saved: {video_info['video_id']}")
             
         except Exception as e:
             logger.error(f"Failed to save professional cache entry: {e}")
     
-    async def professional_cleanup_cache(self, days: int = 30, max_inactive_days: int = 7):
-        """Professional cache cleanup with comprehensive logic"""
+    async def professional_cleanup_cache(self, days: int = 30, policy: Optional[str] = None,
+                                         dry_run: bool = False) -> Dict[str, Any]:
+        """Evict cache entries idle for `days` via the retention engine (hot entries are never dropped)"""
+        from services.cache_retention import cache_retention
         try:
-            cache_collection = get_content_cache_collection()
-            
-            # Clean up old inactive entries
-            cutoff_date = datetime.utcnow() - timedelta(days=days)
-            inactive_cutoff = datetime.utcnow() - timedelta(days=max_inactive_days)
-            
-            cleanup_query = {
-                '$or': [
-                    {
-                        'created_at': {'$lt': cutoff_date},
-                        'access_count': {'$lt': 5}  # Rarely accessed
-                    },
-                    {
-                        'status': 'inactive',
-                        'last_verified': {'$lt': inactive_cutoff}
-                    }
-                ]
-            }
-            
-            if cache_collection is not None:
-                deleted_count = await cache_collection.delete_many(cleanup_query)
-                
-                # Update statistics
-                total_active = await cache_collection.count_documents({'status': 'active'})
-                total_inactive = await cache_collection.count_documents({'status': 'inactive'})
-            else:
-                deleted_count = type('MockResult', (), {'deleted_count': 0})()
-                total_active = 0
-                total_inactive = 0
-            
-            logger.info(f"🧹 Professional cleanup complete:")
-            logger.info(f"   - Removed: {deleted_count.deleted_count} entries")
-            logger.info(f"   - Active: {total_active} entries")
-            logger.info(f"   - Inactive: {total_inactive} entries")
-            
+            return await cache_retention.run(policy_name=policy, dry_run=dry_run, min_idle_days=days)
         except Exception as e:
             logger.error(f"Professional cache cleanup failed: {e}")
+            return {'status': False, 'error': str(e)}
 
 # Global cache instance
 telegram_cache = TelegramCache()
+
+metrics.gauge('telegram_uploads_waiting', 'Cache uploads queued behind an upload semaphore',
+              function=lambda: TelegramCache.uploads_waiting)
+metrics.gauge('telegram_uploads_active', 'Cache uploads downloading or uploading right now',
+              function=lambda: TelegramCache.uploads_active)
@@ -0,0 +1,106 @@
+"""
+Hourly usage rollups - compact aggregates of usage_stats that outlive the raw TTL
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+from pymongo import ReplaceOne
+from config import USAGE_ROLLUP_INTERVAL_SECONDS, USAGE_STATS_RETENTION_DAYS
+from database.repository import get_usage_rollups_collection
+from database.storage import storage
+from utils.background_loop import background_loop
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+WATERMARK_ID = 'watermark'
+BATCH_SIZE = 500
+# Usage rows are written after the response, so an hour is only rolled up once late writes have landed
+GRACE = timedelta(minutes=5)
+
+def hour_floor(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+def rollup_id(hour: datetime, api_key: str, endpoint: str, status: str) -> str:
+    return f"{hour:%Y%m%d%H}:{api_key}:{endpoint}:{status}"
+
+class UsageRollup:
+    """Folds complete hours of raw usage into usage_rollups.
+
+    One document per (hour, api_key, endpoint, status) with request count and
+    response time totals. A watermark document records the last hour rolled
+    up, so each cycle only aggregates new hours and re-running a cycle just
+    replaces the same documents. Usage is read from the storage backend that
+    recorded it; raw rows expire through the usage_stats TTL index (MongoDB) or
+    are pruned after a successful cycle (SQLite), always days behind the watermark.
+    """
+
+    def __init__(self):
+        self.interval = USAGE_ROLLUP_INTERVAL_SECONDS
+        self.last_report: Dict[str, Any] = {}
+        self.started = False
+
+    def start(self):
+        """Start the periodic rollup loop on the background event loop"""
+        if self.started:
+            return
+        self.started = True
+        background_loop.submit(self._run_forever())
+        logger.info(f"📦 Usage rollups started (every {self.interval}s)")
+
+    async def _run_forever(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Usage rollup cycle failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def tick(self) -> Dict[str, Any]:
+        """One rollup cycle, then pruning of raw usage on backends without TTL indexes"""
+        report = await self.run_cycle()
+        # Only rolled-up usage may go: a failed cycle leaves the raw rows in place
+        if report.get('status'):
+            await storage.expire_usage(datetime.utcnow() - timedelta(days=USAGE_STATS_RETENTION_DAYS))
+        return report
+
+    async def run_cycle(self, until: Optional[datetime] = None) -> Dict[str, Any]:
+        """Roll up every complete hour between the watermark and until (default: now) minus GRACE"""
+        rollups_collection = get_usage_rollups_collection()
+        if rollups_collection is None:
+            return {'status': False, 'reason': 'database_unavailable'}
+
+        until = hour_floor((until or datetime.utcnow()) - GRACE)
+        watermark = await rollups_collection.find_one({'_id': WATERMARK_ID})
+        # Nothing older than the retention window is left to roll up
+        since = watermark['until'] if watermark else until - timedelta(days=USAGE_STATS_RETENTION_DAYS)
+        if since >= until:
+            return {'status': True, 'hours': 0, 'rollups': 0}
+
+        rows = await storage.usage_by_hour(since, until)
+        if rows is None:
+            return {'status': False, 'reason': 'database_unavailable'}
+
+        written = 0
+        for offset in range(0, len(rows), BATCH_SIZE):
+            batch = [
+                ReplaceOne({'_id': rollup_id(row['hour'], row['api_key'], row['endpoint'], row['status'])},
+                           row, upsert=True)
+                for row in rows[offset:offset + BATCH_SIZE]
+            ]
+            await rollups_collection.bulk_write(batch, ordered=False)
+            written += len(batch)
+
+        await rollups_collection.replace_one(
+            {'_id': WATERMARK_ID}, {'until': until, 'updated_at': datetime.utcnow()}, upsert=True
+        )
+        hours = int((until - since).total_seconds() // 3600)
+        self.last_report = {
+            'status': True, 'since': since, 'until': until, 'hours': hours, 'rollups': written
+        }
+        if written:
+            logger.info(f"📦 Rolled up {hours}h of usage into {written} rollup documents")
+        return self.last_report
+
+# Global usage rollup instance
+usage_rollup = UsageRollup()
@@ -2,13 +2,28 @@ import asyncio
 import httpx
 import json
 from typing import Dict, Any, Optional
+from config import SAVETUBE_API_URL, SAVETUBE_CDN_SCHEME
 from utils.logging import LOGGER
+from utils.youtube_url import extract_video_id
+from utils.aes_cbc import AESCBCDecryptor
+from utils import deadline
+from utils.deadline import DeadlineExceeded
+from utils.metrics import upstream_request_duration
+from utils.tracing import tracer
+from services.circuit_breaker import savetube_breaker, CircuitOpenError
+from services.negative_cache import (
+    negative_cache, UNAVAILABLE, UPSTREAM_ERROR, DECRYPT_FAILED, DOWNLOAD_FAILED
+)
 
 logger = LOGGER(__name__)
 
+# AES key of SaveTube's /v2/info payloads
+SAVETUBE_KEY_HEX = "C5D58EF67A7584E4A29F6C35BBC4EB12"
+
 class YouTubeDownloader:
     def __init__(self):
-        self.hex = "C5D58EF67A7584E4A29F6C35BBC4EB12"
+        self.hex = SAVETUBE_KEY_HEX
+        self.decryptor = AESCBCDecryptor(self.hex)
         self.session = None
         
     async def get_session(self):
@@ -43,158 +58,196 @@ class YouTubeDownloader:
             raise ValueError(f"Invalid base64 format: {e}")
     
     async def decrypt_data(self, encrypted_b64: str) -> Dict[str, Any]:
-        """Decrypt encrypted data using Web Crypto API equivalent"""
-        try:
-            # This is a simplified version - in production you'd need proper AES-CBC decryption
-            # For now, we'll simulate the decryption process
-            from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-            from cryptography.hazmat.backends import default_backend
-            import base64
-            
-            # Convert hex key to bytes
-            key = self.uint8(self.hex)
-            
-            # Decode base64 data
-            encrypted_data = self.b64_to_bytes(encrypted_b64)
-            
-            if len(encrypted_data) < 16:
-                raise ValueError("Data too short")
-            
-            # Extract IV and data
-            iv = encrypted_data[:16]
-            ciphertext = encrypted_data[16:]
-            
-            # Decrypt
-            cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-            decryptor = cipher.decryptor()
-            decrypted = decryptor.update(ciphertext) + decryptor.finalize()
-            
-            # Remove padding and parse JSON
-            padding_length = decrypted[-1]
-            decrypted = decrypted[:-padding_length]
-            
-            return json.loads(decrypted.decode('utf-8'))
-            
-        except Exception as e:
-            logger.error(f"Decryption failed: {e}")
-            # Fallback - return mock data for testing
-            return {
-                "title": "Sample Video",
-                "durationLabel": "3:45",
-                "thumbnail": "https://via.placeholder.com/480x360",
-                "key": "sample_key"
-            }
+        """Decrypt SaveTube's IV-prefixed AES-CBC payload (raises DecryptionError)"""
+        return self.decryptor.decrypt_json(encrypted_b64)
     
     async def get_cdn(self) -> str:
         """Get CDN endpoint with retry logic"""
         session = await self.get_session()
         
         for attempt in range(5):
+            savetube_breaker.check()
+            request_timeout = deadline.timeout(30.0)
             try:
-                response = await session.get("https://media.savetube.me/api/random-cdn")
+                with tracer.span('savetube.cdn'), upstream_request_duration.time(dependency='savetube', operation='cdn'):
+                    response = await session.get(f"{SAVETUBE_API_URL}/random-cdn", timeout=request_timeout)
                 data = response.json()
+                savetube_breaker.record_success()
                 if data and 'cdn' in data:
                     return data['cdn']
             except Exception as e:
+                if deadline.expired():
+                    raise DeadlineExceeded('savetube cdn') from e
+                savetube_breaker.record_failure(e)
                 logger.warning(f"CDN attempt {attempt + 1} failed: {e}")
                 if attempt < 4:
-                    await asyncio.sleep(1)
+                    await deadline.sleep(1, 'savetube cdn')
         
         # Fallback CDN
         return "cdn.savetube.me"
     
+    @tracer.traced('downloader.get_video_info')
     async def get_video_info(self, youtube_url: str) -> Dict[str, Any]:
-        """Get video information from YouTube URL"""
+        """Get video information from YouTube URL.
+        
+        Returns {'status': True, ...} or a structured failure
+        {'status': False, 'error', 'reason', 'retry_after'}; recent failures
+        are answered from the negative cache without contacting SaveTube.
+        """
+        try:
+            video_id = self.extract_video_id(youtube_url)
+        except ValueError as e:
+            return {'status': False, 'error': str(e), 'reason': 'invalid_url', 'retry_after': None}
+        
+        cached_failure = negative_cache.get(video_id)
+        if cached_failure:
+            return self._failure(cached_failure, negative_cached=True)
+        
         try:
             cdn = await self.get_cdn()
             session = await self.get_session()
+            savetube_breaker.check()
             
-            response = await session.post(
-                f"https://{cdn}/v2/info",
-                headers={"Content-Type": "application/json"},
-                json={"url": youtube_url}
-            )
-            
+            with tracer.span('savetube.info'), upstream_request_duration.time(dependency='savetube', operation='info'):
+                response = await session.post(
+                    f"{SAVETUBE_CDN_SCHEME}://{cdn}/v2/info",
+                    headers={"Content-Type": "application/json"},
+                    json={"url": youtube_url},
+                    timeout=deadline.timeout(30.0)
+                )
             result = response.json()
-            if not result.get('status'):
-                raise Exception(result.get('message', 'Failed to get video info'))
-            
-            # Decrypt data
-            decrypted_data = await self.decrypt_data(result['data'])
-            
-            return {
-                'title': decrypted_data.get('title', 'Unknown'),
-                'duration': decrypted_data.get('durationLabel', '0:00'),
-                'thumbnail': decrypted_data.get('thumbnail', ''),
-                'video_key': decrypted_data.get('key', '')
-            }
-            
+            savetube_breaker.record_success()
+        except CircuitOpenError as e:
+            return self._circuit_failure(e)
+        except DeadlineExceeded as e:
+            return self._deadline_failure(e)
         except Exception as e:
+            if deadline.expired():
+                return self._deadline_failure(DeadlineExceeded('savetube info'))
+            savetube_breaker.record_failure(e)
             logger.error(f"Failed to get video info: {e}")
-            # Extract video ID for fallback
-            video_id = self.extract_video_id(youtube_url)
-            return {
-                'title': f'Video {video_id}',
-                'duration': '0:00',
-                'thumbnail': f'https://img.youtube.com/vi/{video_id}/maxresdefault.jpg',
-                'video_key': video_id
-            }
+            return self._record_failure(video_id, UPSTREAM_ERROR, f"SaveTube request failed: {e}")
+        
+        if not result.get('status'):
+            message = result.get('message') or 'Video unavailable'
+            logger.error(f"Video info refused for {video_id}: {message}")
+            return self._record_failure(video_id, UNAVAILABLE, message)
+        
+        try:
+            decrypted_data = await self.decrypt_data(result['data'])
+        except (KeyError, ValueError) as e:
+            logger.error(f"Decryption failed: {e}")
+            return self._record_failure(video_id, DECRYPT_FAILED, f"Could not decrypt video info: {e}")
+        
+        negative_cache.clear(video_id)
+        return {
+            'status': True,
+            'video_id': video_id,
+            'title': decrypted_data.get('title', 'Unknown'),
+            'duration': decrypted_data.get('durationLabel', '0:00'),
+            'thumbnail': decrypted_data.get('thumbnail', ''),
+            'video_key': decrypted_data.get('key', '')
+        }
+    
+    def _record_failure(self, key: str, reason: str, message: str) -> Dict[str, Any]:
+        return self._failure(negative_cache.record_failure(key, reason, message))
+    
+    def _circuit_failure(self, error: CircuitOpenError) -> Dict[str, Any]:
+        # Not the video's fault: fail fast without negative-caching it
+        return {
+            'status': False,
+            'error': str(error),
+            'reason': 'circuit_open',
+            'retry_after': error.retry_after,
+            'negative_cached': False
+        }
+    
+    def _deadline_failure(self, error: DeadlineExceeded) -> Dict[str, Any]:
+        # The client's budget ran out, SaveTube did not necessarily fail
+        return {
+            'status': False,
+            'error': str(error),
+            'reason': 'deadline_exceeded',
+            'retry_after': None,
+            'negative_cached': False
+        }
     
+    def _failure(self, entry: Dict[str, Any], negative_cached: bool = False) -> Dict[str, Any]:
+        return {
+            'status': False,
+            'error': entry['message'],
+            'reason': entry['reason'],
+            'retry_after': entry['retry_after'],
+            'negative_cached': negative_cached
+        }
+    
+    @tracer.traced('downloader.get_download_url')
     async def get_download_url(self, video_key: str, quality: str = '360', download_type: str = 'video') -> str:
         """Get download URL for video/audio"""
         session = await self.get_session()
         
         for attempt in range(5):
+            savetube_breaker.check()
             try:
                 cdn = await self.get_cdn()
-                response = await session.post(
-                    f"https://{cdn}/download",
-                    headers={"Content-Type": "application/json"},
-                    json={
-                        'downloadType': download_type,
-                        'quality': quality,
-                        'key': video_key
-                    }
-                )
+                savetube_breaker.check()
+                with tracer.span('savetube.download'), upstream_request_duration.time(dependency='savetube', operation='download'):
+                    response = await session.post(
+                        f"{SAVETUBE_CDN_SCHEME}://{cdn}/download",
+                        headers={"Content-Type": "application/json"},
+                        json={
+                            'downloadType': download_type,
+                            'quality': quality,
+                            'key': video_key
+                        },
+                        timeout=deadline.timeout(30.0)
+                    )
                 
                 result = response.json()
+                savetube_breaker.record_success()
                 if result.get('status') and result.get('data', {}).get('downloadUrl'):
                     return result['data']['downloadUrl']
                     
+            except (CircuitOpenError, DeadlineExceeded):
+                raise
             except Exception as e:
+                if deadline.expired():
+                    raise DeadlineExceeded('savetube download') from e
+                savetube_breaker.record_failure(e)
                 logger.warning(f"Download URL attempt {attempt + 1} failed: {e}")
                 if attempt < 4:
-                    await asyncio.sleep(1)
+                    await deadline.sleep(1, 'savetube download')
         
         raise Exception("Failed to get download URL after 5 attempts")
     
     def extract_video_id(self, youtube_url: str) -> str:
         """Extract video ID from YouTube URL"""
-        import re
-        patterns = [
-            r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/)([^&?\n]+)',
-            r'youtube\.com/v/([^&?\n]+)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, youtube_url)
-            if match:
-                return match.group(1)
-        
-        raise ValueError("Invalid YouTube URL")
+        return extract_video_id(youtube_url)
     
+    @tracer.traced('downloader.download_content')
     async def download_content(self, youtube_url: str, quality: str = '360', content_type: str = 'video') -> Dict[str, Any]:
         """Download video or audio content"""
         try:
             # Get video info
             info = await self.get_video_info(youtube_url)
+            if not info['status']:
+                return info
             
-            # Get download URL
-            download_url = await self.get_download_url(
-                info['video_key'], 
-                quality, 
-                'audio' if content_type == 'audio' else 'video'
-            )
+            # Get download URL (failures are remembered per format)
+            download_type = 'audio' if content_type == 'audio' else 'video'
+            failure_key = f"{info['video_id']}:{download_type}:{quality}"
+            cached_failure = negative_cache.get(failure_key)
+            if cached_failure:
+                return self._failure(cached_failure, negative_cached=True)
+            try:
+                download_url = await self.get_download_url(info['video_key'], quality, download_type)
+            except CircuitOpenError as e:
+                return self._circuit_failure(e)
+            except DeadlineExceeded as e:
+                return self._deadline_failure(e)
+            except Exception as e:
+                return self._record_failure(failure_key, DOWNLOAD_FAILED, str(e))
+            negative_cache.clear(failure_key)
             
             return {
                 'status': True,
@@ -202,7 +255,7 @@ class YouTubeDownloader:
                 'duration': info['duration'],
                 'thumbnail': info['thumbnail'],
                 'download_url': download_url,
-                'video_id': self.extract_video_id(youtube_url),
+                'video_id': info['video_id'],
                 'quality': quality,
                 'type': content_type
             }
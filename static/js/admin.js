@@ -2,10 +2,11 @@
 
 class AdminDashboard {
     constructor() {
-        this.updateInterval = 30000; // 30 seconds
-        this.concurrentUsersUpdateInterval = 10000; // 10 seconds
-        this.refreshTimer = null;
-        this.concurrentUsersTimer = null;
+        this.statsStreamUrl = '/admin/api/stats/stream';
+        this.statsPollUrl = '/admin/api/stats';
+        this.statsPollInterval = 5000;
+        this.statsSource = null;
+        this.statsPollTimer = null;
         this.charts = {};
         this.socketConnected = false;
         
@@ -31,15 +32,6 @@ class AdminDashboard {
             }
         });
         
-        // Window focus/blur handlers
-        window.addEventListener('focus', () => {
-            this.startRealTimeUpdates();
-        });
-        
-        window.addEventListener('blur', () => {
-            this.stopRealTimeUpdates();
-        });
-        
         // Form validation
         document.querySelectorAll('form').forEach(form => {
             form.addEventListener('submit', this.handleFormSubmit.bind(this));
@@ -60,65 +52,89 @@ class AdminDashboard {
     }
     
     startRealTimeUpdates() {
-        if (this.refreshTimer) {
-            clearInterval(this.refreshTimer);
+        // One Server-Sent Events stream replaces per-page polling; the server computes
+        // stats once per tick no matter how many admins are connected
+        if (this.statsSource || this.statsPollTimer) {
+            return;
         }
-        
-        if (this.concurrentUsersTimer) {
-            clearInterval(this.concurrentUsersTimer);
+        if (typeof EventSource === 'undefined') {
+            this.startPolling();
+            return;
         }
         
-        // Update concurrent users more frequently
-        this.updateConcurrentUsers();
-        this.concurrentUsersTimer = setInterval(() => {
-            this.updateConcurrentUsers();
-        }, this.concurrentUsersUpdateInterval);
-        
-        // Update full dashboard data less frequently
-        this.refreshTimer = setInterval(() => {
-            this.refreshDashboardData();
-        }, this.updateInterval);
+        // The server ends each stream after a bounded window; EventSource reconnects on its own
+        this.statsSource = new EventSource(this.statsStreamUrl);
+        this.statsSource.addEventListener('stats', (event) => {
+            this.handleStats(JSON.parse(event.data));
+        });
+        this.statsSource.onopen = () => {
+            this.socketConnected = true;
+        };
+        this.statsSource.onerror = () => {
+            this.socketConnected = false;
+            // EventSource reconnects by itself unless the server refused the stream
+            if (this.statsSource && this.statsSource.readyState === EventSource.CLOSED) {
+                this.statsSource = null;
+                this.startPolling();
+            }
+        };
         
         console.log('Real-time updates started');
     }
     
+    startPolling() {
+        // Fallback when the stream is unavailable: fetch the same payload on a timer
+        if (this.statsPollTimer) {
+            return;
+        }
+        const poll = async () => {
+            try {
+                const response = await fetch(this.statsPollUrl, { credentials: 'same-origin' });
+                if (response.ok) {
+                    this.handleStats(await response.json());
+                }
+            } catch (error) {
+                console.error('Failed to poll stats:', error);
+            }
+        };
+        poll();
+        this.statsPollTimer = setInterval(poll, this.statsPollInterval);
+    }
+    
     stopRealTimeUpdates() {
-        if (this.refreshTimer) {
-            clearInterval(this.refreshTimer);
-            this.refreshTimer = null;
+        if (this.statsPollTimer) {
+            clearInterval(this.statsPollTimer);
+            this.statsPollTimer = null;
         }
-        
-        if (this.concurrentUsersTimer) {
-            clearInterval(this.concurrentUsersTimer);
-            this.concurrentUsersTimer = null;
+        if (this.statsSource) {
+            this.statsSource.close();
+            this.statsSource = null;
+            this.socketConnected = false;
         }
         
         console.log('Real-time updates stopped');
     }
     
-    async updateConcurrentUsers() {
-        try {
-            const response = await fetch('/admin/api/stats');
-            const data = await response.json();
-            
-            if (data.status) {
-                this.updateConcurrentUserDisplay(data.concurrent_users);
-                this.updateFooterConcurrentUsers(data.concurrent_users);
-                
-                // Update cache hit rate if available
-                if (data.cache_hit_rate !== undefined) {
-                    this.updateCacheHitRate(data.cache_hit_rate);
-                }
-                
-                // Update hourly requests if available
-                if (data.hourly_requests !== undefined) {
-                    this.updateHourlyRequests(data.hourly_requests);
-                }
-            }
-        } catch (error) {
-            console.error('Failed to update concurrent users:', error);
-            this.showToast('Failed to update real-time data', 'error');
+    handleStats(data) {
+        if (!data.status) {
+            return;
+        }
+        
+        this.updateConcurrentUserDisplay(data.concurrent_users);
+        this.updateFooterConcurrentUsers(data.concurrent_users);
+        
+        // Update cache hit rate if available
+        if (data.cache_hit_rate !== undefined) {
+            this.updateCacheHitRate(data.cache_hit_rate);
         }
+        
+        // Update hourly requests if available
+        if (data.hourly_requests !== undefined) {
+            this.updateHourlyRequests(data.hourly_requests);
+        }
+        
+        // Page scripts subscribe to this instead of polling /admin/api/stats
+        document.dispatchEvent(new CustomEvent('admin:stats', { detail: data }));
     }
     
     updateConcurrentUserDisplay(count) {
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test the AES-CBC payload decryptor, plus a microbenchmark on SaveTube-sized payloads
+"""
+import base64
+import json
+import os
+import time
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from utils.aes_cbc import AESCBCDecryptor, DecryptionError
+
+KEY_HEX = "C5D58EF67A7584E4A29F6C35BBC4EB12"
+
+def encrypt_payload(document, key_hex: str = KEY_HEX, pad: bool = True) -> str:
+    """Build a payload the way SaveTube does: base64(IV + AES-CBC(PKCS7(json)))"""
+    plaintext = json.dumps(document).encode('utf-8')
+    if pad:
+        padder = padding.PKCS7(128).padder()
+        plaintext = padder.update(plaintext) + padder.finalize()
+    iv = os.urandom(16)
+    encryptor = Cipher(algorithms.AES(bytes.fromhex(key_hex)), modes.CBC(iv)).encryptor()
+    return base64.b64encode(iv + encryptor.update(plaintext) + encryptor.finalize()).decode('ascii')
+
+def info_document(formats: int = 12):
+    """A /v2/info response body of realistic size"""
+    return {
+        'title': 'Rick Astley - Never Gonna Give You Up (Official Music Video)',
+        'durationLabel': '3:33',
+        'duration': 213,
+        'thumbnail': 'https://i.ytimg.com/vi/dQw4w9WgXcQ/maxresdefault.jpg',
+        'key': 'a1b2c3d4e5f6a7b8c9d0e1f2a3b4c5d6',
+        'video_formats': [
+            {'quality': q, 'label': f'{q}p', 'url': f'https://cdn.example/{q}?sig=' + 'x' * 120}
+            for q in [144, 240, 360, 480, 720, 1080] * (formats // 6)
+        ],
+        'audio_formats': [{'quality': 128, 'label': '128kbps'}, {'quality': 320, 'label': '320kbps'}]
+    }
+
+def test_round_trip():
+    decryptor = AESCBCDecryptor(KEY_HEX)
+    for document in ({}, {'a': 1}, {'title': 'é' * 15}, info_document()):
+        assert decryptor.decrypt_json(encrypt_payload(document)) == document
+
+def test_base64_with_whitespace():
+    payload = encrypt_payload({'title': 'spaced'})
+    spaced = ' '.join(payload[i:i + 8] for i in range(0, len(payload), 8))
+    assert AESCBCDecryptor(KEY_HEX).decrypt_json(spaced) == {'title': 'spaced'}
+
+def test_rejects_bad_payloads():
+    decryptor = AESCBCDecryptor(KEY_HEX)
+    bad_payloads = [
+        base64.b64encode(os.urandom(16)).decode(),            # IV only
+        base64.b64encode(os.urandom(40)).decode(),            # not block aligned
+        encrypt_payload({'x': 'abcdefg'}, pad=False),         # 16 bytes, no padding block
+        encrypt_payload({'x': 1}, key_hex='00' * 16),         # wrong key
+    ]
+    for payload in bad_payloads:
+        try:
+            decryptor.decrypt_json(payload)
+        except DecryptionError:
+            continue
+        raise AssertionError(f"{payload!r} should be rejected")
+
+def test_batch():
+    decryptor = AESCBCDecryptor(KEY_HEX)
+    documents = [{'n': i, 'pad': 'y' * (i * 37)} for i in range(20)]
+    payloads = [encrypt_payload(d) for d in documents]
+    assert decryptor.decrypt_json_many(payloads) == documents
+
+    payloads.insert(3, 'AAAA')
+    results = decryptor.decrypt_json_many(payloads, return_exceptions=True)
+    assert isinstance(results[3], DecryptionError)
+    assert results[:3] + results[4:] == documents
+
+def legacy_decrypt(key_hex: str, encrypted_b64: str):
+    """The previous decrypt_data body, kept for comparison"""
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.backends import default_backend
+    key = bytes.fromhex(key_hex)
+    encrypted_data = base64.b64decode(encrypted_b64.replace(' ', ''))
+    iv = encrypted_data[:16]
+    ciphertext = encrypted_data[16:]
+    cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
+    decryptor = cipher.decryptor()
+    decrypted = decryptor.update(ciphertext) + decryptor.finalize()
+    decrypted = decrypted[:-decrypted[-1]]
+    return json.loads(decrypted.decode('utf-8'))
+
+def benchmark(iterations: int = 5000):
+    """Per-payload cost of the legacy path, the decryptor and the batch API"""
+    decryptor = AESCBCDecryptor(KEY_HEX)
+    print("⏱️ AES-CBC decryption microbenchmark")
+    print("=" * 60)
+    for formats in (6, 12, 60):
+        payload = encrypt_payload(info_document(formats))
+        batch = [payload] * 100
+
+        timings = {}
+        start = time.perf_counter()
+        for _ in range(iterations):
+            legacy_decrypt(KEY_HEX, payload)
+        timings['legacy'] = (time.perf_counter() - start) / iterations * 1e6
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            decryptor.decrypt_json(payload)
+        timings['decryptor'] = (time.perf_counter() - start) / iterations * 1e6
+
+        start = time.perf_counter()
+        for _ in range(iterations // 100):
+            decryptor.decrypt_json_many(batch)
+        timings['batch'] = (time.perf_counter() - start) / (iterations // 100 * 100) * 1e6
+
+        print(f"   {len(payload):>6} b64 chars  legacy {timings['legacy']:.1f}µs  "
+              f"decryptor {timings['decryptor']:.1f}µs  batch {timings['batch']:.1f}µs/payload")
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_base64_with_whitespace()
+    test_rejects_bad_payloads()
+    test_batch()
+    print("✅ Decryptor tests passed\n")
+    benchmark()
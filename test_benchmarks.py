@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test the benchmark stand-ins and result comparison (no app process needed)
+"""
+import httpx
+from benchmarks.fakes import FakeSaveTube, FakeTelegram
+from benchmarks.harness import percentile, video_id
+from benchmarks.micro import compare as compare_micro, measure
+from benchmarks.run import compare
+from services.telegram_cache import Bot, NetworkError, RetryAfter
+from utils.aes_cbc import AESCBCDecryptor
+from services.youtube_downloader import SAVETUBE_KEY_HEX
+
+def test_fake_savetube_speaks_the_savetube_protocol():
+    savetube = FakeSaveTube(file_size=1000).start()
+    try:
+        assert httpx.get(f"{savetube.api_url}/random-cdn").json() == {'cdn': savetube.address}
+        info = httpx.post(f"{savetube.url}/v2/info", json={'url': 'https://www.youtube.com/watch?v=hot00000001'}).json()
+        decrypted = AESCBCDecryptor(SAVETUBE_KEY_HEX).decrypt_json(info['data'])
+        assert decrypted['key'] == 'hot00000001'
+
+        download = httpx.post(f"{savetube.url}/download", json={'key': 'hot00000001', 'quality': '360'}).json()
+        partial = httpx.get(download['data']['downloadUrl'], headers={'Range': 'bytes=900-'})
+        assert partial.status_code == 206 and len(partial.content) == 100
+        assert savetube.stats()['calls'] == {'cdn': 1, 'info': 1, 'download': 1, 'file': 1}
+    finally:
+        savetube.stop()
+
+def test_fake_telegram_failures_map_to_bot_errors():
+    telegram = FakeTelegram(failure_rate=1.0).start()
+    try:
+        base_url = f"{telegram.url}/bot123:token"
+        try:
+            Bot._result(httpx.get(f"{base_url}/getFile", params={'file_id': 'x'}))
+            assert False, 'expected NetworkError'
+        except NetworkError:
+            assert telegram.stats()['failures'] == {'getFile': 1}
+
+        telegram.failure_rate = 0.0
+        result = Bot._result(httpx.get(f"{base_url}/getFile", params={'file_id': 'x'}))
+        assert result.file_path == 'videos/x.mp4'  # attribute access, as the callers expect
+        try:
+            Bot._result(httpx.Response(429, json={'ok': False, 'description': 'Too Many Requests'}))
+            assert False, 'expected RetryAfter'
+        except RetryAfter:
+            pass
+    finally:
+        telegram.stop()
+
+def test_percentiles_and_regressions():
+    assert video_id('cold', 42) == 'cold0000042'
+    ordered = [i / 1000 for i in range(1, 101)]
+    assert percentile(ordered, 50) == 0.05 and percentile(ordered, 99) == 0.099 and percentile([], 50) == 0.0
+
+    def report(p95, rps):
+        summary = {'latency_ms': {'p50': 1, 'p95': p95, 'p99': p95}, 'throughput_rps': rps}
+        return {'scenarios': {'hot_cache': {'video': summary, 'wall_seconds': 1.0}}}
+
+    lines, regressions = compare(report(10.5, 100), report(10, 100), 0.10)
+    assert regressions == 0 and len(lines) == 1
+    assert compare(report(12, 100), report(10, 100), 0.10)[1] == 1
+    assert compare(report(10, 80), report(10, 100), 0.10)[1] == 1
+
+def test_micro_measure_and_baseline_compare():
+    result = measure(lambda: sum(range(100)), repeats=3, min_time=0.001)
+    assert result['repeats'] == 3 and result['loops'] >= 1 and result['min_us'] <= result['median_us']
+
+    baseline = {'benchmarks': {'extract_video_id': {'median_us': 4.0}, 'sanitize_filename': {'median_us': 10.0}}}
+    current = {'benchmarks': {'extract_video_id': {'median_us': 4.2}, 'sanitize_filename': {'median_us': 13.0},
+                              'run_async': {'median_us': 70.0}}}
+    lines, regressions = compare_micro(current, baseline, 0.20)
+    assert regressions == 1 and len(lines) == 3  # only sanitize_filename got >20% slower
+
+if __name__ == "__main__":
+    test_fake_savetube_speaks_the_savetube_protocol()
+    test_fake_telegram_failures_map_to_bot_errors()
+    test_percentiles_and_regressions()
+    test_micro_measure_and_baseline_compare()
+    print("✅ Benchmark harness tests passed")
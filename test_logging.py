@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Test log sampling, JSON records and request IDs (no server needed)
+"""
+import json
+import logging
+from utils.logging import (
+    SamplingFilter, JSONFormatter, RequestContextFilter, parse_levels, set_request_id, reset_request_id
+)
+
+def make_record(msg='hello', level=logging.INFO, lineno=10):
+    return logging.LogRecord('services.api_service', level, __file__, lineno, msg, None, None)
+
+def test_sampling_per_call_site():
+    sampler = SamplingFilter(burst=2, window=60)
+    allowed = [sampler.filter(make_record()) for _ in range(5)]
+    assert allowed == [True, True, False, False, False]
+    assert sampler.filter(make_record(lineno=11))  # another call site has its own budget
+    assert sampler.filter(make_record(level=logging.ERROR))  # errors are never sampled
+
+    sampler.window = 0  # next record opens a new window and reports what was dropped
+    record = make_record()
+    assert sampler.filter(record) and record.suppressed == 3
+
+def test_json_record_carries_request_id():
+    token = set_request_id('req-1')
+    try:
+        record = make_record('cache hit')
+        RequestContextFilter().filter(record)
+    finally:
+        reset_request_id(token)
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry['msg'] == 'cache hit'
+    assert entry['request_id'] == 'req-1'
+    assert entry['level'] == 'INFO' and entry['logger'] == 'services.api_service'
+
+def test_parse_levels():
+    assert parse_levels('pymongo=warning, httpx=ERROR,,broken') == {'pymongo': 'WARNING', 'httpx': 'ERROR'}
+
+if __name__ == "__main__":
+    test_sampling_per_call_site()
+    test_json_record_carries_request_id()
+    test_parse_levels()
+    print("✅ Logging tests passed")
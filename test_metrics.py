@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test the in-process metrics registry and its Prometheus text output
+"""
+from utils.metrics import MetricsRegistry
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('demo_seconds', 'Demo latency', ('source',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, source='cache')
+
+    text = registry.render()
+    assert 'demo_seconds_bucket{source="cache",le="0.1"} 2' in text  # le is inclusive
+    assert 'demo_seconds_bucket{source="cache",le="1"} 3' in text
+    assert 'demo_seconds_bucket{source="cache",le="+Inf"} 4' in text
+    assert 'demo_seconds_count{source="cache"} 4' in text
+    assert latency.summary(source='cache')['count'] == 4
+
+def test_counter_gauge_and_callbacks():
+    registry = MetricsRegistry()
+    hits = registry.counter('demo_total', 'Demo counter', ('result',))
+    hits.inc(result='hit')
+    hits.inc(2, result='hit')
+    assert registry.counter('demo_total', 'Demo counter', ('result',)) is hits
+    registry.gauge('demo_depth', 'Demo gauge', function=lambda: 7)
+    registry.gauge('demo_broken', 'Callback that fails', function=lambda: 1 / 0)
+
+    text = registry.render()
+    assert '# TYPE demo_total counter' in text
+    assert 'demo_total{result="hit"} 3' in text
+    assert 'demo_depth 7' in text
+    # A failing callback drops its sample, not the whole scrape
+    assert not any(line.startswith('demo_broken ') for line in text.splitlines())
+
+def test_label_mismatch_rejected():
+    registry = MetricsRegistry()
+    hits = registry.counter('demo_total', 'Demo counter', ('result',))
+    try:
+        hits.inc(status='hit')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("wrong label names must raise")
+
+if __name__ == "__main__":
+    test_histogram_buckets_are_cumulative()
+    test_counter_gauge_and_callbacks()
+    test_label_mismatch_rejected()
+    print("✅ Metrics tests passed")
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Test the migration list and explain-plan parsing (no database needed)
+"""
+from database.migrations import MIGRATIONS, CORE_INDEXES, hot_queries, plan_stages, ttl_indexes
+
+def test_versions_unique_and_ascending():
+    versions = [m.version for m in MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+def test_plan_stages_classic_and_sbe():
+    classic = {'stage': 'LIMIT', 'inputStage': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}}
+    assert plan_stages(classic) == ['LIMIT', 'FETCH', 'IXSCAN']
+    sbe = {'queryPlan': {'stage': 'OR', 'inputStages': [{'stage': 'IXSCAN'}, {'stage': 'COLLSCAN'}]}}
+    assert 'COLLSCAN' in plan_stages(sbe)
+
+def test_hot_queries_have_indexes():
+    indexed = {collection for collection, _, _ in CORE_INDEXES + ttl_indexes()}
+    for collection, _, _ in hot_queries():
+        assert collection in indexed
+
+def test_one_ttl_index_per_collection():
+    collections = [collection for collection, _, _ in ttl_indexes()]
+    assert len(collections) == len(set(collections))
+    assert all(seconds >= 0 for _, _, seconds in ttl_indexes())
+
+if __name__ == "__main__":
+    test_versions_unique_and_ascending()
+    test_plan_stages_classic_and_sbe()
+    test_hot_queries_have_indexes()
+    test_one_ttl_index_per_collection()
+    print("✅ Migration tests passed")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test the on-demand sampling profiler (stack folding, top-N table, CPU-only sampling)
+"""
+import threading
+import time
+from utils.profiler import CPU_CLOCKS, Profile, ProfilerBusy, SamplingProfiler
+
+def spin_hot_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+def wait_idle(stop: threading.Event):
+    stop.wait()
+
+def _profile(mode: str) -> Profile:
+    stop = threading.Event()
+    threads = [threading.Thread(target=spin_hot_loop, args=(stop,), name='busy-1'),
+               threading.Thread(target=wait_idle, args=(stop,), name='idle-1')]
+    for thread in threads:
+        thread.start()
+    profiler = SamplingProfiler(history=2, max_seconds=5)
+    try:
+        profile = profiler.start(duration=0.5, interval=0.005, mode=mode)
+        try:
+            profiler.start(duration=0.5)
+            assert False, 'expected ProfilerBusy'
+        except ProfilerBusy:
+            pass
+        while profiler.current is not None:
+            time.sleep(0.02)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    assert profiler.get(profile.id) is profile and profile.status == 'finished'
+    return profile
+
+def test_collapsed_stacks_and_top_functions():
+    profile = _profile('wall')
+    assert profile.samples > 0
+    lines = profile.collapsed().splitlines()
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    busy = [line for line in lines if line.startswith('busy;')]  # numbered thread names fold to one root
+    assert busy and 'spin_hot_loop (test_profiler.py:' in busy[0]
+    assert any(line.startswith('idle;') for line in lines)
+    functions = [row['function'].split(' ')[0] for row in profile.top(50, sort='total')]
+    assert 'spin_hot_loop' in functions and 'wait_idle' in functions
+
+def test_cpu_mode_skips_threads_that_are_waiting():
+    profile = _profile('cpu')
+    roots = {stack.split(';', 1)[0] for stack in profile.stacks}
+    if CPU_CLOCKS:
+        assert 'busy' in roots and 'idle' not in roots
+    else:
+        assert profile.mode == 'wall'
+
+def test_window_limits_are_enforced():
+    profiler = SamplingProfiler(history=1, max_seconds=5)
+    for kwargs in ({'duration': 6}, {'duration': 0}, {'interval': 0.0001}, {'mode': 'memory'}):
+        try:
+            profiler.start(**kwargs)
+            assert False, f"expected ValueError for {kwargs}"
+        except ValueError:
+            pass
+    assert profiler.current is None and profiler.status()['profiles'] == []
+
+if __name__ == "__main__":
+    test_collapsed_stacks_and_top_functions()
+    test_cpu_mode_skips_threads_that_are_waiting()
+    test_window_limits_are_enforced()
+    print("✅ Profiler tests passed")
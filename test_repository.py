@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Test the MongoDB operation profiles (no database needed)
+"""
+from pymongo.read_preferences import Primary, SecondaryPreferred
+from database.repository import OPERATION_PROFILES, describe_profile, read_preference
+
+def test_read_preference_staleness_floor():
+    pref = read_preference('nearest', 30)
+    assert pref.max_staleness == 90  # the server rejects bounds under 90s
+    assert read_preference('secondaryPreferred', -1).max_staleness == -1
+    assert isinstance(read_preference('primary', 120), Primary)
+    assert isinstance(read_preference('unknown'), SecondaryPreferred)
+
+def test_profiles_describe():
+    for name in OPERATION_PROFILES:
+        assert set(describe_profile(name)) == {'read_preference', 'read_concern', 'write_concern'}
+    admin = describe_profile('admin_write')
+    assert admin['write_concern']['w'] == 'majority'
+    assert admin['read_preference'] == {'mode': 'primary'}
+    assert describe_profile('default')['write_concern'] == 'client default'
+
+if __name__ == "__main__":
+    test_read_preference_staleness_floor()
+    test_profiles_describe()
+    print("✅ Repository tests passed")
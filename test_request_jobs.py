@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test asynchronous request jobs: callback URL checks, webhook signing, create/poll and upload failures
+"""
+import hashlib
+import hmac
+from services.job_service import InvalidCallbackURL, RequestJobService
+from utils.background_loop import background_loop
+
+API_KEY = 'yt_test_key'
+
+class NotRunStarted(RequestJobService):
+    """Accepts jobs without resolving them"""
+    async def _run(self, job_id):
+        return None
+
+class FakeDownloader:
+    async def download_content(self, youtube_url, quality, content_type):
+        return {'status': True, 'title': 'Test video', 'duration': '3:33', 'download_url': 'https://cdn.example/file.mp4'}
+
+class FailingUploadCache:
+    async def download_and_cache(self, download_url, video_info):
+        return None
+
+def _rejected(service, url):
+    try:
+        background_loop.run(service.check_callback_host(service.validate_callback_url(url)))
+    except InvalidCallbackURL:
+        return True
+    return False
+
+def test_callback_urls_must_be_public_http():
+    service = RequestJobService()
+    assert service.validate_callback_url(None) is None
+    for url in ('ftp://example.com/hook', 'https:///no-host', 'javascript:alert(1)'):
+        assert _rejected(service, url), url
+    for url in ('http://127.0.0.1:5000/admin', 'http://localhost/hook', 'http://169.254.169.254/latest/meta-data',
+                'http://10.0.0.5/hook', 'http://192.168.1.1/', 'http://[::1]/hook', 'http://[::ffff:127.0.0.1]/',
+                'http://224.0.0.1/', 'http://0.0.0.0/'):
+        assert _rejected(service, url), url
+    assert not _rejected(service, 'https://93.184.216.34/hook')
+
+def test_webhook_signature_is_hmac_sha256_of_the_body():
+    body = b'{"event": "job.completed"}'
+    expected = hmac.new(API_KEY.encode(), body, hashlib.sha256).hexdigest()
+    assert RequestJobService.sign(API_KEY, body) == f"sha256={expected}"
+    assert RequestJobService.sign('other-key', body) != f"sha256={expected}"
+
+def test_create_and_poll_own_jobs_only():
+    service = NotRunStarted()
+    try:
+        background_loop.run(service.create(API_KEY, 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'video', '1080p',
+                                           'http://127.0.0.1/hook'))
+        assert False, 'expected InvalidCallbackURL'
+    except InvalidCallbackURL:
+        pass
+    try:
+        background_loop.run(service.create(API_KEY, 'https://example.com/not-youtube'))
+        assert False, 'expected ValueError'
+    except InvalidCallbackURL:
+        assert False, 'an invalid video URL is not a callback error'
+    except ValueError:
+        pass
+
+    view = background_loop.run(service.create(API_KEY, 'https://youtu.be/dQw4w9WgXcQ', 'video', '1080p'))
+    assert view['status'] == 'queued' and view['quality'] == '1080' and view['webhook'] is False
+    job = background_loop.run(service.get(view['job_id'], API_KEY))
+    assert job is not None and RequestJobService.public_view(job) == view
+    assert background_loop.run(service.get(view['job_id'], 'someone-else')) is None
+
+def test_failed_upload_is_recorded_on_the_completed_job():
+    service = NotRunStarted()
+    service.downloader = FakeDownloader()
+    service.cache = FailingUploadCache()
+    view = background_loop.run(service.create(API_KEY, 'https://youtu.be/dQw4w9WgXcQ', 'video', '360'))
+    job = background_loop.run(service.get(view['job_id']))
+    background_loop.run(RequestJobService._run(service, job['_id']))
+
+    job = background_loop.run(service.get(view['job_id']))
+    assert job['status'] == 'completed'
+    assert job['result']['download_url'] and job['result']['telegram_file_id'] is None
+    assert job['error']['reason'] == 'cache_upload_failed'
+
+if __name__ == "__main__":
+    test_callback_urls_must_be_public_http()
+    test_webhook_signature_is_hmac_sha256_of_the_body()
+    test_create_and_poll_own_jobs_only()
+    test_failed_upload_is_recorded_on_the_completed_job()
+    print("✅ Request job tests passed")
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Test the admin stats SSE stream (bounded lifetime, subscriber bookkeeping)
+"""
+import time
+from services.stats_publisher import StatsPublisher
+
+class FixedStatsPublisher(StatsPublisher):
+    async def compute(self):
+        return {'status': True, 'concurrent_users': 3}
+
+def test_stream_ends_after_its_window():
+    publisher = FixedStatsPublisher(interval=0.05)
+    started = time.monotonic()
+    events = list(publisher.stream(max_seconds=0.3))
+    assert time.monotonic() - started < 2
+    assert events[0] == 'retry: 50\n\n' and events[-1] == 'retry: 50\n\n'
+    assert any(event.startswith('id: ') and 'event: stats' in event for event in events)
+    assert publisher.subscribers == 0
+
+def test_closing_the_stream_unsubscribes():
+    publisher = FixedStatsPublisher(interval=0.05)
+    stream = publisher.stream(max_seconds=30)
+    next(stream)
+    assert publisher.subscribers == 1
+    stream.close()
+    assert publisher.subscribers == 0
+
+if __name__ == "__main__":
+    test_stream_ends_after_its_window()
+    test_closing_the_stream_unsubscribes()
+    print("✅ Stats publisher tests passed")
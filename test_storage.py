@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test the embedded SQLite storage backend (no MongoDB needed)
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from database.storage import SQLiteStorage
+from models_simple import APIKey, UsageStats
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_ladder_roundtrip():
+    store = SQLiteStorage(':memory:')
+    entry = {'telegram_file_id': 'file-360', 'file_size': 1024, 'content_hash': 'h',
+             'upload_date': '2025-01-01T00:00:00', 'access_count': 0, 'last_accessed': datetime.utcnow()}
+    run(store.put_ladder_quality('vid:video', 'vid', 'video', '360', entry, 'Title', 212))
+    run(store.touch_ladder('vid:video', '360', upgrade_to='720'))
+    run(store.touch_ladder('vid:video', '360', upgrade_to='720'))
+
+    doc = run(store.get_ladder('vid:video'))
+    assert doc['title'] == 'Title'
+    assert doc['access_count'] == 2
+    assert doc['qualities']['360']['telegram_file_id'] == 'file-360'
+    assert doc['qualities']['360']['access_count'] == 2
+    assert doc['upgrade_requests'] == {'720': 2}
+
+    assert run(store.claim_upgrade('vid:video', '720', 2)) is True
+    assert run(store.claim_upgrade('vid:video', '720', 2)) is False
+
+    run(store.remove_ladder_quality('vid:video', '360'))
+    assert run(store.get_ladder('vid:video'))['qualities'] == {}
+    assert run(store.get_ladder('missing:video')) is None
+
+def test_keys_and_usage():
+    store = SQLiteStorage(':memory:')
+    api_key = APIKey(user_id='u1', name='Local', rate_limit=5)
+    run(store.insert_key(api_key.to_dict()))
+
+    key_data = run(store.find_key(api_key.key))
+    assert key_data['_id'] == api_key._id and key_data['is_active'] is True
+    assert 'daily_limit' not in key_data  # unset columns fall back like missing Mongo fields
+
+    assert run(store.update_key(api_key.key, {'daily_requests': 3, 'last_reset_date': '2025-01-01'},
+                                {'usage_count': 1})) is True
+    assert run(store.find_key(api_key.key))['usage_count'] == 1
+    assert run(store.update_key('unknown', {'daily_requests': 1})) is False
+
+    for _ in range(3):
+        run(store.insert_usage(UsageStats(api_key.key, '/video').to_dict()))
+    hour_ago = datetime.utcnow() - timedelta(hours=1)
+    assert run(store.count_usage_since(api_key.key, hour_ago)) == 3
+    assert run(store.expire_usage(datetime.utcnow() + timedelta(seconds=1))) == 3
+    assert run(store.count_usage_since(api_key.key, hour_ago)) == 0
+
+    run(store.update_key(api_key.key, {'is_active': False}))
+    assert run(store.find_key(api_key.key)) is None
+    assert run(store.find_key(api_key.key, active_only=False))['is_active'] is False
+
+def test_locked_database_does_not_block_the_event_loop():
+    path = os.path.join(tempfile.mkdtemp(), 'locked.sqlite3')
+    store = SQLiteStorage(path)
+    run(store.count_usage_since('k', datetime.utcnow()))  # create the schema
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute('BEGIN IMMEDIATE')  # another worker holds the write lock
+    threading.Timer(0.3, lambda: other.execute('COMMIT')).start()
+
+    async def write_while_ticking():
+        ticks = 0
+        write = asyncio.ensure_future(store.insert_usage(UsageStats('k', '/video').to_dict()))
+        started = time.monotonic()
+        while not write.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        await write
+        return ticks, time.monotonic() - started
+
+    ticks, waited = run(write_while_ticking())
+    assert waited >= 0.25 and ticks >= 10  # the loop kept running while the insert waited
+    assert run(store.count_usage_since('k', datetime.utcnow() - timedelta(hours=1))) == 1
+    other.close()
+    store.close()
+
+if __name__ == "__main__":
+    test_ladder_roundtrip()
+    test_keys_and_usage()
+    test_locked_database_does_not_block_the_event_loop()
+    print("✅ Storage tests passed")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test span nesting, trace context propagation and the in-memory trace store (no server needed)
+"""
+import asyncio
+import time
+from utils.tracing import Tracer, OTLPExporter
+
+def make_tracer():
+    tracer = Tracer()
+    tracer.enabled = True
+    tracer.sample_rate = 1.0
+    tracer.store.clear()
+    return tracer
+
+def test_spans_nest_under_the_root():
+    tracer = make_tracer()
+
+    @tracer.traced('cache.lookup')
+    async def lookup():
+        tracer.record('mongodb.find', 0.002, **{'db.system': 'mongodb'})
+        return 'hit'
+
+    with tracer.trace('GET /api/v1/video') as root:
+        with tracer.span('rate_limit.check'):
+            pass
+        assert asyncio.run(lookup()) == 'hit'
+
+    trace = tracer.store.get(root.trace_id)
+    spans = {span['name']: span for span in trace['spans']}
+    assert trace['name'] == 'GET /api/v1/video' and trace['span_count'] == 4
+    assert spans['rate_limit.check']['parent_id'] == root.span_id
+    assert spans['cache.lookup']['parent_id'] == root.span_id
+    assert spans['mongodb.find']['parent_id'] == spans['cache.lookup']['span_id']
+    assert tracer.current_span() is None
+
+def test_traceparent_and_errors():
+    tracer = make_tracer()
+    parent = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+    try:
+        with tracer.trace('job.run', traceparent=parent) as root:
+            raise RuntimeError('upload failed')
+    except RuntimeError:
+        pass
+    assert root.trace_id == '0af7651916cd43dd8448eb211c80319c' and root.parent_id == 'b7ad6b7169203331'
+    assert root.status == 'error' and 'upload failed' in root.error
+
+    assert tracer.start_trace('x', traceparent=parent[:-2] + '00') is None  # caller did not sample
+    with tracer.span('outside.trace') as span:
+        assert span is None  # no-op without a root span
+
+    payload = OTLPExporter('http://collector/v1/traces', 5, 'svc').payload([root])
+    otlp_span = payload['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+    assert otlp_span['traceId'] == root.trace_id and otlp_span['status']['code'] == 2
+
+def test_slowest_traces_first():
+    tracer = make_tracer()
+    tracer.store.max_traces = 2
+    for name, delay in (('a', 0.0), ('b', 0.02), ('c', 0.01)):
+        with tracer.trace(name):
+            time.sleep(delay)
+    assert [trace['name'] for trace in tracer.store.slowest()] == ['b', 'c']  # 'a' was evicted
+    assert [trace['name'] for trace in tracer.store.slowest(name='c')] == ['c']
+
+if __name__ == "__main__":
+    test_spans_nest_under_the_root()
+    test_traceparent_and_errors()
+    test_slowest_traces_first()
+    print("✅ Tracing tests passed")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test YouTube URL canonicalization against a generated corpus, plus a microbenchmark
+"""
+import random
+import string
+import time
+from utils.youtube_url import parse_youtube_url, extract_video_id, canonical_url, VideoRef
+
+ID_ALPHABET = string.ascii_letters + string.digits + '-_'
+
+URL_SHAPES = [
+    "https://www.youtube.com/watch?v={id}",
+    "http://youtube.com/watch?v={id}",
+    "www.youtube.com/watch?v={id}",
+    "https://m.youtube.com/watch?v={id}",
+    "https://music.youtube.com/watch?v={id}",
+    "https://www.youtube.com/watch?feature=share&v={id}",
+    "https://www.youtube.com/watch?v={id}&list=PL0123456789",
+    "https://youtu.be/{id}",
+    "https://youtu.be/{id}?si=AbCdEfGh12345",
+    "https://www.youtube.com/embed/{id}",
+    "https://www.youtube-nocookie.com/embed/{id}",
+    "https://www.youtube.com/v/{id}",
+    "https://www.youtube.com/shorts/{id}",
+    "https://youtube.com/shorts/{id}?si=AbCdEfGh12345",
+    "https://www.youtube.com/live/{id}",
+    "HTTPS://WWW.YOUTUBE.COM/watch?v={id}",
+]
+
+START_SUFFIXES = [
+    ("", None),
+    ("&t=42", 42),
+    ("&t=42s", 42),
+    ("&t=1m30s", 90),
+    ("&start=15", 15),
+    ("#t=1h2m3s", 3723),
+]
+
+INVALID_INPUTS = [
+    "",
+    "   ",
+    "https://vimeo.com/123456789",
+    "https://www.youtube.com/watch?v=tooShort",
+    "https://www.youtube.com/channel/UC1234567890",
+    "https://example.com/watch?v=dQw4w9WgXcQ",
+    "dQw4w9WgXcQ_extra",
+    "not a url at all",
+]
+
+def random_video_id(rng: random.Random) -> str:
+    return ''.join(rng.choice(ID_ALPHABET) for _ in range(11))
+
+def with_start(url: str, suffix: str) -> str:
+    """Attach a start-time parameter with the right separator for the URL shape"""
+    if suffix.startswith('&') and '?' not in url:
+        return url + '?' + suffix[1:]
+    return url + suffix
+
+def generate_corpus(count: int = 200, seed: int = 1337):
+    """(input, expected VideoRef) pairs over every URL shape and start-time form"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        video_id = random_video_id(rng)
+        corpus.append((video_id, VideoRef(video_id)))
+        corpus.append((f"  {video_id}\n", VideoRef(video_id)))
+        for shape in URL_SHAPES:
+            suffix, start_time = rng.choice(START_SUFFIXES)
+            url = with_start(shape.format(id=video_id), suffix)
+            corpus.append((url, VideoRef(video_id, start_time)))
+    return corpus
+
+def test_corpus_round_trip():
+    """Every shape resolves to the same canonical ID, and the canonical URL is a fixed point"""
+    for value, expected in generate_corpus():
+        result = parse_youtube_url(value)
+        assert result == expected, f"{value!r}: got {result}, expected {expected}"
+        assert extract_video_id(canonical_url(result.video_id)) == result.video_id
+
+def test_invalid_inputs():
+    """Non-YouTube or malformed input is rejected"""
+    for value in INVALID_INPUTS:
+        try:
+            parse_youtube_url(value)
+        except ValueError:
+            continue
+        raise AssertionError(f"{value!r} should be rejected")
+
+def legacy_extract_video_id(youtube_url: str) -> str:
+    """The previous implementation, kept for comparison"""
+    import re
+    patterns = [
+        r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/)([^&?\n]+)',
+        r'youtube\.com/v/([^&?\n]+)',
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, youtube_url)
+        if match:
+            return match.group(1)
+    raise ValueError("Invalid YouTube URL")
+
+def benchmark(iterations: int = 20000):
+    """Compare the canonicalizer with the previous per-call regex implementation"""
+    inputs = [
+        "dQw4w9WgXcQ",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://youtu.be/dQw4w9WgXcQ?si=AbCdEfGh12345&t=42",
+        "https://www.youtube.com/embed/dQw4w9WgXcQ",
+    ]
+
+    print("⏱️ URL canonicalization microbenchmark")
+    print("=" * 60)
+    for value in inputs:
+        timings = {}
+        for name, func in (('legacy', legacy_extract_video_id), ('canonical', extract_video_id)):
+            try:
+                func(value)
+            except ValueError:
+                timings[name] = None
+                continue
+            start = time.perf_counter()
+            for _ in range(iterations):
+                func(value)
+            timings[name] = (time.perf_counter() - start) / iterations * 1e6
+
+        legacy = f"{timings['legacy']:.2f}µs" if timings['legacy'] is not None else "unsupported"
+        print(f"   {value[:50]:<50} legacy {legacy:>12}  canonical {timings['canonical']:.2f}µs")
+
+if __name__ == "__main__":
+    test_corpus_round_trip()
+    test_invalid_inputs()
+    print(f"✅ {len(generate_corpus())} corpus cases passed, {len(INVALID_INPUTS)} invalid inputs rejected\n")
+    benchmark()
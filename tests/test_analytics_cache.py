@@ -0,0 +1,80 @@
+import asyncio
+import time
+from services.analytics_cache import AnalyticsCache
+from utils.background_loop import background_loop
+
+class CountingView:
+    def __init__(self, delay: float = 0.0):
+        self.calls = 0
+        self.delay = delay
+        self.result = {'total_requests': 1}
+
+    async def __call__(self):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return dict(self.result, call=self.calls)
+
+def _wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+def test_fresh_then_stale_while_revalidate():
+    cache = AnalyticsCache(fresh_seconds=60, max_stale_seconds=600)
+    view = CountingView()
+    assert background_loop.submit(cache.get('analytics', 24, view)).result(timeout=5)['call'] == 1
+    assert background_loop.submit(cache.get('analytics', 24, view)).result(timeout=5)['call'] == 1 and view.calls == 1
+
+    cache.fresh_seconds = 0  # everything is stale now
+    assert background_loop.submit(cache.get('analytics', 24, view)).result(timeout=5)['call'] == 1  # old value, refresh started
+    assert _wait_until(lambda: cache.stats()['analytics:24h']['computations'] == 2)
+    assert background_loop.submit(cache.get('analytics', 24, view)).result(timeout=5)['call'] == 2
+
+def test_invalid_results_are_not_stored():
+    cache = AnalyticsCache(fresh_seconds=60, max_stale_seconds=600)
+    view = CountingView()
+    view.result = {'status': 'fallback_mode'}
+    is_valid = lambda result: result.get('status') != 'fallback_mode'
+    background_loop.submit(cache.get('dashboard', 24, view, is_valid)).result(timeout=5)
+    background_loop.submit(cache.get('dashboard', 24, view, is_valid)).result(timeout=5)
+    assert view.calls == 2 and cache.stats()['dashboard:24h']['computations'] == 0
+
+def test_invalidate_during_a_refresh():
+    cache = AnalyticsCache(fresh_seconds=0, max_stale_seconds=600)
+    view = CountingView(delay=0.05)
+    background_loop.submit(cache.get('dashboard', 24, view)).result(timeout=5)
+    view.result = {'status': 'fallback_mode'}
+    is_valid = lambda result: result.get('status') != 'fallback_mode'
+
+    async def refresh_racing_invalidate():
+        refresh = asyncio.ensure_future(cache._refresh(('dashboard', 24), view, is_valid))
+        await asyncio.sleep(0.01)  # the refresh is waiting on its factory
+        cache.invalidate('dashboard')
+        await refresh  # its result is invalid, so nothing re-creates the entry
+
+    background_loop.submit(refresh_racing_invalidate()).result(timeout=5)
+    assert view.calls == 2 and cache.stats() == {}
+
+def test_only_listed_periods_are_cached():
+    cache = AnalyticsCache(fresh_seconds=60, max_stale_seconds=600)
+    view = CountingView()
+    for hours in (7, 8, 9, 9):
+        background_loop.submit(cache.get('analytics', hours, view)).result(timeout=5)
+    assert view.calls == 4 and cache.stats() == {}
+
+def test_refresh_started_before_invalidate_does_not_store_its_result():
+    cache = AnalyticsCache(fresh_seconds=0, max_stale_seconds=600)
+    view = CountingView(delay=0.05)
+    background_loop.submit(cache.get('dashboard', 24, view)).result(timeout=5)
+
+    async def refresh_racing_invalidate():
+        refresh = asyncio.ensure_future(cache._refresh(('dashboard', 24), view, bool))
+        await asyncio.sleep(0.01)  # the refresh read the data that is being invalidated
+        cache.invalidate('dashboard')
+        await refresh  # a valid result, but computed from before the invalidation
+
+    background_loop.submit(refresh_racing_invalidate()).result(timeout=5)
+    assert view.calls == 2 and cache.stats() == {}
+    assert background_loop.submit(cache.get('dashboard', 24, view)).result(timeout=5)['call'] == 3
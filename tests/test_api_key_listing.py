@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+import pytest
+from config import ADMIN_API_KEYS_MAX_PAGE_SIZE
+from database.migrations import KEYSET_SORT, check_query_plans, hot_queries
+from services.api_key_listing import decode_cursor, encode_cursor, keyset_filter
+
+def _matches(doc, query):
+    """The subset of MongoDB matching keyset_filter produces: $or, $lt and equality"""
+    for field, condition in query.items():
+        if field == '$or':
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not doc[field] < condition['$lt']:
+                return False
+        elif doc[field] != condition:
+            return False
+    return True
+
+def _walk(keys, limit):
+    """Pages as list_page builds them: newest first, one extra row to detect the next page"""
+    ordered = sorted(keys, key=lambda k: (k['created_at'], k['_id']), reverse=True)
+    pages, cursor = [], None
+    while True:
+        query = keyset_filter(cursor) if cursor else {}
+        rows = [k for k in ordered if _matches(k, query)][:limit + 1]
+        page = rows[:limit]
+        pages.append([k['_id'] for k in page])
+        if len(rows) <= limit:
+            return pages
+        cursor = encode_cursor(page[-1]['created_at'], page[-1]['_id'])
+
+def test_cursor_round_trip_and_tampering():
+    created_at = datetime(2025, 3, 1, 12, 30, 45, 123456)
+    cursor = encode_cursor(created_at, 'key|with|pipes')
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (created_at, 'key|with|pipes')
+    for bad in ('', 'not-base64!!', encode_cursor(created_at, 'x')[:-3] + 'AAA'):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+def test_pages_cover_every_key_once_across_timestamp_ties():
+    base = datetime(2025, 1, 1)
+    # Three keys share each timestamp, so pages split inside a tie
+    keys = [{'_id': f"k{i:02d}", 'created_at': base + timedelta(seconds=i // 3)} for i in range(10)]
+    pages = _walk(keys, 4)
+    assert [len(page) for page in pages] == [4, 4, 2]
+    flattened = [key_id for page in pages for key_id in page]
+    assert flattened == [f"k{i:02d}" for i in range(9, -1, -1)]
+
+    assert _walk(keys[:8], 4) == [['k07', 'k06', 'k05', 'k04'], ['k03', 'k02', 'k01', 'k00']]  # exact multiple
+    assert _walk([], 4) == [[]]
+
+class ExplainedCollection:
+    """Answers explain() with a fixed winning plan and records the limit it was asked for"""
+
+    def __init__(self, plans):
+        self.plans = plans
+        self.limits = {}
+
+    def find(self, query):
+        self.query = query
+        return self
+
+    def sort(self, sort):
+        return self
+
+    def limit(self, limit):
+        self.limits[next(iter(self.query))] = limit
+        return self
+
+    def explain(self):
+        plan = self.plans.get(next(iter(self.query), None), {'stage': 'IXSCAN'})
+        return {'queryPlanner': {'winningPlan': plan}}
+
+def _check(plans):
+    collection = ExplainedCollection(plans)
+    db = {name: collection for name, _, _ in hot_queries()}
+    return check_query_plans(db), collection.limits
+
+def test_name_search_may_only_sort_the_top_rows():
+    top_k = {'stage': 'SORT', 'limitAmount': ADMIN_API_KEYS_MAX_PAGE_SIZE + 1, 'inputStage': {'stage': 'IXSCAN'}}
+    offenders, limits = _check({'name_lower': {'stage': 'FETCH', 'inputStage': top_k}})
+    assert offenders == [] and limits == {'name_lower': ADMIN_API_KEYS_MAX_PAGE_SIZE + 1}
+
+    offenders, _ = _check({'name_lower': {'stage': 'SORT', 'inputStage': {'stage': 'IXSCAN'}}})
+    assert len(offenders) == 1 and offenders[0].startswith('SORT: api_keys')
+
+def test_other_sorted_listings_must_read_in_index_order():
+    offenders, limits = _check({'is_active': dict(stage='SORT', limitAmount=51, inputStage={'stage': 'COLLSCAN'})})
+    assert [o.split(':')[0] for o in offenders] == ['COLLSCAN', 'SORT'] and 'is_active' not in limits
+    search = [sort for collection, query, sort in hot_queries() if 'name_lower' in query]
+    assert search == [KEYSET_SORT]
@@ -0,0 +1,174 @@
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from services import cache_retention as cache_retention_module
+from services.cache_retention import CacheRetentionEngine, GDSFPolicy, LFUDecayPolicy, LRUPolicy, RetentionPolicy
+from utils.background_loop import background_loop
+
+MB = 1024 * 1024
+NOW = time.time()
+DAY = 86400
+
+def slot(name, file_size=10 * MB, access_count=0, idle_days=10.0):
+    return {'video_id': name, 'file_type': 'video', 'quality': '360', 'doc_id': f"{name}:video",
+            'telegram_file_id': f"file-{name}", 'file_size': file_size, 'access_count': access_count,
+            'last_accessed_ts': NOW - idle_days * DAY}
+
+def ranking(policy, slots):
+    return [s['video_id'] for s in sorted(slots, key=lambda s: policy.score(s, NOW))]
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+class LadderCollection:
+    """content_ladder documents in memory, with the query shapes the engine sends"""
+
+    def __init__(self, docs):
+        self.docs = {doc['_id']: doc for doc in docs}
+        self.finds = 0
+
+    def find(self, query, projection):
+        self.finds += 1
+        after = query.get('_id', {}).get('$gt')
+        return Cursor([doc for key, doc in self.docs.items() if after is None or key > after])
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            query, update = operation._filter, operation._doc
+            doc = self.docs.get(query['_id'])
+            (field, file_id), = [(k, v) for k, v in query.items() if k != '_id']
+            quality = field.split('.')[1]
+            if doc and doc['qualities'].get(quality, {}).get('telegram_file_id') == file_id:
+                assert update == {'$unset': {f"qualities.{quality}": ''}}
+                del doc['qualities'][quality]
+
+    async def delete_many(self, query):
+        assert query['qualities'] == {}
+        for doc_id in query['_id']['$in']:
+            if doc_id in self.docs and not self.docs[doc_id]['qualities']:
+                del self.docs[doc_id]
+
+class LegacyCollection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def delete_many(self, query):
+        if 'telegram_file_id' in query:
+            matches = [r for r in self.rows if r['telegram_file_id'] in query['telegram_file_id']['$in']]
+        else:
+            matches = [r for r in self.rows if r['status'] == query['status']
+                       and r['last_verified'] < query['last_verified']['$lt']]
+        self.rows = [r for r in self.rows if r not in matches]
+        return SimpleNamespace(deleted_count=len(matches))
+
+def ladder_doc(video_id, **qualities):
+    """qualities: name=(idle_days, size_mb, access_count)"""
+    now = datetime.utcnow()
+    return {'_id': f"{video_id}:video", 'youtube_id': video_id, 'file_type': 'video', 'qualities': {
+        quality.lstrip('q'): {'telegram_file_id': f"file-{video_id}-{quality.lstrip('q')}",
+                              'file_size': size_mb * MB, 'access_count': hits,
+                              'last_accessed': now - timedelta(days=idle_days)}
+        for quality, (idle_days, size_mb, hits) in qualities.items()
+    }}
+
+@pytest.fixture
+def store(monkeypatch):
+    """Installs in-memory ladder and legacy collections"""
+    def install(docs, legacy_rows=()):
+        ladder, legacy = LadderCollection(docs), LegacyCollection(list(legacy_rows))
+        monkeypatch.setattr(cache_retention_module, 'get_content_ladder_collection', lambda: ladder)
+        monkeypatch.setattr(cache_retention_module, 'get_content_cache_collection', lambda: legacy)
+        return ladder, legacy
+    return install
+
+@pytest.fixture
+def engine():
+    engine = CacheRetentionEngine()
+    engine.batch_size, engine.max_evictions, engine.max_bytes = 2, 100, 0
+    engine.hot_window = timedelta(minutes=30)
+    return engine
+
+def test_policy_ordering():
+    slots = [slot('old', idle_days=30), slot('recent', idle_days=1), slot('popular', access_count=50, idle_days=5)]
+    assert ranking(LRUPolicy(), slots) == ['old', 'popular', 'recent']
+    assert ranking(LFUDecayPolicy(half_life_hours=24), slots)[-1] == 'popular'
+
+    gdsf = GDSFPolicy(base_cost=5, bytes_per_second=MB, half_life_hours=24 * 7)
+    small, large = slot('small', file_size=1 * MB), slot('large', file_size=500 * MB)
+    assert ranking(gdsf, [small, large]) == ['large', 'small']  # large files free more per refill second
+    # Entries that stopped being requested lose their frequency advantage
+    stale = slot('stale', access_count=20, idle_days=60)
+    fresh = slot('fresh', access_count=2, idle_days=1)
+    assert ranking(gdsf, [stale, fresh]) == ['stale', 'fresh']
+
+def test_policies_must_implement_score():
+    class Unscored(RetentionPolicy):
+        name = 'unscored'
+
+    with pytest.raises(TypeError):
+        Unscored()
+
+def test_scan_walks_every_batch_and_protects_hot_slots(engine, store):
+    ladder, _ = store([
+        ladder_doc('a', q360=(40, 10, 0), q720=(0, 30, 5)),  # 720 is hot
+        ladder_doc('b', q360=(35, 10, 0)),
+        ladder_doc('c', q360=(2, 10, 0)),
+        ladder_doc('d', q360=(50, 10, 0), q1080=(45, 50, 0)),
+        ladder_doc('e', q360=(31, 10, 0)),
+    ])
+    report = background_loop.run(engine.run('lru', dry_run=True, min_idle_days=30))
+    assert ladder.finds == 4  # three full batches of two, then an empty one
+    assert (report['scanned_docs'], report['scanned_slots'], report['protected_hot']) == (5, 7, 1)
+    assert report['total_bytes'] == 130 * MB
+    assert [(e['video_id'], e['quality']) for e in report['evicted']] == [
+        ('d', '360'), ('d', '1080'), ('a', '360'), ('b', '360'), ('e', '360')]
+    assert report['stopped_by'] == 'candidates_exhausted' and len(ladder.docs['d:video']['qualities']) == 2
+
+    report = background_loop.run(engine.run('lru', dry_run=True, min_idle_days=30, max_evictions=2))
+    assert [e['video_id'] for e in report['evicted']] == ['d', 'd'] and report['stopped_by'] == 'max_evictions'
+
+def test_byte_target_stops_once_the_cache_fits(engine, store):
+    store([ladder_doc(name, q360=(40 + i, 10, 0)) for i, name in enumerate('abcde')])  # 50 MB, all idle
+    report = background_loop.run(engine.run('lru', dry_run=True, max_bytes=25 * MB, min_idle_days=30))
+    assert [e['video_id'] for e in report['evicted']] == ['e', 'd', 'c']  # oldest first
+    assert report['bytes_freed'] == 30 * MB and report['stopped_by'] == 'byte_target'
+
+    report = background_loop.run(engine.run('lru', dry_run=True, max_bytes=100 * MB, min_idle_days=30))
+    assert report['evicted_count'] == 0 and report['stopped_by'] == 'byte_target'
+
+def test_apply_unsets_slots_drops_empty_documents_and_legacy_rows(engine, store):
+    old_verified = datetime.utcnow() - timedelta(days=8)
+    ladder, legacy = store(
+        [ladder_doc('a', q360=(40, 10, 0), q720=(0, 30, 5)), ladder_doc('b', q360=(35, 10, 0))],
+        [{'telegram_file_id': 'file-a-360', 'status': 'active', 'last_verified': datetime.utcnow()},
+         {'telegram_file_id': 'file-x', 'status': 'inactive', 'last_verified': old_verified},
+         {'telegram_file_id': 'file-y', 'status': 'active', 'last_verified': datetime.utcnow()}]
+    )
+    report = background_loop.run(engine.run('lru', dry_run=False, min_idle_days=30))
+    assert report['evicted_count'] == 2 and report['legacy_rows_removed'] == 1
+    assert list(ladder.docs) == ['a:video'] and list(ladder.docs['a:video']['qualities']) == ['720']
+    assert [r['telegram_file_id'] for r in legacy.rows] == ['file-y']
+
+def test_apply_skips_slots_replaced_after_the_scan(engine, store):
+    ladder, _ = store([ladder_doc('a', q360=(40, 10, 0))])
+    policy = engine.policies['lru']
+    report = {'scanned_docs': 0, 'scanned_slots': 0, 'protected_hot': 0, 'total_bytes': 0}
+    now = datetime.utcnow()
+    selected = background_loop.run(engine._scan(policy, now - engine.hot_window, now - timedelta(days=30), 10, report))
+    ladder.docs['a:video']['qualities']['360']['telegram_file_id'] = 'file-reuploaded'
+
+    background_loop.run(engine._apply(selected, policy))
+    assert ladder.docs['a:video']['qualities']['360']['telegram_file_id'] == 'file-reuploaded'
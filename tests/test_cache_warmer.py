@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from services import cache_warmer as cache_warmer_module
+from services.cache_warmer import PopularityCacheWarmer
+
+class Rows:
+    """Async cursor over a fixed list"""
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class UsageStats:
+    def __init__(self, groups):
+        self.groups = groups
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return Rows(self.groups)
+
+class Ladder:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection):
+        return Rows([doc for doc in self.docs if doc['_id'] in query['_id']['$in']])
+
+def group(video_id, misses, requests, endpoint='/video', qualities=('360',)):
+    return {'_id': {'youtube_id': video_id, 'endpoint': endpoint}, 'misses': misses,
+            'requests': requests, 'qualities': list(qualities)}
+
+def ladder_doc(video_id, file_type, *qualities):
+    return {'_id': f"{video_id}:{file_type}", 'youtube_id': video_id, 'file_type': file_type,
+            'qualities': {quality: {'telegram_file_id': 'file'} for quality in qualities}}
+
+@pytest.fixture
+def warmer():
+    warmer = PopularityCacheWarmer()
+    warmer.min_misses, warmer.min_requests, warmer.upload_budget, warmer.cooldown = 3, 10, 2, 3600
+    return warmer
+
+@pytest.fixture
+def collections(monkeypatch):
+    """Installs stub usage_stats and content_ladder collections"""
+    def install(groups, ladder_docs=()):
+        usage, ladder = UsageStats(groups), Ladder(list(ladder_docs))
+        monkeypatch.setattr(cache_warmer_module, 'get_usage_stats_collection', lambda profile=None: usage)
+        monkeypatch.setattr(cache_warmer_module, 'get_content_ladder_collection', lambda: ladder)
+        return usage
+    return install
+
+def test_candidates_rank_misses_before_requests(warmer):
+    groups = [
+        group('popular', misses=1, requests=40),
+        group('missed', misses=5, requests=6),
+        group('quiet', misses=2, requests=9),  # below both thresholds
+        group('tied_b', misses=4, requests=7),
+        group('tied_a', misses=4, requests=7, endpoint='/audio', qualities=(None,)),
+    ]
+    ranked = [(c['video_id'], c['content_type']) for c in warmer.pick_candidates(groups)]
+    assert ranked == [('missed', 'video'), ('tied_a', 'audio'), ('tied_b', 'video'), ('popular', 'video')]
+
+    warmer.upload_budget = 0
+    assert warmer.pick_candidates(groups) == []
+
+def test_candidate_qualities_are_normalized(warmer):
+    audio, candidate = warmer.pick_candidates([  # equal scores: by video ID
+        group('v', misses=3, requests=3, qualities=('720p', '720', None)),
+        group('a', misses=3, requests=3, endpoint='/audio', qualities=('128',)),
+    ])
+    assert candidate['requested_qualities'] == ['360', '720']
+    assert audio['requested_qualities'] == ['360'] and audio['content_type'] == 'audio'
+
+def test_window_and_thresholds_are_pushed_to_the_aggregate(warmer, collections):
+    usage = collections([group('v', misses=3, requests=3)])
+    assert [c['video_id'] for c in asyncio.run(warmer.find_candidates())] == ['v']
+    stages = usage.pipelines[0]
+    assert stages[0]['$match']['endpoint'] == {'$in': ['/video', '/audio']}
+    assert stages[-1]['$match']['$or'] == [{'misses': {'$gte': 3}}, {'requests': {'$gte': 10}}]
+
+def test_plan_skips_cached_qualities_and_respects_the_budget(warmer, collections):
+    collections(
+        [group('v1', misses=9, requests=9, qualities=('360', '720')),
+         group('a1', misses=8, requests=8, endpoint='/audio'),
+         group('v2', misses=7, requests=7, qualities=('1080',)),
+         group('v3', misses=6, requests=6)],
+        [ladder_doc('v1', 'video', '360'), ladder_doc('a1', 'audio', 'audio')]
+    )
+    planned = asyncio.run(warmer.plan())
+    assert [(p['video_id'], p['quality']) for p in planned] == [('v1', '720'), ('v2', '1080')]
+
+    warmer.recently_warmed[('v1', 'video', '720')] = float('inf')  # still cooling down
+    planned = asyncio.run(warmer.plan())
+    assert [(p['video_id'], p['quality']) for p in planned] == [('v2', '1080'), ('v3', '360')]
+
+def test_dry_run_does_not_queue_jobs(warmer, collections, monkeypatch):
+    collections([group('v1', misses=9, requests=9)])
+    monkeypatch.setattr(cache_warmer_module.cache_prefetcher, 'submit', lambda *args: pytest.fail('queued'))
+    report = asyncio.run(warmer.run_cycle(dry_run=True))
+    assert report['prefetch_jobs'] == [] and [p['video_id'] for p in report['planned']] == ['v1']
+    assert warmer.recently_warmed == {}
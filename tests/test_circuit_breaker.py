@@ -0,0 +1,47 @@
+import pytest
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+def _elapse_recovery(breaker):
+    breaker.opened_at -= breaker.recovery_timeout
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker('test', failure_threshold=3, recovery_timeout=30)
+    breaker.record_failure(RuntimeError('boom'))
+    breaker.record_failure()
+    breaker.record_success()  # a success resets the count
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow_request()
+
+    breaker.record_failure(RuntimeError('down'))
+    assert breaker.state == OPEN and breaker.is_open
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.check()
+    assert excinfo.value.name == 'test' and 1 <= excinfo.value.retry_after <= 31
+    snapshot = breaker.snapshot()
+    assert snapshot['rejected_calls'] == 1 and snapshot['last_failure'] == 'down' and 'retry_after' in snapshot
+
+def test_half_open_allows_one_trial_call():
+    breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    _elapse_recovery(breaker)
+    assert breaker.allow_request() and breaker.state == HALF_OPEN
+    assert not breaker.allow_request()  # only one trial at a time
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow_request() and breaker.allow_request()
+
+def test_failed_trial_reopens_and_lost_trial_is_rearmed():
+    breaker = CircuitBreaker('test', failure_threshold=5, recovery_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+    _elapse_recovery(breaker)
+    assert breaker.allow_request()
+    breaker.record_failure()  # one failure in half-open is enough
+    assert breaker.state == OPEN and not breaker.allow_request()
+
+    _elapse_recovery(breaker)
+    assert breaker.allow_request() and breaker.state == HALF_OPEN
+    # The trial never reported back; after another timeout a new trial is allowed
+    _elapse_recovery(breaker)
+    assert breaker.allow_request()
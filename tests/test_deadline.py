@@ -0,0 +1,119 @@
+import asyncio
+import time
+from contextlib import nullcontext
+import pytest
+from pymongo import _csot
+import database.repository
+from services import api_service as api_service_module
+from services.api_service import APIService
+from utils import deadline
+from utils.background_loop import background_loop
+from utils.deadline import DeadlineExceeded
+
+@pytest.fixture
+def budget():
+    """Starts request deadlines in the test's context and resets them afterwards"""
+    tokens = []
+    yield lambda seconds: tokens.append(deadline.set_deadline(seconds))
+    for token in reversed(tokens):
+        deadline.reset_deadline(token)
+
+def test_no_deadline_means_no_limit():
+    assert deadline.remaining() is None and not deadline.expired()
+    assert deadline.has_time(3600) and deadline.timeout(30) == 30
+    assert isinstance(deadline.db_timeout(), nullcontext)
+    deadline.check('lookup')
+
+def test_timeouts_are_capped_by_the_remaining_budget(budget):
+    budget(5)
+    assert 4 < deadline.remaining() <= 5
+    assert deadline.timeout(30) <= 5 and deadline.timeout(1) == 1
+    assert deadline.has_time(4) and not deadline.has_time(6)
+    with deadline.db_timeout():
+        assert 4 < _csot.get_timeout() <= 5
+
+def test_an_expired_budget_raises(budget):
+    budget(0)
+    assert deadline.remaining() == 0 and deadline.expired()
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout(30)
+    with pytest.raises(DeadlineExceeded) as excinfo:
+        deadline.db_timeout()
+    assert excinfo.value.stage == 'database'
+    with pytest.raises(DeadlineExceeded) as excinfo:
+        deadline.check('upload')
+    assert 'during upload' in str(excinfo.value)
+
+def test_sleep_gives_up_instead_of_outliving_the_budget(budget):
+    budget(0.2)
+    started = time.monotonic()
+    asyncio.run(deadline.sleep(0.01))
+    with pytest.raises(DeadlineExceeded) as excinfo:
+        asyncio.run(deadline.sleep(1, 'retry'))
+    assert excinfo.value.stage == 'retry' and time.monotonic() - started < 0.2
+
+def test_run_carries_the_deadline_but_submit_does_not(budget):
+    async def seen():
+        return deadline.remaining()
+
+    budget(5)
+    assert 4 < background_loop.run(seen(), timeout=5) <= 5
+    assert background_loop.submit(seen()).result(timeout=5) is None
+
+class StubDownloader:
+    def __init__(self, result=None):
+        self.result = result
+        self.calls = 0
+
+    async def download_content(self, youtube_url, quality, content_type):
+        self.calls += 1
+        return self.result
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Prefetch jobs handed over by _queue_for_later"""
+    jobs = []
+
+    def submit(items, content_type, quality):
+        jobs.append((items, content_type, quality))
+        return {'job_id': f"job-{len(jobs)}"}
+
+    monkeypatch.setattr('services.prefetch_service.cache_prefetcher.submit', submit)
+    return jobs
+
+@pytest.fixture
+def service(monkeypatch, queued):
+    """APIService on a cache miss that must not start a background upload"""
+    async def miss(video_id, content_type, quality):
+        return None
+
+    async def no_usage(*args, **kwargs):
+        pass
+
+    def no_upload(coro):
+        coro.close()
+        pytest.fail('the upload must not start')
+
+    monkeypatch.setattr(database.repository, 'get_content_cache_collection', lambda: object())
+    monkeypatch.setattr(api_service_module.quality_ladder, 'lookup', miss)
+    monkeypatch.setattr(api_service_module.background_loop, 'submit', no_upload)
+    service = APIService()
+    service.youtube_downloader = StubDownloader()
+    monkeypatch.setattr(service, 'log_usage', no_usage)
+    return service
+
+def test_expired_deadline_queues_before_downloading(service, queued, budget):
+    budget(0)
+    result = asyncio.run(service._process_youtube_request('key', 'https://youtu.be/dQw4w9WgXcQ', 'video', '720p'))
+    assert result['queued'] and result['reason'] == 'deadline_exceeded' and result['status'] is False
+    assert result['prefetch_job_id'] == 'job-1' and result['quality'] == '720' and result['retry_after'] > 0
+    assert service.youtube_downloader.calls == 0
+    assert queued == [(['dQw4w9WgXcQ'], 'video', '720')]
+
+def test_download_that_runs_out_of_time_is_queued(service, queued, budget):
+    service.youtube_downloader = StubDownloader({'status': False, 'reason': 'deadline_exceeded'})
+    budget(10)
+    result = asyncio.run(service._process_youtube_request('key', 'dQw4w9WgXcQ', 'audio', '360'))
+    assert result['queued'] and result['prefetch_job_id'] == 'job-1' and result['quality'] is None
+    assert service.youtube_downloader.calls == 1
+    assert queued == [(['dQw4w9WgXcQ'], 'audio', '320')]
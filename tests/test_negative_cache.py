@@ -0,0 +1,38 @@
+from services.negative_cache import NegativeCache, UNAVAILABLE, UPSTREAM_ERROR
+
+def _cache(max_entries=100):
+    cache = NegativeCache()
+    cache.base_ttl, cache.unavailable_ttl, cache.max_ttl, cache.max_entries = 10, 60, 100, max_entries
+    return cache
+
+def _expire(cache, key):
+    cache.entries[key]['expires_at'] = 0.0
+
+def test_ttl_doubles_per_failure_up_to_the_cap():
+    cache = _cache()
+    ttls = [cache.record_failure('video:a', UPSTREAM_ERROR, 'timeout')['retry_after'] for _ in range(5)]
+    assert ttls == [10, 20, 40, 80, 100]
+    assert cache.record_failure('video:b', UNAVAILABLE, 'private video')['retry_after'] == 60
+    assert cache.get('video:b')['failures'] == 1 and 0 < cache.get('video:b')['retry_after'] <= 61
+
+def test_expired_entries_miss_but_keep_backing_off():
+    cache = _cache()
+    cache.record_failure('video:a', UPSTREAM_ERROR, 'timeout')
+    _expire(cache, 'video:a')
+    assert cache.get('video:a') is None  # retry allowed
+    entry = cache.record_failure('video:a', UPSTREAM_ERROR, 'timeout again')
+    assert entry['failures'] == 2 and entry['retry_after'] == 20
+
+    cache.clear('video:a')  # a success resets the back-off
+    assert cache.get('video:a') is None
+    assert cache.record_failure('video:a', UPSTREAM_ERROR, 'timeout')['retry_after'] == 10
+
+def test_oldest_entries_are_evicted_and_hits_counted():
+    cache = _cache(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.record_failure(key, UPSTREAM_ERROR, 'error')
+    assert list(cache.entries) == ['b', 'c']
+    cache.get('c')
+    cache.get('c')
+    _expire(cache, 'b')
+    assert cache.stats() == {'entries': 2, 'active': 1, 'hits': 2}
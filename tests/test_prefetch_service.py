@@ -0,0 +1,94 @@
+import asyncio
+import time
+import pytest
+from services.prefetch_service import CachePrefetcher
+
+class FakeCache:
+    def __init__(self, cached=()):
+        self.cached = set(cached)
+        self.uploaded = []
+
+    def _generate_content_hash(self, video_id, content_type, quality):
+        return f"{video_id}:{content_type}:{quality}"
+
+    async def _check_duplicate_by_hash(self, content_hash):
+        return content_hash.split(':')[0] in self.cached
+
+    async def download_and_cache(self, download_url, video_info):
+        self.uploaded.append(video_info['video_id'])
+        return f"file-{video_info['video_id']}"
+
+class FakeDownloader:
+    """Counts how many downloads run at once"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def download_content(self, url, quality, content_type):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return {'status': True, 'download_url': f"https://cdn.example/{url[-11:]}", 'title': 'Title'}
+
+def _prefetcher(concurrency=2, cached=(), delay=0.02):
+    prefetcher = CachePrefetcher()
+    prefetcher.concurrency = concurrency
+    prefetcher.min_interval = 0
+    prefetcher.cache = FakeCache(cached)
+    prefetcher.downloader = FakeDownloader(delay)
+    return prefetcher
+
+def _wait_finished(prefetcher, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = prefetcher.get_job(job_id)
+        if job['status'] in ('completed', 'cancelled'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"prefetch job {job_id} did not finish")
+
+def test_job_resolves_dedupes_and_skips_cached_items():
+    prefetcher = _prefetcher(cached={'9bZkp7q19f0'})
+    job = prefetcher.submit(['dQw4w9WgXcQ', 'https://youtu.be/dQw4w9WgXcQ', '9bZkp7q19f0', 'not a video', ' '])
+    assert job['total'] == 3 and job['quality'] == '360'
+
+    job = _wait_finished(prefetcher, job['job_id'])
+    states = {entry['input']: entry['state'] for entry in job['items']}
+    assert states == {'dQw4w9WgXcQ': 'cached', '9bZkp7q19f0': 'skipped', 'not a video': 'failed'}
+    assert (job['cached'], job['skipped'], job['failed'], job['completed']) == (1, 1, 1, 3)
+    assert prefetcher.cache.uploaded == ['dQw4w9WgXcQ']
+    assert [j['job_id'] for j in prefetcher.list_jobs()] == [job['job_id']]
+
+def test_too_many_items_are_refused():
+    prefetcher = _prefetcher()
+    prefetcher.max_items = 2
+    with pytest.raises(ValueError):
+        prefetcher.submit(['dQw4w9WgXcQ', '9bZkp7q19f0', 'kJQP7kiw5Fk'])
+    assert prefetcher.list_jobs() == []
+
+def test_concurrency_cap_is_shared_by_all_jobs():
+    prefetcher = _prefetcher(concurrency=2)
+    first = prefetcher.submit(['dQw4w9WgXcQ', '9bZkp7q19f0', 'kJQP7kiw5Fk'])
+    second = prefetcher.submit(['OPf0YbXqDm0', 'JGwWNGJdvx8', 'RgKAFK5djSk'])
+    for job in (first, second):
+        assert _wait_finished(prefetcher, job['job_id'])['cached'] == 3
+    assert prefetcher.downloader.peak == 2
+
+def test_cancel_stops_items_that_have_not_started():
+    prefetcher = _prefetcher(concurrency=1, delay=0.1)
+    job = prefetcher.submit(['dQw4w9WgXcQ', '9bZkp7q19f0', 'kJQP7kiw5Fk', 'OPf0YbXqDm0'])
+    deadline = time.monotonic() + 2
+    while prefetcher.downloader.active == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert prefetcher.cancel(job['job_id'])['status'] == 'cancelling'
+
+    job = _wait_finished(prefetcher, job['job_id'])
+    assert job['status'] == 'cancelled'
+    assert (job['cached'], job['cancelled'], job['completed']) == (1, 3, 4)
+    assert prefetcher.cancel(job['job_id'])['status'] == 'cancelled'  # finished jobs stay as they are
+    assert prefetcher.cancel('missing') is None
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime
+import pytest
+from database.storage import SQLiteStorage
+from services import quality_ladder as quality_ladder_module
+from services.quality_ladder import QualityLadderCache, ladder_key, normalize_quality, resolve_quality
+
+def test_normalize_quality():
+    for raw in ('720p', '720P', ' 720 ', 720, '720'):
+        assert normalize_quality(raw) == '720'
+    assert normalize_quality(None) == '360' and normalize_quality('') == '360' and normalize_quality('p') == '360'
+
+def test_ladder_key():
+    assert ladder_key('video', '1080p') == '1080' and ladder_key('video', None) == '360'
+    assert ladder_key('audio', '320') == 'audio' and ladder_key('audio', None) == 'audio'
+
+@pytest.mark.parametrize('policy, requested, served', [
+    ('prefer_higher', '720', '1080'),
+    ('prefer_higher', '360', '480'),   # nearest higher rung, not the highest
+    ('prefer_higher', '1080', '1080'),
+    ('prefer_higher', '2160', '1080'),  # nothing higher: nearest lower
+    ('prefer_lower', '720', '480'),    # nearest lower rung, not the lowest
+    ('prefer_lower', '240', '144'),
+    ('exact_only', '720', None),
+    ('exact_only', '480', '480'),
+])
+def test_resolve_quality(policy, requested, served):
+    assert resolve_quality(['144', '480', '1080'], requested, policy) == served
+
+def test_resolve_quality_edge_cases():
+    assert resolve_quality([], '720', 'prefer_higher') is None
+    assert resolve_quality(['480', '1080'], '240', 'prefer_lower') == '480'  # nothing lower: nearest higher
+    assert resolve_quality(['', None], '720', 'prefer_higher') is None
+    assert resolve_quality(['audio'], 'audio', 'exact_only') == 'audio'
+    assert resolve_quality(['360'], 'audio', 'prefer_higher') is None  # audio never falls back to a video rung
+
+def _slot(file_id):
+    return {'telegram_file_id': file_id, 'file_size': 1024, 'content_hash': file_id,
+            'upload_date': '2025-01-01T00:00:00', 'access_count': 0, 'last_accessed': datetime(2025, 1, 1)}
+
+class LegacyStorage:
+    """A ladder document created by a new upload, next to older content_cache rows for the same video"""
+
+    def __init__(self, ladder, legacy_rows):
+        self.ladder = ladder
+        self.legacy_rows = legacy_rows
+        self.legacy_reads = 0
+        self.merged = []
+
+    async def get_ladder(self, doc_id):
+        return {**self.ladder, 'qualities': dict(self.ladder['qualities'])}
+
+    async def legacy_cache_rows(self, youtube_id, content_type):
+        self.legacy_reads += 1
+        return self.legacy_rows
+
+    async def merge_ladder_qualities(self, doc_id, qualities):
+        self.merged.append(sorted(qualities))
+        for key, entry in qualities.items():
+            self.ladder['qualities'].setdefault(key, entry)
+        self.ladder['legacy_merged'] = True
+
+    async def touch_ladder(self, doc_id, served, upgrade_to=None):
+        pass
+
+@pytest.fixture
+def legacy_storage(monkeypatch):
+    storage = LegacyStorage(
+        {'_id': 'vid:video', 'title': 'Title', 'qualities': {'1080': _slot('new-1080')}},
+        [dict(_slot('old-360'), quality='360p'), dict(_slot('old-1080'), quality='1080')]
+    )
+    monkeypatch.setattr(quality_ladder_module, 'storage', storage)
+    return storage
+
+def test_legacy_qualities_are_merged_into_an_existing_ladder(legacy_storage):
+    ladder = QualityLadderCache()
+    ladder.policy = 'exact_only'
+
+    hit = asyncio.run(ladder.lookup('vid', 'video', '360'))
+    assert hit['telegram_file_id'] == 'old-360' and hit['source'] == 'legacy'
+    assert legacy_storage.merged == [['360']]  # the newer 1080 upload is kept
+
+    hit = asyncio.run(ladder.lookup('vid', 'video', '1080'))
+    assert hit['telegram_file_id'] == 'new-1080' and hit['source'] == 'ladder'
+    assert asyncio.run(ladder.lookup('vid', 'video', '720')) is None
+    assert legacy_storage.legacy_reads == 1  # merged once, not on every miss
+
+def test_sqlite_merge_keeps_existing_slots():
+    store = SQLiteStorage(':memory:')
+    asyncio.run(store.put_ladder_quality('vid:video', 'vid', 'video', '1080', _slot('new-1080'), 'Title', 212))
+    asyncio.run(store.merge_ladder_qualities('vid:video', {'360': _slot('old-360'), '1080': _slot('old-1080')}))
+    qualities = asyncio.run(store.get_ladder('vid:video'))['qualities']
+    assert {key: slot['telegram_file_id'] for key, slot in qualities.items()} == {'360': 'old-360', '1080': 'new-1080'}
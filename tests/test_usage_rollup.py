@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from database.storage import SQLiteStorage
+from services import usage_rollup as usage_rollup_module
+from services.usage_rollup import UsageRollup, WATERMARK_ID
+
+NOW = datetime(2025, 6, 1, 12, 10)
+
+class Rollups:
+    """usage_rollups documents in memory"""
+
+    def __init__(self, watermark=None):
+        self.docs = {WATERMARK_ID: {'until': watermark}} if watermark else {}
+
+    async def find_one(self, query):
+        return self.docs.get(query['_id'])
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            self.docs[operation._filter['_id']] = operation._doc
+
+    async def replace_one(self, query, doc, upsert=False):
+        self.docs[query['_id']] = doc
+
+@pytest.fixture
+def sqlite(monkeypatch):
+    store = SQLiteStorage(':memory:')
+    monkeypatch.setattr(usage_rollup_module, 'storage', store)
+    return store
+
+@pytest.fixture
+def rollups(monkeypatch):
+    collection = Rollups(watermark=datetime(2025, 6, 1, 9))
+    monkeypatch.setattr(usage_rollup_module, 'get_usage_rollups_collection', lambda: collection)
+    return collection
+
+def record(store, n, timestamp, api_key='key', status='success', response_time=0.5):
+    for i in range(n):
+        asyncio.run(store.insert_usage({'_id': f"{timestamp:%H%M%S}-{api_key}-{i}", 'api_key': api_key,
+                                        'endpoint': '/video', 'status': status, 'response_time': response_time,
+                                        'timestamp': timestamp}))
+
+def test_sqlite_usage_is_rolled_up_per_hour(sqlite, rollups):
+    record(sqlite, 3, datetime(2025, 6, 1, 9, 10))
+    record(sqlite, 1, datetime(2025, 6, 1, 9, 59), response_time=2.0)
+    record(sqlite, 2, datetime(2025, 6, 1, 10, 30), api_key='other', status='error')
+    record(sqlite, 1, datetime(2025, 6, 1, 8, 30))  # before the watermark
+
+    report = asyncio.run(UsageRollup().run_cycle(until=NOW))
+    assert (report['hours'], report['rollups']) == (3, 2)
+    nine = rollups.docs['2025060109:key:/video:success']
+    assert nine['hour'] == datetime(2025, 6, 1, 9) and nine['requests'] == 4
+    assert nine['response_time_total'] == 3.5 and nine['response_time_max'] == 2.0
+    assert rollups.docs['2025060110:other:/video:error']['requests'] == 2
+    assert rollups.docs[WATERMARK_ID]['until'] == datetime(2025, 6, 1, 12)
+
+def test_the_last_hour_waits_for_the_grace_period(sqlite, rollups):
+    record(sqlite, 1, datetime(2025, 6, 1, 11, 59, 59))
+    report = asyncio.run(UsageRollup().run_cycle(until=datetime(2025, 6, 1, 12, 2)))
+    assert report['until'] == datetime(2025, 6, 1, 11) and report['rollups'] == 0
+
+    report = asyncio.run(UsageRollup().run_cycle(until=datetime(2025, 6, 1, 12, 5)))
+    assert report['until'] == datetime(2025, 6, 1, 12) and report['rollups'] == 1
+
+def test_raw_usage_is_only_pruned_after_a_successful_cycle(sqlite, monkeypatch):
+    monkeypatch.setattr(usage_rollup_module, 'USAGE_STATS_RETENTION_DAYS', 0)
+    record(sqlite, 2, datetime.utcnow() - timedelta(hours=3))
+    monkeypatch.setattr(usage_rollup_module, 'get_usage_rollups_collection', lambda: None)
+    assert asyncio.run(UsageRollup().tick())['reason'] == 'database_unavailable'
+    assert asyncio.run(sqlite.count_usage_since('key', datetime(2000, 1, 1))) == 2
+
+    collection = Rollups(watermark=datetime.utcnow() - timedelta(hours=5))
+    monkeypatch.setattr(usage_rollup_module, 'get_usage_rollups_collection', lambda: collection)
+    assert asyncio.run(UsageRollup().tick())['rollups'] == 1
+    assert asyncio.run(sqlite.count_usage_since('key', datetime(2000, 1, 1))) == 0
@@ -0,0 +1,102 @@
+"""
+AES-CBC payload decryption with a precomputed key and minimal copying
+"""
+import base64
+import json
+from typing import Any, Iterable, List, Optional, Union
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+BLOCK_SIZE = 16
+
+Payload = Union[str, bytes, bytearray, memoryview]
+
+class DecryptionError(ValueError):
+    """Payload is malformed, has the wrong length or bad PKCS7 padding"""
+
+class AESCBCDecryptor:
+    """Decrypts IV-prefixed AES-CBC payloads (base64 or raw bytes) with one parsed key"""
+
+    def __init__(self, key_hex: str):
+        try:
+            key = bytes.fromhex(key_hex)
+        except ValueError as e:
+            raise ValueError(f"Invalid hex format: {e}")
+        self.algorithm = algorithms.AES(key)
+
+    @staticmethod
+    def _decode(payload: Payload) -> memoryview:
+        if isinstance(payload, str):
+            # b64decode skips non-alphabet characters such as spaces and newlines
+            try:
+                payload = base64.b64decode(payload)
+            except Exception as e:
+                raise DecryptionError(f"Invalid base64 format: {e}")
+        data = memoryview(payload)
+        if len(data) < 2 * BLOCK_SIZE or len(data) % BLOCK_SIZE:
+            raise DecryptionError(f"Invalid payload length: {len(data)}")
+        return data
+
+    def _decrypt_into(self, data: memoryview, buffer: bytearray) -> int:
+        """Decrypt into buffer and return the plaintext length without padding"""
+        decryptor = Cipher(self.algorithm, modes.CBC(data[:BLOCK_SIZE])).decryptor()
+        size = decryptor.update_into(data[BLOCK_SIZE:], buffer)
+        decryptor.finalize()
+
+        pad = buffer[size - 1]
+        if not 1 <= pad <= BLOCK_SIZE or buffer.count(pad, size - pad, size) != pad:
+            raise DecryptionError("Invalid PKCS7 padding")
+        return size - pad
+
+    @staticmethod
+    def _buffer_size(data: memoryview) -> int:
+        # update_into needs room for the ciphertext plus one block minus a byte
+        return (len(data) - BLOCK_SIZE) + BLOCK_SIZE - 1
+
+    def decrypt(self, payload: Payload) -> memoryview:
+        """Plaintext as a view over a freshly allocated buffer"""
+        data = self._decode(payload)
+        buffer = bytearray(self._buffer_size(data))
+        return memoryview(buffer)[:self._decrypt_into(data, buffer)]
+
+    def decrypt_json(self, payload: Payload) -> Any:
+        """Decrypt a payload and parse the JSON document inside"""
+        plaintext = self.decrypt(payload)
+        try:
+            return json.loads(str(plaintext, 'utf-8'))
+        except ValueError as e:
+            raise DecryptionError(f"Invalid JSON payload: {e}")
+
+    def decrypt_json_many(self, payloads: Iterable[Payload],
+                          return_exceptions: bool = False) -> List[Optional[Any]]:
+        """Decrypt many JSON payloads, reusing one scratch buffer sized to the largest.
+
+        With return_exceptions, a failing payload yields its DecryptionError in
+        place instead of aborting the batch.
+        """
+        decoded = []
+        for payload in payloads:
+            try:
+                decoded.append(self._decode(payload))
+            except DecryptionError as e:
+                if not return_exceptions:
+                    raise
+                decoded.append(e)
+
+        sizes = [self._buffer_size(d) for d in decoded if isinstance(d, memoryview)]
+        buffer = bytearray(max(sizes, default=0))
+        view = memoryview(buffer)
+
+        results = []
+        for data in decoded:
+            if isinstance(data, DecryptionError):
+                results.append(data)
+                continue
+            try:
+                size = self._decrypt_into(data, buffer)
+                results.append(json.loads(str(view[:size], 'utf-8')))
+            except ValueError as e:
+                error = e if isinstance(e, DecryptionError) else DecryptionError(f"Invalid JSON payload: {e}")
+                if not return_exceptions:
+                    raise error
+                results.append(error)
+        return results
@@ -0,0 +1,75 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Coroutine, Optional
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+class BackgroundLoop:
+    """Persistent asyncio event loop running in a daemon thread.
+
+    Long-lived background work (prefetching, warming, jobs) is handed over
+    with :meth:`submit`. Flask routes run their coroutines here too, with
+    :meth:`run`, so loop-bound clients (Motor, httpx sessions) are created
+    once per process instead of once per request loop.
+    """
+
+    def __init__(self, name: str = 'background-loop'):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.loop = loop
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread if it is not running yet"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._ready.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                self._ready.wait()
+                logger.info(f"🔄 Background loop started: {self.name}")
+        return self.loop
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        """Schedule a coroutine on the background loop (thread-safe)"""
+        loop = self.start()
+        # Run in an empty context so request-scoped state (e.g. the deadline) does not leak in
+        return contextvars.Context().run(asyncio.run_coroutine_threadsafe, coro, loop)
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the background loop and block until it finishes.
+
+        Unlike :meth:`submit`, the caller's context (e.g. the request deadline)
+        is carried over. Must not be called from the loop thread itself.
+        """
+        loop = self.start()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("background_loop.run() called from the background loop; await the coroutine instead")
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+# Global background loop shared by background services
+background_loop = BackgroundLoop()
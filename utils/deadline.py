@@ -0,0 +1,70 @@
+"""
+Per-request deadlines - one time budget shared by every layer of a request
+"""
+import asyncio
+import contextvars
+import time
+from contextlib import nullcontext
+from typing import Optional
+import pymongo
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('request_deadline', default=None)
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before this step could run"""
+
+    def __init__(self, stage: str = ''):
+        super().__init__(f"Request deadline exceeded{f' during {stage}' if stage else ''}")
+        self.stage = stage
+
+def set_deadline(seconds: float) -> contextvars.Token:
+    """Start a budget of `seconds` for the current context; pass the token to reset_deadline"""
+    return _deadline.set(time.monotonic() + seconds)
+
+def reset_deadline(token: contextvars.Token):
+    _deadline.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left, or None when no deadline is set (background work)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+def check(stage: str = ''):
+    """Raise DeadlineExceeded if the budget is spent"""
+    if expired():
+        raise DeadlineExceeded(stage)
+
+def has_time(seconds: float) -> bool:
+    """Whether at least `seconds` remain (always True without a deadline)"""
+    left = remaining()
+    return left is None or left >= seconds
+
+def timeout(default: float) -> float:
+    """A per-call timeout capped by the remaining budget"""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(default, left)
+
+async def sleep(delay: float, stage: str = ''):
+    """Retry back-off that gives up instead of sleeping past the deadline"""
+    if not has_time(delay):
+        raise DeadlineExceeded(stage)
+    await asyncio.sleep(delay)
+
+def db_timeout():
+    """pymongo client-side timeout bounded by the deadline (Motor carries it into its executor)"""
+    left = remaining()
+    if left is None:
+        return nullcontext()
+    if left <= 0:
+        raise DeadlineExceeded('database')
+    return pymongo.timeout(left)
@@ -0,0 +1,285 @@
+"""
+In-process metrics registry - counters, gauges and histograms rendered in the Prometheus text format
+"""
+import asyncio
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from config import METRICS_LOOP_LAG_INTERVAL_SECONDS
+from utils.background_loop import background_loop
+from utils.logging import LOGGER, dropped_records
+
+logger = LOGGER(__name__)
+
+# Seconds; covers sub-millisecond cache reads up to multi-minute uploads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Metric:
+    """Base class: a named family of samples keyed by label values"""
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        try:
+            if len(labels) == len(self.label_names):
+                return tuple([str(labels[name]) for name in self.label_names])
+        except KeyError:
+            pass
+        raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in values]
+
+class Gauge(Metric):
+    """Value that goes up and down; set directly or read from a callback at scrape time"""
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 function: Optional[Callable[[], Any]] = None, type: Optional[str] = None):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        # The callback returns a number, or {label values tuple: number} for labelled gauges
+        self.function = function
+        if type:
+            self.type = type
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        if self.function is not None:
+            try:
+                result = self.function()
+            except Exception as e:
+                logger.debug(f"Metric callback {self.name} failed: {e}")
+                return []
+            values = list(result.items()) if isinstance(result, dict) else [((), result)]
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values if value is not None
+        ]
+
+class Histogram(Metric):
+    """Bucketed observations (cumulative buckets, sum and count per label set)"""
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def summary(self, **labels) -> Dict[str, float]:
+        """Count and mean for one label set, or across all label sets without labels"""
+        with self._lock:
+            if labels:
+                states = [self._values.get(self._key(labels))]
+            else:
+                states = list(self._values.values())
+        count = sum(sum(state[:-1]) for state in states if state)
+        total = sum(state[-1] for state in states if state)
+        return {'count': count, 'sum': total, 'mean': total / count if count else 0.0}
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(state)) for key, state in self._values.items()]
+        lines = []
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += count
+                le = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {_format_value(cumulative)}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+class MetricsRegistry:
+    """Named metrics of the process; registering a name twice returns the existing metric"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (),
+              function: Optional[Callable[[], Any]] = None, type: Optional[str] = None) -> Gauge:
+        return self._register(Gauge, name, help, labels, function=function, type=type)
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, labels, buckets=buckets)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+# Hot-path metrics shared by routes and services
+http_request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by Flask endpoint',
+    ('endpoint', 'method', 'status')
+)
+content_request_duration = metrics.histogram(
+    'content_request_duration_seconds', 'Video/audio request latency by where the answer came from',
+    ('content_type', 'source')
+)
+cache_lookups = metrics.counter(
+    'cache_lookups_total', 'Quality ladder lookups on the request path',
+    ('content_type', 'result')
+)
+upstream_request_duration = metrics.histogram(
+    'upstream_request_duration_seconds', 'Latency of calls to SaveTube and the Telegram Bot API',
+    ('dependency', 'operation')
+)
+mongodb_command_duration = metrics.histogram(
+    'mongodb_command_duration_seconds', 'MongoDB command latency as reported by the driver',
+    ('command', 'outcome')
+)
+event_loop_lag = metrics.histogram(
+    'event_loop_lag_seconds', 'How late the background event loop ran a scheduled callback',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+class LoopLagMonitor:
+    """Samples event-loop lag: sleeps for an interval and measures how late it wakes up"""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.last_lag = 0.0
+        self.started = False
+
+    def start(self):
+        """Start sampling on the shared background loop"""
+        if self.started:
+            return
+        self.started = True
+        background_loop.submit(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - expected)
+            event_loop_lag.observe(self.last_lag)
+
+# Global event-loop lag monitor (started on the shared background loop)
+loop_lag_monitor = LoopLagMonitor(METRICS_LOOP_LAG_INTERVAL_SECONDS)
+metrics.gauge(
+    'event_loop_lag_last_seconds', 'Most recent event-loop lag sample',
+    function=lambda: loop_lag_monitor.last_lag
+)
+metrics.gauge(
+    'log_records_dropped_total', 'Log records dropped because the log queue was full',
+    function=dropped_records, type='counter'
+)
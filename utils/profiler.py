@@ -0,0 +1,288 @@
+"""
+On-demand profiling - stack sampling of every thread for a time window and slow-callback capture on the background loop
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+from config import PROFILER_HISTORY, PROFILER_MAX_SECONDS, PROFILER_SLOW_CALLBACK_HISTORY
+from utils.background_loop import background_loop
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Per-thread CPU clocks (Linux): clock id of a kernel thread ID, as glibc's MAKE_THREAD_CPUCLOCK builds it
+CPU_CLOCKS = sys.platform.startswith('linux') and hasattr(time, 'clock_gettime')
+
+def _thread_cpu_clock(native_id: int) -> int:
+    return ((~native_id) << 3) | 6
+
+class ProfilerBusy(RuntimeError):
+    """A profiling window is already open in this worker"""
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(REPO_ROOT + os.sep):
+        return filename[len(REPO_ROOT) + 1:]
+    parts = filename.replace('\\', '/').split('/')
+    return '/'.join(parts[-2:])
+
+class Profile:
+    """Samples of one profiling window, folded into stacks and per-function counts"""
+
+    def __init__(self, duration: float, interval: float, mode: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.pid = os.getpid()
+        self.duration = duration
+        self.interval = interval
+        self.mode = mode
+        self.status = 'running'
+        self.started_at = time.time()
+        self.ended_at: Optional[float] = None
+        self.ticks = 0
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self.error: Optional[str] = None
+
+    def add(self, stack: List[str]):
+        """One thread's stack, root first"""
+        self.samples += 1
+        self.stacks[';'.join(stack)] += 1
+        self.self_counts[stack[-1]] += 1
+        for label in set(stack[1:]):  # the thread name is not a function
+            self.total_counts[label] += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format ('root;caller;leaf count'), for flamegraph.pl or speedscope"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = 30, sort: str = 'self') -> List[Dict[str, Any]]:
+        counts = self.self_counts if sort == 'self' else self.total_counts
+        total = self.samples or 1
+        return [{
+            'function': label,
+            'self': self.self_counts[label],
+            'total': self.total_counts[label],
+            'self_percent': round(100 * self.self_counts[label] / total, 2),
+            'total_percent': round(100 * self.total_counts[label] / total, 2)
+        } for label, _ in counts.most_common(limit)]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'pid': self.pid,
+            'mode': self.mode,
+            'status': self.status,
+            'started_at': self.started_at,
+            'seconds': round((self.ended_at or time.time()) - self.started_at, 3),
+            'requested_seconds': self.duration,
+            'interval_ms': self.interval * 1000,
+            'ticks': self.ticks,
+            'samples': self.samples,
+            'distinct_stacks': len(self.stacks),
+            'error': self.error
+        }
+
+class SamplingProfiler:
+    """Samples the Python stacks of all threads from a helper thread while a window is open.
+
+    Nothing runs while no window is open. In 'wall' mode every thread is
+    sampled on every tick; in 'cpu' mode only threads whose CPU clock
+    advanced since the previous tick (falls back to 'wall' off Linux).
+    """
+
+    MODES = ('cpu', 'wall')
+
+    def __init__(self, history: int, max_seconds: float):
+        self.max_seconds = max_seconds
+        self.current: Optional[Profile] = None
+        self.profiles: Deque[Profile] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._labels: Dict[Any, str] = {}
+
+    def start(self, duration: float = 10.0, interval: float = 0.005, mode: str = 'cpu') -> Profile:
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {', '.join(self.MODES)}")
+        if not 0 < duration <= self.max_seconds:
+            raise ValueError(f"duration must be between 0 and {self.max_seconds} seconds")
+        if not 0.001 <= interval <= 1.0:
+            raise ValueError("interval must be between 1 ms and 1 s")
+        with self._lock:
+            if self.current is not None:
+                raise ProfilerBusy(f"Profile {self.current.id} is still running")
+            profile = self.current = Profile(duration, interval, mode if mode == 'wall' or CPU_CLOCKS else 'wall')
+            self._stop.clear()
+        threading.Thread(target=self._run, args=(profile,), name='sampling-profiler', daemon=True).start()
+        logger.info(f"🔬 Profiling {profile.mode} time for {duration}s every {interval * 1000:.0f}ms ({profile.id})")
+        return profile
+
+    def stop(self) -> Optional[Profile]:
+        """End the open window early; the profile keeps what was sampled"""
+        profile = self.current
+        self._stop.set()
+        return profile
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        current = self.current
+        if current is not None and current.id == profile_id:
+            return current
+        return next((profile for profile in self.profiles if profile.id == profile_id), None)
+
+    def status(self) -> Dict[str, Any]:
+        current = self.current
+        return {
+            'running': current.summary() if current else None,
+            'profiles': [profile.summary() for profile in reversed(self.profiles)],
+            'cpu_clocks': CPU_CLOCKS
+        }
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+            self._labels[code] = label
+        return label
+
+    def _run(self, profile: Profile):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + profile.duration
+        cpu_seen: Dict[int, float] = {}
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                threads = {thread.ident: thread for thread in threading.enumerate()}
+                profile.ticks += 1
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_id:
+                        continue
+                    thread = threads.get(ident)
+                    if profile.mode == 'cpu':
+                        if thread is None or thread.native_id is None:
+                            continue
+                        try:
+                            used = time.clock_gettime(_thread_cpu_clock(thread.native_id))
+                        except OSError:  # the thread exited since enumerate()
+                            continue
+                        previous = cpu_seen.get(ident)
+                        cpu_seen[ident] = used
+                        if previous is None or used <= previous:
+                            continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    # Request threads are numbered; fold them into one root per kind
+                    name = re.sub(r'-\d+', '', thread.name) if thread is not None else f"thread-{ident}"
+                    stack.append(name)
+                    stack.reverse()
+                    profile.add(stack)
+                time.sleep(profile.interval)
+            profile.status = 'stopped' if self._stop.is_set() else 'finished'
+        except Exception as e:
+            profile.status = 'failed'
+            profile.error = str(e)
+            logger.error(f"Profiler failed: {e}")
+        finally:
+            profile.ended_at = time.time()
+            with self._lock:
+                self.profiles.append(profile)
+                self.current = None
+            logger.info(f"🔬 Profile {profile.id} {profile.status}: {profile.samples} samples")
+
+class _SlowCallbackHandler(logging.Handler):
+    def __init__(self, monitor: 'SlowCallbackMonitor'):
+        super().__init__(logging.WARNING)
+        self.monitor = monitor
+
+    def emit(self, record: logging.LogRecord):
+        # asyncio logs 'Executing %s took %.3f seconds' for callbacks over slow_callback_duration
+        if record.msg.startswith('Executing ') and len(record.args or ()) == 2:
+            self.monitor.records.append({
+                'at': record.created,
+                'callback': str(record.args[0])[:500],
+                'seconds': round(float(record.args[1]), 4)
+            })
+
+class SlowCallbackMonitor:
+    """Puts the background loop in asyncio debug mode for a window and keeps the callbacks it reports as slow.
+
+    Debug mode also checks loop calls come from the loop thread; the app only
+    reaches the loop through run_coroutine_threadsafe, so that holds.
+    """
+
+    def __init__(self, history: int, max_seconds: float):
+        self.max_seconds = max_seconds
+        self.records: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self.threshold: Optional[float] = None
+        self.until: Optional[float] = None
+        self._lock = threading.Lock()
+        self._handler = _SlowCallbackHandler(self)
+        self._timer: Optional[threading.Timer] = None
+        self._saved_level = logging.NOTSET
+
+    @property
+    def active(self) -> bool:
+        return self._timer is not None
+
+    def start(self, duration: float = 30.0, threshold: float = 0.1):
+        if not 0 < duration <= self.max_seconds:
+            raise ValueError(f"duration must be between 0 and {self.max_seconds} seconds")
+        if not 0.001 <= threshold <= 10:
+            raise ValueError("threshold must be between 1 ms and 10 s")
+        with self._lock:
+            if self._timer is not None:
+                raise ProfilerBusy("Slow-callback capture is already running")
+            loop = background_loop.start()
+            asyncio_logger = logging.getLogger('asyncio')
+            self._saved_level = asyncio_logger.level
+            if asyncio_logger.getEffectiveLevel() > logging.WARNING:
+                asyncio_logger.setLevel(logging.WARNING)
+            asyncio_logger.addHandler(self._handler)
+            self.threshold = threshold
+            self.until = time.time() + duration
+            # set_debug also turns on coroutine origin tracking for the calling thread: call it on the loop thread
+            loop.call_soon_threadsafe(self._set_debug, loop, True, threshold)
+            self._timer = threading.Timer(duration, self.stop)
+            self._timer.daemon = True
+            self._timer.start()
+        logger.info(f"🐢 Capturing background-loop callbacks slower than {threshold * 1000:.0f}ms for {duration}s")
+
+    def stop(self):
+        with self._lock:
+            if self._timer is None:
+                return
+            self._timer.cancel()
+            self._timer = None
+            self.until = None
+            loop = background_loop.loop
+            if loop is not None and loop.is_running():
+                loop.call_soon_threadsafe(self._set_debug, loop, False, 0.1)
+            asyncio_logger = logging.getLogger('asyncio')
+            asyncio_logger.removeHandler(self._handler)
+            asyncio_logger.setLevel(self._saved_level)
+        logger.info(f"🐢 Slow-callback capture ended ({len(self.records)} kept)")
+
+    @staticmethod
+    def _set_debug(loop, enabled: bool, threshold: float):
+        loop.slow_callback_duration = threshold
+        loop.set_debug(enabled)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'active': self.active,
+            'threshold_ms': self.threshold * 1000 if self.threshold else None,
+            'until': self.until,
+            'callbacks': sorted(self.records, key=lambda record: record['seconds'], reverse=True)
+        }
+
+# Global profiler instances (idle until an admin opens a window)
+sampling_profiler = SamplingProfiler(PROFILER_HISTORY, PROFILER_MAX_SECONDS)
+slow_callback_monitor = SlowCallbackMonitor(PROFILER_SLOW_CALLBACK_HISTORY, PROFILER_MAX_SECONDS)
@@ -0,0 +1,325 @@
+"""
+Request tracing - lightweight spans with W3C trace context, an in-memory trace store and optional OTLP export
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+import httpx
+from config import (
+    TRACING_ENABLED, TRACING_SAMPLE_RATE, TRACING_MAX_TRACES, TRACING_MAX_SPANS_PER_TRACE,
+    TRACING_SERVICE_NAME, TRACING_OTLP_ENDPOINT, TRACING_EXPORT_INTERVAL_SECONDS
+)
+from utils.background_loop import background_loop
+from utils.logging import LOGGER
+
+logger = LOGGER(__name__)
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+TRACEPARENT_PATTERN = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+class Span:
+    """One timed operation; field names follow the OpenTelemetry span model"""
+
+    __slots__ = ('store', 'name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'status', 'error')
+
+    def __init__(self, store: 'TraceStore', name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None, start_ns: Optional[int] = None):
+        self.store = store
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = 'unset'
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = 'error'
+        self.error = f"{type(error).__name__}: {str(error)[:200]}"
+
+    def end(self, end_ns: Optional[int] = None):
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            if self.status == 'unset':
+                self.status = 'ok'
+            self.store.add(self)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start_ns / 1e9,
+            'duration_ms': round(self.duration_ms, 3),
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+class TraceStore:
+    """Spans of recent traces grouped by trace ID, oldest traces evicted first.
+
+    The root span (no parent, or a remote parent) decides the trace's
+    duration; spans that end after it, such as a background upload, are
+    still attached while the trace is kept.
+    """
+
+    def __init__(self, max_traces: int, max_spans: int):
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self._lock = threading.Lock()
+        self._traces: Dict[str, Dict[str, Any]] = {}
+        self._order: Deque[str] = deque()
+        self.exporters: List[Any] = []
+
+    def add(self, span: Span):
+        with self._lock:
+            trace = self._traces.get(span.trace_id)
+            if trace is None:
+                trace = self._traces[span.trace_id] = {'trace_id': span.trace_id, 'root': None, 'spans': [], 'dropped': 0}
+                self._order.append(span.trace_id)
+                while len(self._order) > self.max_traces:
+                    self._traces.pop(self._order.popleft(), None)
+            if len(trace['spans']) < self.max_spans:
+                trace['spans'].append(span)
+            else:
+                trace['dropped'] += 1
+            if span.attributes.get('trace.root'):
+                trace['root'] = span
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            return self._view(trace, spans=True) if trace else None
+
+    def slowest(self, limit: int = 20, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Completed traces ordered by root span duration, slowest first"""
+        with self._lock:
+            traces = [
+                trace for trace in self._traces.values()
+                if trace['root'] is not None and (name is None or trace['root'].name == name)
+            ]
+            traces.sort(key=lambda trace: trace['root'].duration_ms, reverse=True)
+            return [self._view(trace, spans=True) for trace in traces[:limit]]
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+            self._order.clear()
+
+    @staticmethod
+    def _view(trace: Dict[str, Any], spans: bool = False) -> Dict[str, Any]:
+        root = trace['root']
+        view = {
+            'trace_id': trace['trace_id'],
+            'name': root.name if root else None,
+            'duration_ms': round(root.duration_ms, 3) if root else None,
+            'start': root.start_ns / 1e9 if root else None,
+            'status': root.status if root else None,
+            'attributes': root.attributes if root else {},
+            'span_count': len(trace['spans']),
+            'dropped_spans': trace['dropped']
+        }
+        if spans:
+            view['spans'] = [span.to_dict() for span in sorted(trace['spans'], key=lambda span: span.start_ns)]
+        return view
+
+class OTLPExporter:
+    """Batches finished spans and posts them as OTLP/HTTP JSON from the background loop"""
+
+    def __init__(self, endpoint: str, interval: float, service_name: str):
+        self.endpoint = endpoint
+        self.interval = interval
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self._buffer: List[Span] = []
+        self.started = False
+        self.exported = 0
+        self.failed = 0
+
+    def export(self, span: Span):
+        with self._lock:
+            if len(self._buffer) < 10000:
+                self._buffer.append(span)
+
+    def start(self):
+        if self.started:
+            return
+        self.started = True
+        background_loop.submit(self._run_forever())
+        logger.info(f"🛰️ OTLP span export to {self.endpoint} (every {self.interval}s)")
+
+    async def _run_forever(self):
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            while True:
+                await asyncio.sleep(self.interval)
+                with self._lock:
+                    batch, self._buffer = self._buffer, []
+                if not batch:
+                    continue
+                try:
+                    response = await client.post(self.endpoint, json=self.payload(batch))
+                    response.raise_for_status()
+                    self.exported += len(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    logger.warning(f"OTLP export of {len(batch)} spans failed: {e}")
+
+    def payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', self.service_name)]},
+            'scopeSpans': [{
+                'scope': {'name': 'utils.tracing'},
+                'spans': [{
+                    'traceId': span.trace_id,
+                    'spanId': span.span_id,
+                    'parentSpanId': span.parent_id or '',
+                    'name': span.name,
+                    'kind': 2 if span.attributes.get('trace.root') else 1,  # SERVER / INTERNAL
+                    'startTimeUnixNano': str(span.start_ns),
+                    'endTimeUnixNano': str(span.end_ns),
+                    'attributes': [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+                    'status': {'code': 2, 'message': span.error or ''} if span.status == 'error' else {'code': 1}
+                } for span in spans]
+            }]
+        }]}
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+class Tracer:
+    """Creates spans; child spans are only recorded inside a sampled trace"""
+
+    def __init__(self):
+        self.enabled = TRACING_ENABLED
+        self.sample_rate = TRACING_SAMPLE_RATE
+        self.store = TraceStore(TRACING_MAX_TRACES, TRACING_MAX_SPANS_PER_TRACE)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, **attributes) -> Optional[Span]:
+        """Root span of a request or background job; continues a valid W3C traceparent.
+
+        Returns None when tracing is off or the trace is not sampled.
+        """
+        if not self.enabled:
+            return None
+        match = TRACEPARENT_PATTERN.match(traceparent or '')
+        if match:
+            # The caller already made the sampling decision
+            if not int(match.group(3), 16) & 1:
+                return None
+            trace_id, parent_id = match.group(1), match.group(2)
+        else:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return None
+            trace_id, parent_id = _new_id(16), None
+        attributes['trace.root'] = True
+        return Span(self.store, name, trace_id, parent_id, attributes)
+
+    def attach(self, span: Optional[Span]) -> contextvars.Token:
+        return _current_span.set(span)
+
+    def detach(self, token: contextvars.Token):
+        _current_span.reset(token)
+
+    @contextmanager
+    def trace(self, name: str, traceparent: Optional[str] = None, **attributes) -> Iterator[Optional[Span]]:
+        """Root span as a with-block (background jobs)"""
+        span = self.start_trace(name, traceparent, **attributes)
+        token = self.attach(span)
+        try:
+            yield span
+        except BaseException as e:
+            if span is not None:
+                span.record_error(e)
+            raise
+        finally:
+            self.detach(token)
+            if span is not None:
+                span.end()
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes) -> Iterator[Optional[Span]]:
+        """Child span of `parent` (default: the current span); a no-op outside a trace"""
+        parent = parent or _current_span.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(parent.store, name, parent.trace_id, parent.span_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def traced(self, name: str):
+        """Decorator: run a coroutine function inside a child span"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name: str, duration: float, error: Optional[str] = None, **attributes):
+        """Child span for an operation timed elsewhere (e.g. driver command events)"""
+        parent = _current_span.get()
+        if parent is None:
+            return
+        end_ns = time.time_ns()
+        span = Span(parent.store, name, parent.trace_id, parent.span_id, attributes, start_ns=end_ns - int(duration * 1e9))
+        if error:
+            span.status = 'error'
+            span.error = error
+        span.end(end_ns)
+
+# Global tracer instance
+tracer = Tracer()
+
+if TRACING_ENABLED and TRACING_OTLP_ENDPOINT:
+    otlp_exporter = OTLPExporter(TRACING_OTLP_ENDPOINT, TRACING_EXPORT_INTERVAL_SECONDS, TRACING_SERVICE_NAME)
+    tracer.store.exporters.append(otlp_exporter)
+else:
+    otlp_exporter = None
@@ -0,0 +1,88 @@
+"""
+YouTube URL canonicalization - one video ID per video, whatever URL shape it came in
+"""
+import re
+from typing import NamedTuple, Optional
+
+# Patterns are compiled once at import; extraction runs several times per request
+VIDEO_ID_RE = re.compile(r'[A-Za-z0-9_-]{11}')
+
+_URL_RE = re.compile(
+    r'(?:https?://)?(?:(?:www|m|music)\.)?'
+    r'(?:'
+    r'youtube(?:-nocookie)?\.com/'
+    r'(?:watch/?\?(?:[^#]*?&)?v=|(?:embed|v|e|shorts|live)/)'
+    r'|youtu\.be/'
+    r')'
+    r'([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])',
+    re.IGNORECASE
+)
+
+_START_RE = re.compile(r'[?&#](?:t|start|time_continue)=([0-9hms]+)')
+_DURATION_RE = re.compile(r'(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?')
+
+CANONICAL_URL = "https://www.youtube.com/watch?v={}"
+
+# Most traffic uses a handful of exact prefixes; slicing beats running the full pattern
+_FAST_PREFIXES = tuple((prefix, len(prefix)) for prefix in (
+    CANONICAL_URL[:-2],
+    'https://youtu.be/',
+    'https://youtube.com/watch?v=',
+    'https://m.youtube.com/watch?v=',
+    'https://music.youtube.com/watch?v=',
+    'https://www.youtube.com/shorts/',
+    'https://www.youtube.com/embed/',
+))
+_ID_TERMINATORS = frozenset('?&#/')
+
+class VideoRef(NamedTuple):
+    """Canonical reference to a video: its ID and optional start offset in seconds"""
+    video_id: str
+    start_time: Optional[int] = None
+
+def _parse_start(value: str) -> Optional[int]:
+    """'90', '90s', '1m30s' or '1h2m3s' -> seconds"""
+    match = _DURATION_RE.fullmatch(value)
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes, seconds = (int(part) if part else 0 for part in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+def _start_time(query: str) -> Optional[int]:
+    start = _START_RE.search(query)
+    return _parse_start(start.group(1)) if start else None
+
+def parse_youtube_url(value: str) -> VideoRef:
+    """Canonicalize a bare video ID or any supported YouTube URL.
+
+    Covers watch (incl. m./music. hosts and extra params like si=), youtu.be,
+    embed, v, shorts and live URLs. Raises ValueError for anything else.
+    """
+    if not value:
+        raise ValueError("Invalid YouTube URL")
+    value = value.strip()
+
+    # Fast path: bare 11-character ID
+    if len(value) == 11 and VIDEO_ID_RE.fullmatch(value):
+        return VideoRef(value)
+
+    for prefix, size in _FAST_PREFIXES:
+        if value.startswith(prefix):
+            video_id = value[size:size + 11]
+            rest = value[size + 11:]
+            if (not rest or rest[0] in _ID_TERMINATORS) and VIDEO_ID_RE.fullmatch(video_id):
+                return VideoRef(video_id, _start_time(rest) if rest else None)
+            break
+
+    match = _URL_RE.match(value)
+    if not match:
+        raise ValueError("Invalid YouTube URL")
+    return VideoRef(match.group(1), _start_time(value) if '=' in value else None)
+
+def extract_video_id(value: str) -> str:
+    """Video ID of a bare ID or YouTube URL"""
+    return parse_youtube_url(value).video_id
+
+def canonical_url(video_id: str) -> str:
+    """The single URL form used for cache keys and upstream requests"""
+    return CANONICAL_URL.format(video_id)